@@ -0,0 +1,270 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import re
+import time
+
+import eventlet
+import requests
+from requests.packages.urllib3 import exceptions as urllib3_exc
+
+try:
+    from neutron.openstack.common import log as logging
+except ImportError:
+    from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+POLICY_EWMA = 'ewma'
+POLICY_LEAST_OUTSTANDING = 'least_outstanding'
+
+# connection level failures taking an endpoint out of rotation
+FAILOVER_EXCEPTIONS = (requests.exceptions.ConnectionError,
+                       requests.exceptions.Timeout)
+
+
+def request_not_sent(exc):
+    """Tells whether exc was raised before the request reached the server.
+
+    Only then is it safe to send a non-idempotent request again: a read
+    timeout or a connection dropped while waiting for the response may
+    follow a request the server already acted on.
+    """
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(exc, requests.exceptions.ConnectionError):
+        return False
+    # refused connections are reported as failing to connect
+    reason = getattr(exc.args[0] if exc.args else None, 'reason', None)
+    return isinstance(reason, urllib3_exc.ConnectTimeoutError)
+
+
+def parse_endpoints(api_server_ip, api_server_port):
+    """Parses the api_server_ip option into a list of (host, port).
+
+    Entries are separated by commas or spaces and may carry their own port,
+    eg. "10.0.0.1, 10.0.0.2:9100 10.0.0.3".
+    """
+    endpoints = []
+    for entry in re.split(r'[\s,]+', api_server_ip or ''):
+        if not entry:
+            continue
+        if entry.count(':') == 1:
+            host, port = entry.split(':')
+        else:
+            host, port = entry, api_server_port
+        endpoints.append((host, str(port)))
+    return endpoints
+
+
+class Endpoint(object):
+    def __init__(self, host, port, client=None):
+        self.host = host
+        self.port = port
+        self.client = client
+        self.ewma = 0.0
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.down_until = 0
+
+    def __str__(self):
+        return '%s:%s' % (self.host, self.port)
+
+    def is_up(self, now):
+        return now >= self.down_until
+
+    def get_stats(self):
+        return {'endpoint': str(self),
+                'requests': self.requests,
+                'failures': self.failures,
+                'outstanding': self.outstanding,
+                'latency_ewma': self.ewma,
+                'up': self.is_up(time.time())}
+
+
+class EndpointBalancer(object):
+    """Spreads requests over several API servers.
+
+    With the 'ewma' policy the endpoint with the lowest expected latency,
+    the latency EWMA scaled by the requests already in flight, is chosen.
+    With 'least_outstanding' the endpoint with the fewest requests in
+    flight wins and the EWMA only breaks ties. An endpoint raising a
+    connection error, or failing the optional periodic probe, is taken out
+    of rotation for failure_timeout seconds.
+    """
+
+    def __init__(self, endpoints, policy=POLICY_EWMA, decay=0.3,
+                 failure_timeout=30):
+        if not endpoints:
+            raise ValueError('No API server endpoint configured')
+        self.endpoints = endpoints
+        self._policy = policy
+        self._decay = decay
+        self._failure_timeout = failure_timeout
+        self._prober = None
+
+    def _cost(self, endpoint):
+        if self._policy == POLICY_LEAST_OUTSTANDING:
+            return (endpoint.outstanding, endpoint.ewma)
+        return (endpoint.ewma * (endpoint.outstanding + 1),
+                endpoint.outstanding)
+
+    def select(self, exclude=None):
+        now = time.time()
+        candidates = [ep for ep in self.endpoints
+                      if ep.is_up(now) and ep not in (exclude or [])]
+        if not candidates:
+            # everything looks down, better try than fail right away
+            candidates = [ep for ep in self.endpoints
+                          if ep not in (exclude or [])]
+        if not candidates:
+            return None
+        return min(candidates, key=self._cost)
+
+    def mark_down(self, endpoint):
+        endpoint.failures += 1
+        endpoint.down_until = time.time() + self._failure_timeout
+        LOG.warning("API server %s marked down for %s seconds",
+                    endpoint, self._failure_timeout)
+
+    def mark_up(self, endpoint):
+        endpoint.down_until = 0
+
+    def _record(self, endpoint, elapsed):
+        if not endpoint.ewma:
+            endpoint.ewma = elapsed
+        else:
+            endpoint.ewma = (self._decay * elapsed +
+                             (1 - self._decay) * endpoint.ewma)
+
+    def call(self, func, idempotent=True):
+        """Invokes func(endpoint) on the best endpoint, failing over on
+        connection errors to the remaining ones.
+
+        A non-idempotent call only fails over when the request was not
+        sent, other failures are raised as is.
+        """
+        tried = []
+        while True:
+            endpoint = self.select(exclude=tried)
+            tried.append(endpoint)
+
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            start = time.time()
+            try:
+                result = func(endpoint)
+            except FAILOVER_EXCEPTIONS as e:
+                self.mark_down(endpoint)
+                if len(tried) == len(self.endpoints):
+                    raise
+                if not idempotent and not request_not_sent(e):
+                    raise
+                continue
+            finally:
+                endpoint.outstanding -= 1
+
+            self._record(endpoint, time.time() - start)
+            return result
+
+    def start_health_check(self, probe, interval):
+        """Periodically runs probe(endpoint), which returns False or raises
+        when the endpoint is unhealthy.
+        """
+        def _health_check():
+            while True:
+                for endpoint in self.endpoints:
+                    try:
+                        healthy = probe(endpoint)
+                    except Exception:
+                        healthy = False
+                    if healthy:
+                        self.mark_up(endpoint)
+                    elif endpoint.is_up(time.time()):
+                        self.mark_down(endpoint)
+                eventlet.sleep(interval)
+
+        if interval and len(self.endpoints) > 1 and not self._prober:
+            self._prober = eventlet.spawn(_health_check)
+
+    def get_stats(self):
+        return [endpoint.get_stats() for endpoint in self.endpoints]
+
+
+class BalancedVncApi(object):
+    """Dispatches VncApi calls over one client per API server endpoint.
+
+    Clients are built with client_factory(host, port). An endpoint that is
+    unreachable when the plugin starts gets its client built on first use.
+    """
+
+    # calls that change client state rather than talk to the API server
+    _broadcast_methods = ('set_auth_token',)
+    # calls that can be sent again should the response be lost
+    _idempotent_suffixes = ('_read', '_list', '_get', '_count')
+    _idempotent_methods = ('fq_name_to_id', 'id_to_fq_name', 'kv_retrieve')
+
+    def __init__(self, balancer, client_factory):
+        self._balancer = balancer
+        self._client_factory = client_factory
+
+    def _get_client(self, endpoint):
+        if endpoint.client is None:
+            endpoint.client = self._client_factory(endpoint.host,
+                                                   endpoint.port)
+        return endpoint.client
+
+    def connect(self):
+        """Connects to every reachable endpoint, raises if none is."""
+        error = None
+        for endpoint in self._balancer.endpoints:
+            try:
+                self._get_client(endpoint)
+            except requests.exceptions.RequestException as e:
+                self._balancer.mark_down(endpoint)
+                error = e
+        if not [ep for ep in self._balancer.endpoints if ep.client]:
+            raise error
+
+    @classmethod
+    def _is_idempotent(cls, name):
+        return (name in cls._idempotent_methods or
+                name.endswith(cls._idempotent_suffixes))
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        client = next((ep.client for ep in self._balancer.endpoints
+                       if ep.client is not None), None)
+        if client is not None and not callable(getattr(client, name)):
+            # data attributes are the same on all the clients
+            return getattr(client, name)
+
+        if name in self._broadcast_methods:
+            def _broadcast(*args, **kwargs):
+                for endpoint in self._balancer.endpoints:
+                    if endpoint.client is not None:
+                        getattr(endpoint.client, name)(*args, **kwargs)
+            return _broadcast
+
+        def _dispatch(*args, **kwargs):
+            return self._balancer.call(
+                lambda ep: getattr(self._get_client(ep), name)(*args,
+                                                               **kwargs),
+                idempotent=self._is_idempotent(name))
+        return _dispatch
+
+    def get_endpoint_stats(self):
+        return self._balancer.get_stats()
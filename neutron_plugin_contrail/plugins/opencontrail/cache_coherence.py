@@ -0,0 +1,180 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import socket
+import uuid
+
+import eventlet
+
+try:
+    import kombu
+except ImportError:
+    kombu = None
+
+try:
+    from neutron.openstack.common import log as logging
+except ImportError:
+    from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# fanout exchange the API server publishes object changes on
+CONFIG_UPDATE_EXCHANGE = 'vnc_config.object-update'
+
+
+class ChangeStream(object):
+    """Source of config object change notifications.
+
+    Once started, a stream calls on_change(message) for every notification,
+    a dict with 'oper', 'type', 'uuid' and optionally 'fq_name' and
+    'obj_dict'. on_connect() is called once notifications flow and
+    on_disconnect() as soon as some may have been missed.
+    """
+
+    def start(self, on_change, on_connect, on_disconnect):
+        raise NotImplementedError()
+
+    def stop(self):
+        raise NotImplementedError()
+
+
+class InProcessChangeStream(ChangeStream):
+    """Delivers the messages published on it, eg. in tests."""
+
+    def __init__(self):
+        self._callbacks = None
+        self.connected = False
+
+    def start(self, on_change, on_connect, on_disconnect):
+        self._callbacks = (on_change, on_connect, on_disconnect)
+
+    def stop(self):
+        self.disconnect()
+        self._callbacks = None
+
+    def connect(self):
+        self.connected = True
+        self._callbacks[1]()
+
+    def disconnect(self):
+        if self.connected:
+            self.connected = False
+            self._callbacks[2]()
+
+    def publish(self, message):
+        if self.connected:
+            self._callbacks[0](message)
+
+
+class KombuChangeStream(ChangeStream):
+    """Consumes the API server object change notifications over AMQP."""
+
+    def __init__(self, url, exchange=CONFIG_UPDATE_EXCHANGE,
+                 reconnect_interval=5):
+        if kombu is None:
+            raise ImportError('kombu is required for cache notifications')
+        self._url = url
+        self._exchange = exchange
+        self._reconnect_interval = reconnect_interval
+        self._running = False
+        self._consumer_thread = None
+
+    def start(self, on_change, on_connect, on_disconnect):
+        self._running = True
+        self._consumer_thread = eventlet.spawn(self._consume, on_change,
+                                               on_connect, on_disconnect)
+
+    def stop(self):
+        self._running = False
+        if self._consumer_thread:
+            self._consumer_thread.kill()
+            self._consumer_thread = None
+
+    def _consume(self, on_change, on_connect, on_disconnect):
+        def _on_message(body, message):
+            message.ack()
+            try:
+                if isinstance(body, basestring):
+                    body = json.loads(body)
+                on_change(body)
+            except Exception:
+                LOG.exception("Unable to process config notification")
+
+        exchange = kombu.Exchange(self._exchange, 'fanout', durable=False)
+        queue = kombu.Queue('neutron-object-cache-%s' % uuid.uuid4(),
+                            exchange, durable=False, auto_delete=True)
+        while self._running:
+            try:
+                with kombu.Connection(self._url) as conn:
+                    with conn.Consumer(queue, callbacks=[_on_message]):
+                        on_connect()
+                        while self._running:
+                            try:
+                                conn.drain_events(timeout=1)
+                            except socket.timeout:
+                                pass
+            except Exception as e:
+                LOG.warning("Config notification stream lost: %s", e)
+            on_disconnect()
+            if self._running:
+                eventlet.sleep(self._reconnect_interval)
+
+
+class CacheCoherence(object):
+    """Keeps a CachingVncApi coherent with changes done by other clients.
+
+    Entries are evicted as change notifications arrive, which makes it safe
+    to cache for `ttl` seconds. While the stream is down entries are only
+    kept for fallback_ttl seconds, and the cache is flushed whenever
+    notifications may have been missed.
+    """
+
+    def __init__(self, cache, stream, ttl=300, fallback_ttl=5):
+        self._cache = cache
+        self._stream = stream
+        self._ttl = ttl
+        self._fallback_ttl = fallback_ttl
+        self.connected = False
+        self.notifications = 0
+        self._cache.set_ttl(fallback_ttl)
+
+    def start(self):
+        self._stream.start(self._on_change, self._on_connect,
+                           self._on_disconnect)
+
+    def stop(self):
+        self._stream.stop()
+
+    def _on_connect(self):
+        # changes done while disconnected went unnoticed
+        self._cache.invalidate_all()
+        self._cache.set_ttl(self._ttl)
+        self.connected = True
+
+    def _on_disconnect(self):
+        self._cache.set_ttl(self._fallback_ttl)
+        if self.connected:
+            self._cache.invalidate_all()
+        self.connected = False
+
+    def _on_change(self, message):
+        self.notifications += 1
+        self._cache.invalidate_object(message.get('uuid'),
+                                      message.get('fq_name'),
+                                      message.get('obj_dict'))
+
+    def get_stats(self):
+        return {'connected': self.connected,
+                'notifications': self.notifications}
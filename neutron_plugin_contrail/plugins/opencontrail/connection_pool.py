@@ -0,0 +1,102 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import time
+
+import requests
+from requests import adapters
+
+try:
+    from neutron.openstack.common import log as logging
+except ImportError:
+    from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class SessionPool(object):
+    """Pool of keep-alive HTTP sessions towards an endpoint.
+
+    A session is checked out by exactly one greenthread at a time, so the
+    underlying connection is never shared between concurrent requests.
+    Sessions idle for longer than idle_timeout are closed instead of reused,
+    since the server side has most likely dropped the connection already.
+    A session keeps one connection per host for up to `hosts` hosts.
+    """
+
+    def __init__(self, name, pool_size=10, idle_timeout=60, hosts=1):
+        self._name = name
+        self._hosts = hosts
+        self._pool_size = pool_size
+        self._idle_timeout = idle_timeout
+        # list of (session, last used timestamp), most recently used last
+        self._idle = []
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = adapters.HTTPAdapter(pool_connections=self._hosts,
+                                       pool_maxsize=1)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _acquire(self):
+        now = time.time()
+        while self._idle:
+            session, last_used = self._idle.pop()
+            if now - last_used <= self._idle_timeout:
+                self.hits += 1
+                return session
+            self.expired += 1
+            session.close()
+
+        self.misses += 1
+        return self._new_session()
+
+    def _release(self, session):
+        if len(self._idle) >= self._pool_size:
+            session.close()
+            return
+        self._idle.append((session, time.time()))
+
+    @contextlib.contextmanager
+    def session(self):
+        session = self._acquire()
+        try:
+            yield session
+        except Exception:
+            # connection state is unknown, do not hand it out again
+            session.close()
+            raise
+        self._release(session)
+
+    def post(self, url, **kwargs):
+        with self.session() as session:
+            return session.post(url, **kwargs)
+
+    def get_stats(self):
+        return {'name': self._name,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'idle': len(self._idle)}
+
+    def close(self):
+        while self._idle:
+            session, _ = self._idle.pop()
+            session.close()
@@ -44,7 +44,11 @@ except ImportError:
 from simplejson import JSONDecodeError
 from eventlet.greenthread import getcurrent
 
+import api_endpoints
+import connection_pool
 import contrail_plugin_base as plugin_base
+import request_batcher
+import token_manager
 from cfgm_common import utils as cfgmutils
 
 _DEFAULT_KS_CERT_BUNDLE="/tmp/keystonecertbundle.pem"
@@ -54,6 +58,9 @@ _DEFAULT_SECURE_SERVER_CONNECT="https"
 
 LOG = logging.getLogger(__name__)
 
+# relayed operations that can be sent again should the response be lost
+READ_OPERATIONS = ('READ', 'READALL', 'READCOUNT')
+
 vnc_opts = [
     cfg.StrOpt('api_server_ip', default='127.0.0.1',
                help='IP address to connect to VNC controller'),
@@ -70,6 +77,28 @@ analytics_opts = [
                help='Port to connect to VNC collector'),
 ]
 
+vnc_conn_opts = [
+    cfg.IntOpt('connection_pool_size', default=10,
+               help='Number of idle keep-alive connections kept per '
+                    'endpoint (API server, keystone)'),
+    cfg.IntOpt('connection_pool_idle_timeout', default=60,
+               help='Seconds after which an idle pooled connection is '
+                    'closed instead of reused'),
+    cfg.IntOpt('token_refresh_margin', default=300,
+               help='Seconds before expiry at which the admin keystone '
+                    'token is refreshed in the background'),
+    cfg.StrOpt('token_cache_file', default='',
+               help='File used to share the admin keystone token between '
+                    'neutron worker processes, disabled if empty'),
+    cfg.IntOpt('relay_batch_size', default=0,
+               help='Maximum number of operations relayed to the API '
+                    'server in one batch request, batching disabled if '
+                    'less than 2'),
+    cfg.IntOpt('relay_batch_window', default=5,
+               help='Milliseconds to wait for concurrent operations to '
+                    'join a relay batch'),
+]
+
 class InvalidContrailExtensionError(exc.ServiceUnavailable):
     message = _("Invalid Contrail Extension: %(ext_name) %(ext_class)")
 
@@ -79,8 +108,26 @@ class NeutronPluginContrailCoreV2(plugin_base.NeutronPluginContrailCoreBase):
     PLUGIN_URL_PREFIX = '/neutron'
 
     def _build_auth_details(self):
+        cfg.CONF.register_opts(vnc_conn_opts, 'APISERVER')
+        endpoints = api_endpoints.parse_endpoints(
+            cfg.CONF.APISERVER.api_server_ip,
+            cfg.CONF.APISERVER.api_server_port)
+        self._api_endpoints = api_endpoints.EndpointBalancer(
+            [api_endpoints.Endpoint(host, port) for host, port in endpoints],
+            policy=cfg.CONF.APISERVER.api_server_lb_policy,
+            failure_timeout=cfg.CONF.APISERVER.api_server_failure_timeout)
+
+        pool_size = cfg.CONF.APISERVER.connection_pool_size
+        idle_timeout = cfg.CONF.APISERVER.connection_pool_idle_timeout
+        self._api_session_pool = connection_pool.SessionPool(
+            'apiserver', pool_size=pool_size, idle_timeout=idle_timeout,
+            hosts=len(endpoints))
+        self._ks_session_pool = connection_pool.SessionPool(
+            'keystone', pool_size=pool_size, idle_timeout=idle_timeout)
+
         #keystone
         self._authn_token = None
+        self._token_manager = None
         if cfg.CONF.auth_strategy == 'keystone':
             kcfg = cfg.CONF.keystone_authtoken
             body = '{"auth":{"passwordCredentials":{'
@@ -109,6 +156,19 @@ class NeutronPluginContrailCoreV2(plugin_base.NeutronPluginContrailCoreBase):
                    self._kscertbundle=cfgmutils.getCertKeyCaBundle(_DEFAULT_KS_CERT_BUNDLE,certs)
                    self._use_ks_certs=True
 
+            self._token_manager = token_manager.TokenManager(
+                self._fetch_keystone_token,
+                refresh_margin=cfg.CONF.APISERVER.token_refresh_margin,
+                shared_file=cfg.CONF.APISERVER.token_cache_file or None,
+                initial_token=self._authn_token)
+            # fetched up front rather than by the first request, which
+            # asks keystone again should it be unreachable now
+            try:
+                self._token_manager.get_token()
+            except Exception as e:
+                LOG.warning("Unable to fetch the keystone token, retrying "
+                            "on the first request: %s", e)
+
         #API Server SSL support
         self._apiusessl=cfg.CONF.APISERVER.use_ssl
         self._apiinsecure=cfg.CONF.APISERVER.insecure
@@ -127,47 +187,97 @@ class NeutronPluginContrailCoreV2(plugin_base.NeutronPluginContrailCoreBase):
                self._apicertbundle=cfgmutils.getCertKeyCaBundle(_DEFAULT_API_CERT_BUNDLE,certs)
                self._use_api_certs=True
 
+        self._batcher = None
+        if cfg.CONF.APISERVER.relay_batch_size > 1:
+            self._batcher = request_batcher.RequestBatcher(
+                self._request_backend_batch,
+                max_size=cfg.CONF.APISERVER.relay_batch_size,
+                window=cfg.CONF.APISERVER.relay_batch_window / 1000.0)
+
+        self._api_endpoints.start_health_check(
+            self._probe_api_server,
+            cfg.CONF.APISERVER.api_server_health_check_interval)
+
 
     def _request_api_server(self, url, data=None, headers=None):
         # Attempt to post to Api-Server
         if self._apiinsecure:
-             response = requests.post(url, data=data, headers=headers,verify=False)
+             response = self._api_session_pool.post(
+                 url, data=data, headers=headers, verify=False)
         elif not self._apiinsecure and self._use_api_certs:
-             response = requests.post(url, data=data, headers=headers,verify=self._apicertbundle)
+             response = self._api_session_pool.post(
+                 url, data=data, headers=headers, verify=self._apicertbundle)
         else:
-             response = requests.post(url, data=data, headers=headers)
-        if (response.status_code == requests.codes.unauthorized):
-            # Get token from keystone and save it for next request
-            if self._ksinsecure:
-               response = requests.post(self._keystone_url,
-                                        data=self._authn_body,
-                                        headers={'Content-type': 'application/json'},verify=False)
-            elif not self._ksinsecure and self._use_ks_certs:
-               response = requests.post(self._keystone_url,
-                                        data=self._authn_body,
-                                        headers={'Content-type': 'application/json'},verify=self._kscertbundle)
-            else:
-               response = requests.post(self._keystone_url,
-                                        data=self._authn_body,
-                                        headers={'Content-type': 'application/json'})
-            if (response.status_code == requests.codes.ok):
-                # plan is to re-issue original request with new token
-                auth_headers = headers or {}
-                authn_content = json.loads(response.text)
-                self._authn_token = authn_content['access']['token']['id']
-                auth_headers['X-AUTH-TOKEN'] = self._authn_token
-                response = self._request_api_server(url, data, auth_headers)
-            else:
-                raise RuntimeError('Authentication Failure')
+             response = self._api_session_pool.post(
+                 url, data=data, headers=headers)
+        if (response.status_code == requests.codes.unauthorized and
+                self._token_manager):
+            # Get a fresh token, unless another greenthread already did,
+            # and re-issue original request with it
+            auth_headers = headers or {}
+            self._authn_token = self._token_manager.invalidate(
+                auth_headers.get('X-AUTH-TOKEN'))
+            auth_headers['X-AUTH-TOKEN'] = self._authn_token
+            response = self._request_api_server(url, data, auth_headers)
         return response
 
-    def _request_api_server_authn(self, url, data=None, headers=None):
+    def _fetch_keystone_token(self):
+        if self._ksinsecure:
+           response = self._ks_session_pool.post(
+               self._keystone_url, data=self._authn_body,
+               headers={'Content-type': 'application/json'},
+               verify=False)
+        elif not self._ksinsecure and self._use_ks_certs:
+           response = self._ks_session_pool.post(
+               self._keystone_url, data=self._authn_body,
+               headers={'Content-type': 'application/json'},
+               verify=self._kscertbundle)
+        else:
+           response = self._ks_session_pool.post(
+               self._keystone_url, data=self._authn_body,
+               headers={'Content-type': 'application/json'})
+        if (response.status_code != requests.codes.ok):
+            raise RuntimeError('Authentication Failure')
+        return token_manager.parse_token_response(json.loads(response.text))
+
+    def _probe_api_server(self, endpoint):
+        url = "%s://%s:%s/" % (self._apiserverconnect,
+                               endpoint.host, endpoint.port)
+        if self._apiinsecure:
+            verify = False
+        elif self._use_api_certs:
+            verify = self._apicertbundle
+        else:
+            verify = True
+        response = requests.get(url, verify=verify, timeout=5)
+        return response.status_code < 500
+
+    def get_connection_pool_stats(self):
+        return [self._api_session_pool.get_stats(),
+                self._ks_session_pool.get_stats()]
+
+    def get_api_server_stats(self):
+        return self._api_endpoints.get_stats()
+
+    def _get_user_token(self):
         # forward user token to API server for RBAC
         # token saved earlier in the pipeline
         try:
-            auth_token = getcurrent().contrail_vars.token
+            return getcurrent().contrail_vars.token
         except AttributeError:
-            auth_token = None
+            return None
+
+    def _request_api_server_authn(self, url, data=None, headers=None,
+                                  auth_token=None):
+        if auth_token is None:
+            auth_token = self._get_user_token()
+
+        if not auth_token and self._token_manager:
+            try:
+                self._authn_token = self._token_manager.get_token()
+            except Exception as e:
+                # the api server may not require authentication
+                LOG.warning("Unable to fetch the keystone token: %s", e)
 
         authn_headers = headers or {}
         if auth_token or self._authn_token:
@@ -175,28 +285,78 @@ class NeutronPluginContrailCoreV2(plugin_base.NeutronPluginContrailCoreBase):
         response = self._request_api_server(url, data, headers=authn_headers)
         return response
 
-    def _relay_request(self, url_path, data=None):
-        """Send received request to api server."""
+    def _relay_request(self, url_path, data=None, auth_token=None,
+                       idempotent=False):
+        """Send received request to api server.
 
-        url = "%s://%s:%s%s" % (self._apiserverconnect,
-                                cfg.CONF.APISERVER.api_server_ip,
-                                cfg.CONF.APISERVER.api_server_port,
-                                url_path)
+        Unless idempotent, the request is not sent to another endpoint
+        once it may have reached one.
+        """
 
-        return self._request_api_server_authn(
-            url, data=data, headers={'Content-type': 'application/json'})
+        def _request(endpoint):
+            url = "%s://%s:%s%s" % (self._apiserverconnect,
+                                    endpoint.host, endpoint.port, url_path)
 
-    def _request_backend(self, context, data_dict, obj_name, action):
-        context_dict = self._encode_context(context, action, obj_name)
-        data = json.dumps({'context': context_dict, 'data': data_dict})
+            return self._request_api_server_authn(
+                url, data=data, headers={'Content-type': 'application/json'},
+                auth_token=auth_token)
+
+        return self._api_endpoints.call(_request, idempotent=idempotent)
+
+    @staticmethod
+    def _is_read_operation(operation):
+        return operation['context']['operation'] in READ_OPERATIONS
 
-        url_path = "%s/%s" % (self.PLUGIN_URL_PREFIX, obj_name)
-        response = self._relay_request(url_path, data=data)
+    def _decode_response(self, response):
         try:
             return response.status_code, response.json()
         except JSONDecodeError:
             return response.status_code, {'message': response.content}
 
+    def _relay_operation(self, operation, auth_token=None):
+        url_path = "%s/%s" % (self.PLUGIN_URL_PREFIX,
+                              operation['context']['type'])
+        response = self._relay_request(
+            url_path, data=json.dumps(operation), auth_token=auth_token,
+            idempotent=self._is_read_operation(operation))
+        return self._decode_response(response)
+
+    def _request_backend_batch(self, auth_token, operations):
+        """Relay several operations to api server in one request.
+
+        Each operation is a {'context', 'data'} envelope as sent to
+        /neutron/<type>, the types may be mixed. The api server answers
+        with a list of {'status_code', 'data'}, one per operation. Returns
+        a list of (status code, data).
+        """
+        url_path = "%s/batch" % self.PLUGIN_URL_PREFIX
+        data = json.dumps({'operations': operations})
+        response = self._relay_request(
+            url_path, data=data, auth_token=auth_token,
+            idempotent=all(self._is_read_operation(operation)
+                           for operation in operations))
+        if response.status_code == requests.codes.not_found:
+            LOG.warning("API server does not support batched requests, "
+                        "relaying operations one by one")
+            self._batcher = None
+            return [self._relay_operation(operation, auth_token)
+                    for operation in operations]
+
+        status_code, info = self._decode_response(response)
+        if status_code != requests.codes.ok:
+            return [(status_code, info)] * len(operations)
+        return [(result['status_code'], result['data']) for result in info]
+
+    def _request_backend(self, context, data_dict, obj_name, action):
+        context_dict = self._encode_context(context, action, obj_name)
+        operation = {'context': context_dict, 'data': data_dict}
+
+        if self._batcher:
+            # operations are batched per user token, as it is sent along
+            # with the whole batch
+            return self._batcher.submit(self._get_user_token(), operation)
+        return self._relay_operation(operation)
+
     def _encode_context(self, context, operation, apitype):
         cdict = {'user_id': getattr(context, 'user_id', ''),
                  'is_admin': getattr(context, 'is_admin', False),
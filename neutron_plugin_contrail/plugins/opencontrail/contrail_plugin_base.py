@@ -46,13 +46,26 @@ except ImportError:
 from simplejson import JSONDecodeError
 from eventlet.greenthread import getcurrent
 
+import pagination
+
 LOG = logging.getLogger(__name__)
 
 vnc_opts = [
     cfg.StrOpt('api_server_ip', default='127.0.0.1',
-               help='IP address to connect to VNC controller'),
+               help='IP address to connect to VNC controller, or a comma '
+                    'separated list of ip[:port] to spread requests over '
+                    'several controllers'),
     cfg.StrOpt('api_server_port', default='8082',
                help='Port to connect to VNC controller'),
+    cfg.StrOpt('api_server_lb_policy', default='ewma',
+               help='How requests are spread over several VNC controllers: '
+                    'ewma (lowest expected latency) or least_outstanding'),
+    cfg.IntOpt('api_server_failure_timeout', default=30,
+               help='Seconds a VNC controller is left out of rotation '
+                    'after a connection failure'),
+    cfg.IntOpt('api_server_health_check_interval', default=10,
+               help='Seconds between health checks of the VNC controllers '
+                    'when several are configured, 0 to disable'),
     cfg.DictOpt('contrail_extensions', default={},
                 help='Enable Contrail extensions(policy, ipam)'),
     cfg.BoolOpt('use_ssl', default=False,
@@ -198,6 +211,20 @@ class NeutronPluginContrailCoreBase(neutron_plugin_base_v2.NeutronPluginBaseV2,
     def _count_resource(self, res_type, context, filters):
         pass
 
+    def _list_resource_page(self, res_type, context, filters, fields,
+                            sorts=None, limit=None, marker=None,
+                            page_reverse=False):
+        resources = self._list_resource(res_type, context, filters, fields)
+        if not (sorts or limit or marker or page_reverse):
+            return resources
+
+        marker_obj = None
+        if marker:
+            marker_obj = self._get_resource(res_type, context, marker, None)
+        return pagination.paginate(resources, sorts=sorts, limit=limit,
+                                   marker_obj=marker_obj,
+                                   page_reverse=page_reverse)
+
     def _get_network(self, context, id, fields=None):
         return self._get_resource('network', context, id, fields)
 
@@ -226,11 +253,13 @@ class NeutronPluginContrailCoreBase(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
         self._delete_resource('network', context, network_id)
 
-    def get_networks(self, context, filters=None, fields=None):
+    def get_networks(self, context, filters=None, fields=None,
+                     sorts=None, limit=None, marker=None,
+                     page_reverse=False):
         """Get the list of Virtual Networks."""
 
-        return self._list_resource('network', context, filters,
-                                   fields)
+        return self._list_resource_page('network', context, filters, fields,
+                                        sorts, limit, marker, page_reverse)
 
     def get_networks_count(self, context, filters=None):
         """Get the count of Virtual Network."""
@@ -241,6 +270,11 @@ class NeutronPluginContrailCoreBase(neutron_plugin_base_v2.NeutronPluginBaseV2,
     def create_subnet(self, context, subnet):
         """Creates a new subnet, and assigns it a symbolic name."""
 
+        self._validate_subnet_create(subnet)
+        subnet_created = self._create_resource('subnet', context, subnet)
+        return self._make_subnet_dict(subnet_created)
+
+    def _validate_subnet_create(self, subnet):
         if subnet['subnet']['gateway_ip'] is None:
             subnet['subnet']['gateway_ip'] = '0.0.0.0'
 
@@ -251,9 +285,6 @@ class NeutronPluginContrailCoreBase(neutron_plugin_base_v2.NeutronPluginBaseV2,
                     'subnet'].get('id', _('new subnet')),
                     quota=cfg.CONF.max_subnet_host_routes)
 
-        subnet_created = self._create_resource('subnet', context, subnet)
-        return self._make_subnet_dict(subnet_created)
-
     def _make_subnet_dict(self, subnet):
         return subnet
 
@@ -280,12 +311,15 @@ class NeutronPluginContrailCoreBase(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
         self._delete_resource('subnet', context, subnet_id)
 
-    def get_subnets(self, context, filters=None, fields=None):
+    def get_subnets(self, context, filters=None, fields=None,
+                    sorts=None, limit=None, marker=None,
+                    page_reverse=False):
         """Get the list of subnets."""
 
         return [self._make_subnet_dict(s)
-                for s in self._list_resource(
-                    'subnet', context, filters, fields)]
+                for s in self._list_resource_page(
+                    'subnet', context, filters, fields,
+                    sorts, limit, marker, page_reverse)]
 
     def get_subnets_count(self, context, filters=None):
         """Get the count of subnets."""
@@ -378,7 +412,8 @@ class NeutronPluginContrailCoreBase(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
         self._delete_resource('port', context, port_id)
 
-    def get_ports(self, context, filters=None, fields=None):
+    def get_ports(self, context, filters=None, fields=None,
+                  sorts=None, limit=None, marker=None, page_reverse=False):
         """Get all ports.
 
         Retrieves all port identifiers belonging to the
@@ -386,7 +421,9 @@ class NeutronPluginContrailCoreBase(neutron_plugin_base_v2.NeutronPluginBaseV2,
         """
 
         return [self._make_port_dict(p, fields)
-                for p in self._list_resource('port', context, filters, fields)]
+                for p in self._list_resource_page(
+                    'port', context, filters, fields,
+                    sorts, limit, marker, page_reverse)]
 
     def get_ports_count(self, context, filters=None):
         """Get the count of ports."""
@@ -420,10 +457,13 @@ class NeutronPluginContrailCoreBase(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
         self._delete_resource('router', context, router_id)
 
-    def get_routers(self, context, filters=None, fields=None):
+    def get_routers(self, context, filters=None, fields=None,
+                    sorts=None, limit=None, marker=None,
+                    page_reverse=False):
         """Retrieves all router identifiers."""
 
-        return self._list_resource('router', context, filters, fields)
+        return self._list_resource_page('router', context, filters, fields,
+                                        sorts, limit, marker, page_reverse)
 
     def get_routers_count(self, context, filters=None):
         """Get the count of routers."""
@@ -459,10 +499,14 @@ class NeutronPluginContrailCoreBase(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
         self._delete_resource('floatingip', context, fip_id)
 
-    def get_floatingips(self, context, filters=None, fields=None):
+    def get_floatingips(self, context, filters=None, fields=None,
+                        sorts=None, limit=None, marker=None,
+                        page_reverse=False):
         """Retrieves all floating ips identifiers."""
 
-        return self._list_resource('floatingip', context, filters, fields)
+        return self._list_resource_page('floatingip', context, filters,
+                                        fields, sorts, limit, marker,
+                                        page_reverse)
 
     def get_floatingips_count(self, context, filters=None):
         """Get the count of floating IPs."""
@@ -498,8 +542,9 @@ class NeutronPluginContrailCoreBase(neutron_plugin_base_v2.NeutronPluginBaseV2,
                             page_reverse=False):
         """Retrieves all security group identifiers."""
 
-        return self._list_resource('security_group', context,
-                                   filters, fields)
+        return self._list_resource_page('security_group', context,
+                                        filters, fields, sorts, limit,
+                                        marker, page_reverse)
 
     def get_security_groups_count(self, context, filters=None):
         return 0
@@ -529,5 +574,6 @@ class NeutronPluginContrailCoreBase(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                  page_reverse=False):
         """Retrieves all security group rules."""
 
-        return self._list_resource('security_group_rule', context,
-                                   filters, fields)
+        return self._list_resource_page('security_group_rule', context,
+                                        filters, fields, sorts, limit,
+                                        marker, page_reverse)
@@ -21,6 +21,8 @@ import logging
 from pprint import pformat
 import sys
 
+import six
+
 LOG = logging.getLogger(__name__)
 
 
@@ -60,6 +62,15 @@ class NeutronPluginContrailVpc(object):
 
         return rt_dicts
 
+    def create_route_table_bulk(self, context, route_tables):
+        """
+        Creates several Route Tables, all or none of them.
+        """
+        plugin_rts = copy.deepcopy(route_tables)
+
+        return self._core._create_resource_bulk('route_table', context,
+                                                plugin_rts)
+
     def get_route_table(self, context, rt_id, fields=None):
         """
         Get the attributes of a route table.
@@ -97,8 +108,9 @@ class NeutronPluginContrailVpc(object):
         """
         Retrieves all route tables
         """
-        rt_dicts = self._core._list_resource('route_table', context, filters,
-                                             fields)
+        rt_dicts = self._core._list_resource_page('route_table', context,
+                                                  filters, fields, sorts,
+                                                  limit, marker, page_reverse)
 
         LOG.debug(
             "get_route_tables(): filters: " + pformat(filters) + " data: "
@@ -129,6 +141,26 @@ class NeutronPluginContrailVpc(object):
         LOG.debug("create_nat_instance(): " + pformat(nat_dicts) + "\n")
         return nat_dicts
 
+    def create_nat_instance_bulk(self, context, nat_instances):
+        """
+        Creates several nat instances, all or none of them.
+        """
+        nat_dicts = []
+        try:
+            for nat_instance in nat_instances['nat_instances']:
+                nat_dicts.append(
+                    self.create_nat_instance(context, nat_instance))
+        except Exception:
+            exc_info = sys.exc_info()
+            for nat_dict in nat_dicts:
+                try:
+                    self.delete_nat_instance(context, nat_dict['id'])
+                except Exception:
+                    LOG.exception("Unable to roll back nat instance %s",
+                                  nat_dict['id'])
+            six.reraise(*exc_info)
+        return nat_dicts
+
     def get_nat_instance(self, context, nat_id, fields=None):
         """
         Get the attributes of a particular nat instance
@@ -153,8 +185,10 @@ class NeutronPluginContrailVpc(object):
         """
         Get the list of nat instances.
         """
-        nat_dicts = self._core._list_resource('nat_instance', context,
-                                              filters, fields)
+        nat_dicts = self._core._list_resource_page('nat_instance', context,
+                                                   filters, fields, sorts,
+                                                   limit, marker,
+                                                   page_reverse)
 
         LOG.debug(
             "get_nat_instances(): filters: " + pformat(filters) + " data: "
@@ -1,10 +1,12 @@
 from neutron.common import exceptions as n_exc
 from cfgm_common import exceptions as vnc_exc
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    subnet_keys)
 
 
 def get_subnet_network_id(client, subnet_id):
     try:
-        kv_pair = client.kv_retrieve(subnet_id)
+        kv_pair, _ = subnet_keys.resolver.resolve_network(client, subnet_id)
     except vnc_exc.NoIdError:
         raise n_exc.SubnetNotFound(subnet_id=subnet_id)
     return kv_pair.split()[0]
@@ -12,7 +14,7 @@ def get_subnet_network_id(client, subnet_id):
 
 def get_subnet_cidr(client, subnet_id):
     try:
-        kv_pair = client.kv_retrieve(subnet_id)
+        kv_pair, _ = subnet_keys.resolver.resolve_network(client, subnet_id)
     except vnc_exc.NoIdError:
         raise n_exc.SubnetNotFound(subnet_id=subnet_id)
     return kv_pair.split()[1]
@@ -0,0 +1,57 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import functools
+import heapq
+
+
+def _compare_on(sorts):
+    def _compare(res_a, res_b):
+        for key, ascending in sorts:
+            result = cmp(res_a.get(key), res_b.get(key))
+            if result:
+                return result if ascending else -result
+        return 0
+    return _compare
+
+
+def paginate(resources, sorts=None, limit=None, marker_obj=None,
+             page_reverse=False):
+    """Returns a page of resource dicts, as the neutron DB plugins do.
+
+    Resources are ordered on the (key, ascending) pairs of sorts, ties
+    broken on id, and only the ones following marker_obj are kept, up to
+    limit. With page_reverse the page preceding marker_obj is returned.
+    resources may be any iterable, at most limit of them are held at once.
+    """
+    sorts = list(sorts or [])
+    if 'id' not in [key for key, _ in sorts]:
+        sorts.append(('id', True))
+    if page_reverse:
+        sorts = [(key, not ascending) for key, ascending in sorts]
+
+    compare = _compare_on(sorts)
+    if marker_obj is not None:
+        resources = (res for res in resources
+                     if compare(res, marker_obj) > 0)
+
+    sort_key = functools.cmp_to_key(compare)
+    if limit:
+        page = heapq.nsmallest(limit, resources, key=sort_key)
+    else:
+        page = sorted(resources, key=sort_key)
+
+    if page_reverse:
+        page.reverse()
+    return page
@@ -0,0 +1,72 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+from eventlet import event
+
+
+class RequestBatcher(object):
+    """Coalesces concurrent requests into batches.
+
+    Items submitted by different greenthreads under the same key within
+    `window` seconds are handed together to send_batch(key, items), which
+    returns one result per item. A batch is sent early once it holds
+    max_size items. Each caller gets back its own result, or the exception
+    raised while sending its batch.
+    """
+
+    def __init__(self, send_batch, max_size=10, window=0.005):
+        self._send_batch = send_batch
+        self._max_size = max_size
+        self._window = window
+        # key -> list of (item, event) waiting to be sent
+        self._pending = {}
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, key, item):
+        done = event.Event()
+        pending = self._pending.setdefault(key, [])
+        pending.append((item, done))
+        if len(pending) >= self._max_size:
+            self._flush(key, pending)
+        elif len(pending) == 1:
+            eventlet.spawn_after(self._window, self._flush, key, pending)
+        return done.wait()
+
+    def _flush(self, key, pending):
+        if self._pending.get(key) is not pending:
+            # already sent because it filled up
+            return
+        del self._pending[key]
+
+        self.batches += 1
+        self.items += len(pending)
+        try:
+            results = self._send_batch(key, [item for item, _ in pending])
+            if len(results) != len(pending):
+                raise ValueError('Got %d results for a batch of %d' %
+                                 (len(results), len(pending)))
+        except Exception as e:
+            for _, done in pending:
+                done.send_exception(e)
+            return
+
+        for (_, done), result in zip(pending, results):
+            done.send(result)
+
+    def get_stats(self):
+        return {'batches': self.batches,
+                'items': self.items,
+                'pending': sum(len(p) for p in self._pending.values())}
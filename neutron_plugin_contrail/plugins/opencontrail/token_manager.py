@@ -0,0 +1,173 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import calendar
+import datetime
+import errno
+import fcntl
+import json
+import os
+import time
+
+import eventlet
+from eventlet import semaphore
+
+try:
+    from neutron.openstack.common import log as logging
+except ImportError:
+    from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+_EXPIRY_FORMATS = ('%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%dT%H:%M:%S.%fZ',
+                   '%Y-%m-%dT%H:%M:%S')
+
+
+def parse_token_response(content):
+    """Returns (token id, expiry as epoch seconds) of a /v2.0/tokens reply.
+
+    Expiry is None when keystone did not return a parsable timestamp, in
+    which case the token is used until the API server rejects it.
+    """
+    token = content['access']['token']
+    expires = token.get('expires')
+    expires_at = None
+    for fmt in _EXPIRY_FORMATS:
+        try:
+            expiry = datetime.datetime.strptime(expires, fmt)
+        except (TypeError, ValueError):
+            continue
+        expires_at = calendar.timegm(expiry.timetuple())
+        break
+    return token['id'], expires_at
+
+
+class TokenManager(object):
+    """Caches the admin keystone token and refreshes it before it expires.
+
+    fetch_token is a callable returning (token id, expiry epoch seconds) or
+    raising on authentication failure. Only one greenthread fetches a token
+    at a time, the others wait for it and reuse the result. When
+    shared_file is set, the token is also published there so that the
+    other neutron worker processes on the node pick it up instead of
+    asking keystone themselves.
+    """
+
+    def __init__(self, fetch_token, refresh_margin=300, shared_file=None,
+                 initial_token=None):
+        self._fetch_token = fetch_token
+        self._refresh_margin = refresh_margin
+        self._shared_file = shared_file
+        self._token = initial_token
+        self._expires_at = None
+        self._lock = semaphore.Semaphore()
+
+    def _is_usable(self, expires_at, now):
+        return expires_at is None or now < expires_at
+
+    def _needs_refresh(self, now):
+        return (self._expires_at is not None and
+                now >= self._expires_at - self._refresh_margin)
+
+    def get_token(self):
+        now = time.time()
+        if self._token and self._is_usable(self._expires_at, now):
+            if self._needs_refresh(now) and not self._lock.locked():
+                eventlet.spawn_n(self._background_refresh, self._token)
+            return self._token
+
+        return self._refresh(self._token)
+
+    def invalidate(self, stale_token):
+        """Drops stale_token and returns a fresh one.
+
+        If another greenthread or worker already replaced stale_token, the
+        replacement is returned without contacting keystone again.
+        """
+        return self._refresh(stale_token, force=True)
+
+    def _background_refresh(self, stale_token):
+        try:
+            self._refresh(stale_token, force=True)
+        except Exception:
+            LOG.exception("Background keystone token refresh failed")
+
+    def _refresh(self, stale_token, force=False):
+        with self._lock:
+            now = time.time()
+            if (self._token and self._token != stale_token and
+                    self._is_usable(self._expires_at, now)):
+                # refreshed while we were waiting for the lock
+                return self._token
+            if (not force and self._token and
+                    self._is_usable(self._expires_at, now)):
+                return self._token
+
+            if self._shared_file:
+                token, expires_at = self._refresh_shared(stale_token)
+            else:
+                token, expires_at = self._fetch_token()
+
+            self._token = token
+            self._expires_at = expires_at
+            return token
+
+    def _refresh_shared(self, stale_token):
+        lock_fd = os.open(self._shared_file + '.lock',
+                          os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # do not block the eventlet hub while another worker refreshes
+            while True:
+                try:
+                    fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except IOError as e:
+                    if e.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+                    eventlet.sleep(0.1)
+
+            shared = self._read_shared()
+            if shared:
+                token, expires_at = shared
+                now = time.time()
+                if (token != stale_token and expires_at is not None and
+                        now < expires_at - self._refresh_margin):
+                    return token, expires_at
+
+            token, expires_at = self._fetch_token()
+            self._write_shared(token, expires_at)
+            return token, expires_at
+        finally:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            os.close(lock_fd)
+
+    def _read_shared(self):
+        try:
+            with open(self._shared_file) as f:
+                data = json.load(f)
+            return data['token'], data.get('expires_at')
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_shared(self, token, expires_at):
+        tmp_file = '%s.%d' % (self._shared_file, os.getpid())
+        try:
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                         0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'token': token, 'expires_at': expires_at}, f)
+            os.rename(tmp_file, self._shared_file)
+        except (IOError, OSError):
+            LOG.warning("Unable to publish keystone token to %s",
+                        self._shared_file)
@@ -0,0 +1,284 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import copy
+import time
+
+try:
+    from neutron.openstack.common import log as logging
+except ImportError:
+    from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# object independent reads and the writes invalidating them
+_FQ_NAME_TO_ID = 'fq_name_to_id'
+_ID_TO_FQ_NAME = 'id_to_fq_name'
+_KV_RETRIEVE = 'kv_retrieve'
+_KV_WRITES = ('kv_store', 'kv_delete')
+_WRITE_SUFFIXES = ('_create', '_update', '_delete')
+
+
+def _copy_obj(obj):
+    # objects read through VncApi keep a reference to it, share it with
+    # the copy instead of copying the client
+    conn = getattr(obj, '_server_conn', None)
+    memo = {id(conn): conn} if conn is not None else {}
+    return copy.deepcopy(obj, memo)
+
+
+class CachingVncApi(object):
+    """Read-through cache in front of a VncApi client.
+
+    Results of <type>_read, fq_name_to_id, id_to_fq_name and kv_retrieve are
+    kept for ttl seconds in an LRU of max_entries. A write issued through
+    the wrapper evicts the written object, its parent and the objects it
+    refers to, whose back references it changes. A delete of an object
+    whose references are not known flushes the cache. Changes done by other
+    clients are only seen once entries expire, see invalidate() for
+    dropping entries on external notifications.
+
+    Cached objects are handed out as copies, as handlers modify the objects
+    they read before writing them back. kv_retrieve results always use the
+    ttl given here, set_ttl() only changes it for API server objects.
+    """
+
+    def __init__(self, vnc_lib, max_entries=10000, ttl=5):
+        self._vnc_lib = vnc_lib
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._kv_ttl = ttl
+        # key -> (expires_at, uuid, fq_name, value), least recently used first
+        self._entries = collections.OrderedDict()
+        self._keys_by_uuid = {}
+        self._keys_by_fq_name = {}
+        self._stats = {}
+
+    # index maintenance
+
+    def _index(self, index, name, key):
+        if name:
+            index.setdefault(name, set()).add(key)
+
+    def _unindex(self, index, name, key):
+        keys = index.get(name)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[name]
+
+    def _store(self, key, value, uuid=None, fq_name=None, ttl=None):
+        if key in self._entries:
+            self._drop(key)
+        while len(self._entries) >= self._max_entries:
+            self._drop(next(iter(self._entries)))
+        fq_name = tuple(fq_name) if fq_name else None
+        expires_at = time.time() + (self._ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, uuid, fq_name, value)
+        self._index(self._keys_by_uuid, uuid, key)
+        self._index(self._keys_by_fq_name, fq_name, key)
+
+    def _drop(self, key):
+        _, uuid, fq_name, _ = self._entries.pop(key)
+        self._unindex(self._keys_by_uuid, uuid, key)
+        self._unindex(self._keys_by_fq_name, fq_name, key)
+
+    def _lookup(self, res_type, key):
+        stats = self._stats.setdefault(res_type, {'hits': 0, 'misses': 0})
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                # refresh LRU position
+                del self._entries[key]
+                self._entries[key] = entry
+                stats['hits'] += 1
+                return True, entry[3]
+            self._drop(key)
+        stats['misses'] += 1
+        return False, None
+
+    def _cached_obj(self, uuid=None, fq_name=None):
+        keys = set(self._keys_by_uuid.get(uuid, ()))
+        if fq_name:
+            keys.update(self._keys_by_fq_name.get(tuple(fq_name), ()))
+        for key in keys:
+            value = self._entries[key][3]
+            if hasattr(value, 'get_fq_name'):
+                return value
+        return None
+
+    # invalidation
+
+    def invalidate(self, uuid=None, fq_name=None):
+        """Drops all entries of the object with uuid and/or fq_name."""
+        keys = set(self._keys_by_uuid.get(uuid, ()))
+        if fq_name:
+            keys.update(self._keys_by_fq_name.get(tuple(fq_name), ()))
+        for key in keys:
+            self._drop(key)
+
+    def invalidate_object(self, uuid=None, fq_name=None, obj_dict=None):
+        """Drops an object changed by another client.
+
+        The objects it refers to, before the change as known from the
+        cached copy and after it as given by obj_dict, are dropped as well.
+        """
+        cached = self._cached_obj(uuid, fq_name)
+        if cached is not None:
+            self._invalidate_obj(cached)
+        self.invalidate(uuid, fq_name)
+        obj_dict = obj_dict or {}
+        self.invalidate(obj_dict.get('parent_uuid'), (fq_name or [])[:-1])
+        for field, refs in obj_dict.items():
+            if field.endswith('_refs'):
+                for ref in refs or []:
+                    self.invalidate(ref.get('uuid'), ref.get('to'))
+
+    def invalidate_all(self):
+        self._entries.clear()
+        self._keys_by_uuid.clear()
+        self._keys_by_fq_name.clear()
+
+    def _invalidate_obj(self, obj):
+        self.invalidate(getattr(obj, 'uuid', None),
+                        getattr(obj, 'fq_name', None))
+        self.invalidate(getattr(obj, 'parent_uuid', None),
+                        (getattr(obj, 'fq_name', None) or [])[:-1])
+        ref_fields = getattr(obj, 'ref_fields', None)
+        if ref_fields is None:
+            return False
+        for ref_field in ref_fields:
+            for ref in getattr(obj, ref_field, None) or []:
+                self.invalidate(ref.get('uuid'), ref.get('to'))
+        return True
+
+    def _invalidate_write(self, method, args, kwargs):
+        if method.endswith('_delete'):
+            # <type>_delete(fq_name=None, id=None, ifmap_id=None)
+            fq_name = kwargs.get('fq_name', args[0] if args else None)
+            uuid = kwargs.get('id', args[1] if len(args) > 1 else None)
+            cached = self._cached_obj(uuid, fq_name)
+            if cached is None or not self._invalidate_obj(cached):
+                # referred objects are unknown, their back refs go stale
+                self.invalidate_all()
+            return
+
+        obj = args[0] if args else kwargs.get('obj')
+        if obj is None:
+            self.invalidate_all()
+            return
+        # references dropped by an update are only known to the old copy
+        cached = self._cached_obj(getattr(obj, 'uuid', None),
+                                  getattr(obj, 'fq_name', None))
+        if cached is not None:
+            self._invalidate_obj(cached)
+        if not self._invalidate_obj(obj):
+            self.invalidate_all()
+
+    # VncApi interface
+
+    def _read(self, method, res_type, fq_name=None, fq_name_str=None,
+              id=None, fields=None, **kwargs):
+        read = getattr(self._vnc_lib, method)
+        if kwargs:
+            # eg. ifmap_id, not worth caching
+            return read(fq_name=fq_name, fq_name_str=fq_name_str, id=id,
+                        fields=fields, **kwargs)
+
+        if fq_name_str is not None:
+            fq_name = fq_name_str.split(':')
+        key = (method, id, tuple(fq_name) if fq_name else None,
+               tuple(sorted(fields)) if fields else None)
+        found, obj = self._lookup(res_type, key)
+        if found:
+            return _copy_obj(obj)
+
+        obj = read(fq_name=fq_name, id=id, fields=fields)
+        self._store(key, _copy_obj(obj), obj.uuid, obj.get_fq_name())
+        return obj
+
+    def fq_name_to_id(self, obj_type, fq_name):
+        res_type = obj_type.replace('-', '_')
+        key = (_FQ_NAME_TO_ID, res_type, tuple(fq_name))
+        found, uuid = self._lookup(res_type, key)
+        if not found:
+            uuid = self._vnc_lib.fq_name_to_id(obj_type, fq_name)
+            self._store(key, uuid, uuid, fq_name)
+        return uuid
+
+    def id_to_fq_name(self, id):
+        key = (_ID_TO_FQ_NAME, id)
+        found, fq_name = self._lookup(_ID_TO_FQ_NAME, key)
+        if not found:
+            fq_name = self._vnc_lib.id_to_fq_name(id)
+            self._store(key, fq_name, id, fq_name)
+        return list(fq_name)
+
+    def kv_retrieve(self, key=None):
+        if key is None:
+            return self._vnc_lib.kv_retrieve(key)
+        cache_key = (_KV_RETRIEVE, key)
+        found, value = self._lookup(_KV_RETRIEVE, cache_key)
+        if not found:
+            value = self._vnc_lib.kv_retrieve(key)
+            self._store(cache_key, value, ttl=self._kv_ttl)
+        return value
+
+    def ref_update(self, obj_type, obj_uuid, ref_type, ref_uuid,
+                   ref_fq_name, *args, **kwargs):
+        try:
+            return self._vnc_lib.ref_update(obj_type, obj_uuid, ref_type,
+                                            ref_uuid, ref_fq_name, *args,
+                                            **kwargs)
+        finally:
+            self.invalidate(obj_uuid)
+            self.invalidate(ref_uuid, ref_fq_name)
+
+    def __getattr__(self, name):
+        attr = getattr(self._vnc_lib, name)
+        if name.endswith('_read') and callable(attr):
+            return lambda *args, **kwargs: self._read(name, name[:-5],
+                                                      *args, **kwargs)
+
+        if name in _KV_WRITES:
+            def _kv_write(key, *args, **kwargs):
+                try:
+                    return attr(key, *args, **kwargs)
+                finally:
+                    if (_KV_RETRIEVE, key) in self._entries:
+                        self._drop((_KV_RETRIEVE, key))
+            return _kv_write
+
+        if name.endswith(_WRITE_SUFFIXES) and callable(attr):
+            def _write(*args, **kwargs):
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    # invalidate even on failure, the write may have landed
+                    self._invalidate_write(name, args, kwargs)
+            return _write
+
+        return attr
+
+    def set_ttl(self, ttl):
+        self._ttl = ttl
+
+    def get_cache_stats(self):
+        stats = {}
+        for res_type, counts in self._stats.items():
+            total = counts['hits'] + counts['misses']
+            stats[res_type] = dict(counts,
+                                   hit_ratio=float(counts['hits']) / total)
+        return {'entries': len(self._entries), 'types': stats}
@@ -12,19 +12,58 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import sys
 import uuid
 
 from cfgm_common import exceptions as vnc_exc
+import eventlet
+import six
 from neutron_plugin_contrail.plugins.opencontrail import contrail_plugin_base
 from vnc_api import common as vnc_api_common
 from vnc_api import vnc_api
 
+try:
+    from neutron.openstack.common import log as logging
+except ImportError:
+    from oslo_log import log as logging
 
-class ContrailResourceHandler(object):
+LOG = logging.getLogger(__name__)
+
+
+class HandlerRegistry(object):
+    """Shared instances of the resource handlers.
+
+    Handlers get the other handlers they need from here rather than
+    building new ones on every call. These are built on first use with the
+    kwargs of the registry. This is intended: the ports a router interface
+    handler creates, say, then honour contrail_extensions_enabled and
+    apply_subnet_host_routes like the ports the plugin creates.
+    """
 
     def __init__(self, vnc_lib, **kwargs):
         self._vnc_lib = vnc_lib
         self._kwargs = kwargs
+        self._handlers = {}
+
+    def get(self, handler_cls):
+        try:
+            return self._handlers[handler_cls]
+        except KeyError:
+            handler = handler_cls(self._vnc_lib, registry=self,
+                                  **self._kwargs)
+            self._handlers[handler_cls] = handler
+            return handler
+
+
+class ContrailResourceHandler(object):
+
+    def __init__(self, vnc_lib, registry=None, **kwargs):
+        self._vnc_lib = vnc_lib
+        self._kwargs = kwargs
+        self._registry = registry or HandlerRegistry(vnc_lib, **kwargs)
+
+    def _get_handler(self, handler_cls):
+        return self._registry.get(handler_cls)
 
     @staticmethod
     def _filters_is_present(filters, key_name, match_value):
@@ -72,6 +111,33 @@ class ContrailResourceHandler(object):
     def _project_id_neutron_to_vnc(proj_id):
         return str(uuid.UUID(proj_id))
 
+    @staticmethod
+    def _iter_lists(list_getters):
+        """Yields the objects of the lists returned by list_getters.
+
+        A list is only read once the previous one is consumed, so a single
+        one is held at a time.
+        """
+        for list_getter in list_getters:
+            for obj in list_getter() or []:
+                yield obj
+
+    @staticmethod
+    def _iter_lists_concurrently(list_getters, pool_size=10):
+        """Yields the objects of the lists returned by list_getters.
+
+        Unlike _iter_lists(), the lists are all read concurrently, which
+        holds them all at once.
+        """
+        if len(list_getters) <= 1:
+            lists = [list_getter() for list_getter in list_getters]
+        else:
+            lists = eventlet.GreenPool(pool_size).imap(
+                lambda list_getter: list_getter(), list_getters)
+        for objs in lists:
+            for obj in objs or []:
+                yield obj
+
     @staticmethod
     def _filter_res_dict(res_dict, fields):
         new_res_dict = {}
@@ -94,6 +160,11 @@ class ContrailResourceHandler(object):
 
 class ResourceCreateHandler(ContrailResourceHandler):
     resource_create_method = None
+    # resources created concurrently by resource_create_bulk
+    bulk_create_pool_size = 10
+    # resource attribute naming the parent object a create rewrites, if any.
+    # Resources sharing a parent are then created one after the other.
+    bulk_create_serialize_on = None
 
     def _resource_create(self, obj):
         create_method = getattr(self._vnc_lib, self.resource_create_method)
@@ -113,6 +184,56 @@ class ResourceCreateHandler(ContrailResourceHandler):
                                            resource=res_type)
         return obj_uuid
 
+    def _resource_create_bulk(self, create, resources, rollback):
+        """Runs create(resource) for each resource on a bounded green pool.
+
+        Returns the results in the order of resources. If any create fails,
+        rollback(result) is called for the ones that succeeded and the first
+        failure is re-raised.
+        """
+        groups = {}
+        for index, resource in enumerate(resources):
+            key = (resource.get(self.bulk_create_serialize_on)
+                   if self.bulk_create_serialize_on else index)
+            groups.setdefault(key, []).append((index, resource))
+
+        outcomes = [None] * len(resources)
+
+        def _create_group(group):
+            for index, resource in group:
+                try:
+                    outcomes[index] = (True, create(resource))
+                except Exception:
+                    outcomes[index] = (False, sys.exc_info())
+                    return
+
+        pool = eventlet.GreenPool(self.bulk_create_pool_size)
+        for group in groups.values():
+            pool.spawn_n(_create_group, group)
+        pool.waitall()
+
+        # resources after a failure in their group are left as None
+        done = [outcome for outcome in outcomes if outcome]
+        failures = [result for ok, result in done if not ok]
+        if not failures:
+            return [result for _, result in outcomes]
+
+        for ok, result in done:
+            if ok:
+                try:
+                    rollback(result)
+                except Exception:
+                    LOG.exception("Unable to roll back %s after a failed "
+                                  "bulk create", result.get('id')
+                                  if isinstance(result, dict) else result)
+        six.reraise(*failures[0])
+
+    def resource_create_bulk(self, context, resources):
+        return self._resource_create_bulk(
+            lambda resource: self.resource_create(context, resource),
+            resources,
+            lambda created: self.resource_delete(context, created['id']))
+
 
 class ResourceDeleteHandler(ContrailResourceHandler):
     resource_delete_method = None
@@ -131,9 +252,31 @@ class ResourceUpdateHandler(ContrailResourceHandler):
 
 class ResourceGetHandler(ContrailResourceHandler):
     back_ref_fields = None
+    # neutron field -> back_ref_fields it is computed from
+    field_back_refs = None
     resource_list_method = None
     resource_get_method = None
     detail = True
+    # projects counted concurrently by _resource_count_optimized
+    count_pool_size = 10
+    # list queries run concurrently by _resource_list_by_uuids
+    list_pool_size = 10
+
+    def _plan_projection(self, fields, extra_fields=None):
+        """Plans the conversion of the objects asked for with `fields`.
+
+        Returns the neutron fields to compute, None for all of them, and
+        the back references to read to compute them. extra_fields are the
+        fields needed besides, eg. to apply filters.
+        """
+        if not fields or self.field_back_refs is None:
+            return None, self.back_ref_fields
+
+        needed = set(fields) | set(extra_fields or [])
+        back_refs = set()
+        for field in needed:
+            back_refs.update(self.field_back_refs.get(field, []))
+        return needed, sorted(back_refs)
 
     def _resource_list(self, back_refs=False, **kwargs):
         if back_refs:
@@ -144,6 +287,43 @@ class ResourceGetHandler(ContrailResourceHandler):
 
         return getattr(self._vnc_lib, self.resource_list_method)(**kwargs)
 
+    def _resource_list_by_uuids(self, uuids, **kwargs):
+        """Returns the objects of uuids, read in as few list queries as fit.
+
+        The uuids are split in chunks of at most list_uuids_max_length
+        characters, as they go in the url of the query, listed
+        concurrently. Unknown uuids are left out.
+        """
+        max_length = self._kwargs.get('list_uuids_max_length', 4096)
+        chunks = []
+        chunk = []
+        length = 0
+        seen = set()
+        for obj_uuid in uuids or []:
+            if obj_uuid in seen:
+                continue
+            seen.add(obj_uuid)
+            if chunk and length + len(obj_uuid) > max_length:
+                chunks.append(chunk)
+                chunk = []
+                length = 0
+            chunk.append(obj_uuid)
+            length += len(obj_uuid) + 1
+        if chunk:
+            chunks.append(chunk)
+
+        kwargs['detail'] = True
+        list_chunk = lambda chunk: self._resource_list(obj_uuids=chunk,
+                                                       **kwargs)
+        if len(chunks) <= 1:
+            return list_chunk(chunks[0]) if chunks else []
+
+        objs = []
+        pool = eventlet.GreenPool(self.list_pool_size)
+        for chunk_objs in pool.imap(list_chunk, chunks):
+            objs.extend(chunk_objs)
+        return objs
+
     def _resource_get(self, resource_get_method=None, back_refs=False,
                       **kwargs):
         if back_refs:
@@ -155,12 +335,20 @@ class ResourceGetHandler(ContrailResourceHandler):
         return getattr(self._vnc_lib, self.resource_get_method)(**kwargs)
 
     def _resource_count_optimized(self, filters):
+        """Counts the resources with count=True list queries.
+
+        Only answers when filtering on tenant_id at most, with one query per
+        project run concurrently. Returns None otherwise, leaving it to the
+        caller to count a listing.
+        """
         if filters and ('tenant_id' not in filters or len(filters.keys()) > 1):
             return None
 
         project_ids = filters.get('tenant_id') if filters else None
         if not isinstance(project_ids, list):
             project_ids = [project_ids]
+        # a project asked for twice is only counted once by a listing
+        project_ids = list(set(project_ids)) if project_ids else [None]
 
         json_resource = self.resource_list_method.replace("_", "-")
         json_resource = json_resource.replace('-list', '')
@@ -173,9 +361,13 @@ class ResourceGetHandler(ContrailResourceHandler):
                 parent_id=pid, count=True, back_refs=False,
                 detail=False)[json_resource]['count']
 
-        ret = [count(self._project_id_neutron_to_vnc(pid) if pid else None)
-               for pid in project_ids] if project_ids else [count(None)]
-        return sum(ret)
+        project_ids = [self._project_id_neutron_to_vnc(pid) if pid else None
+                       for pid in project_ids]
+        if len(project_ids) == 1:
+            return count(project_ids[0])
+
+        pool = eventlet.GreenPool(self.count_pool_size)
+        return sum(pool.imap(count, project_ids))
 
 
 class VMachineHandler(ResourceGetHandler, ResourceCreateHandler,
@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import uuid
 
 from cfgm_common import exceptions as vnc_exc
@@ -23,6 +24,43 @@ import router_res_handler as router_handler
 import vmi_res_handler as vmi_handler
 
 
+class FloatingIpPoolNetworks(object):
+    """Process local LRU of the floating ip pool id to network id mappings.
+
+    Floating ips of a network are allocated from a handful of pools. A pool
+    never changes parent network, so the network id is resolved from the
+    fq_name once per pool and kept until max_entries is exceeded. Unlike
+    the network fq_name, the pool id is not reused should the network be
+    re-created.
+    """
+
+    def __init__(self, max_entries=1000):
+        self._max_entries = max_entries
+        self._net_ids = collections.OrderedDict()
+
+    def network_id(self, vnc_lib, fip_obj):
+        """Returns the id of the network fip_obj is allocated from."""
+        pool_id = fip_obj.parent_uuid
+        net_id = self._net_ids.pop(pool_id, None)
+        if net_id is None:
+            net_id = vnc_lib.fq_name_to_id('virtual-network',
+                                           fip_obj.get_fq_name()[:-2])
+            if pool_id is None:
+                return net_id
+            while len(self._net_ids) >= self._max_entries:
+                self._net_ids.popitem(last=False)
+        # (re)insert as most recently used
+        self._net_ids[pool_id] = net_id
+        return net_id
+
+    def clear(self):
+        self._net_ids.clear()
+
+
+# shared by all the clients of the process, pool ids being unique
+pool_networks = FloatingIpPoolNetworks()
+
+
 class FloatingIpMixin(object):
 
     def _neutron_dict_to_fip_obj(self, fip_q, is_admin=False,
@@ -34,8 +72,7 @@ class FloatingIpMixin(object):
                 self._raise_contrail_exception('FloatingIPNotFound',
                                                floatingip_id=fip_q['id'])
 
-        vmi_get_handler = vmi_handler.VMInterfaceGetHandler(
-            self._vnc_lib)
+        vmi_get_handler = self._get_handler(vmi_handler.VMInterfaceGetHandler)
         port_id = fip_q.get('port_id')
         if port_id:
             vmi_obj = vmi_get_handler.get_vmi_obj(port_id)
@@ -71,23 +108,31 @@ class FloatingIpMixin(object):
 
         return fip_obj
 
-    def _fip_obj_to_neutron_dict(self, fip_obj, fields=None):
+    def _fip_obj_to_neutron_dict(self, fip_obj, fields=None,
+                                 fip_req_memo=None):
+        if fip_req_memo is None:
+            fip_req_memo = {}
         fip_q_dict = {}
-        vmi_get_handler = vmi_handler.VMInterfaceGetHandler(
-            self._vnc_lib)
+        vmi_get_handler = self._get_handler(vmi_handler.VMInterfaceGetHandler)
 
-        floating_net_id = self._vnc_lib.fq_name_to_id(
-            'virtual-network', fip_obj.get_fq_name()[:-2])
+        floating_net_id = pool_networks.network_id(self._vnc_lib, fip_obj)
         tenant_id = self._project_id_vnc_to_neutron(
             fip_obj.get_project_refs()[0]['uuid'])
 
         port_id = None
         router_id = None
         vmi_obj = None
+        # interfaces read in bulk by the caller, missing ones are gone
+        memo_vmis = fip_req_memo.get('virtual-machine-interfaces')
         vmi_refs = fip_obj.get_virtual_machine_interface_refs()
         for vmi_ref in vmi_refs or []:
             try:
-                vmi_obj = vmi_get_handler.get_vmi_obj(vmi_ref['uuid'])
+                if memo_vmis is None:
+                    vmi_obj = vmi_get_handler.get_vmi_obj(vmi_ref['uuid'])
+                elif vmi_ref['uuid'] in memo_vmis:
+                    vmi_obj = memo_vmis[vmi_ref['uuid']]
+                else:
+                    continue
 
                 # In case of floating ip on the Virtual-ip, svc-monitor will
                 # link floating ip to "right" interface of service VMs
@@ -103,9 +148,14 @@ class FloatingIpMixin(object):
                 pass
 
         if vmi_obj:
-            router_get_handler = router_handler.LogicalRouterGetHandler(
-                self._vnc_lib)
-            router_id = router_get_handler.get_vmi_obj_router_id(vmi_obj)
+            router_get_handler = self._get_handler(
+                router_handler.LogicalRouterGetHandler)
+            # one index serves all the floating ips of a request
+            if 'router-index' not in fip_req_memo:
+                fip_req_memo['router-index'] = (
+                    router_get_handler.get_network_router_index())
+            router_id = router_get_handler.get_vmi_obj_router_id(
+                vmi_obj, router_index=fip_req_memo['router-index'])
 
         fip_q_dict['id'] = fip_obj.uuid
         fip_q_dict['tenant_id'] = tenant_id
@@ -208,13 +258,11 @@ class FloatingIpGetHandler(res_handler.ResourceGetHandler, FloatingIpMixin):
 
         return self._fip_obj_to_neutron_dict(fip_obj, fields=fields)
 
-    def resource_list(self, context, filters=None, fields=None):
+    def _get_fip_objs(self, context, filters):
         # Read in floating ips with either
         # - port(s) as anchor
         # - project(s) as anchor
         # - none as anchor (floating-ip collection)
-        ret_list = []
-
         proj_ids = None
         port_ids = None
         if filters:
@@ -234,13 +282,27 @@ class FloatingIpGetHandler(res_handler.ResourceGetHandler, FloatingIpMixin):
         else:
             fip_objs = self._resource_list()
 
+        if filters and 'floating_ip_address' in filters:
+            fip_objs = [fip_obj for fip_obj in fip_objs
+                        if (fip_obj.get_floating_ip_address() in
+                            filters['floating_ip_address'])]
+        return fip_objs
+
+    def resource_list(self, context, filters=None, fields=None):
+        ret_list = []
+        fip_objs = self._get_fip_objs(context, filters)
+
+        # read the interfaces of all the floating ips at once
+        vmi_get_handler = self._get_handler(vmi_handler.VMInterfaceGetHandler)
+        vmi_ids = [vmi_ref['uuid'] for fip_obj in fip_objs
+                   for vmi_ref in (
+                       fip_obj.get_virtual_machine_interface_refs() or [])]
+        fip_req_memo = {'virtual-machine-interfaces': dict(
+            (vmi_obj.uuid, vmi_obj) for vmi_obj in
+            vmi_get_handler._resource_list_by_uuids(vmi_ids))}
         for fip_obj in fip_objs:
-            if 'floating_ip_address' in filters:
-                if (fip_obj.get_floating_ip_address() not in
-                        filters['floating_ip_address']):
-                    continue
-            ret_list.append(self._fip_obj_to_neutron_dict(fip_obj,
-                                                          fields=fields))
+            ret_list.append(self._fip_obj_to_neutron_dict(
+                fip_obj, fields=fields, fip_req_memo=fip_req_memo))
 
         return ret_list
 
@@ -249,8 +311,8 @@ class FloatingIpGetHandler(res_handler.ResourceGetHandler, FloatingIpMixin):
         if count is not None:
             return count
 
-        floatingip_info = self.resource_list(context=context, filters=filters)
-        return len(floatingip_info)
+        # the floating ips are counted without being converted
+        return len(self._get_fip_objs(context, filters))
 
 
 class FloatingIpHandler(FloatingIpGetHandler,
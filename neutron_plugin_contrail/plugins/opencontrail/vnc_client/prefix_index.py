@@ -0,0 +1,142 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import bisect
+import socket
+import struct
+
+
+def ip_to_int(ip_addr):
+    """Returns (family, integer value) of an IPv4 or IPv6 address string."""
+    if ':' in ip_addr:
+        high, low = struct.unpack(
+            '!QQ', socket.inet_pton(socket.AF_INET6, ip_addr))
+        return socket.AF_INET6, (high << 64) | low
+    return (socket.AF_INET,
+            struct.unpack('!I', socket.inet_pton(socket.AF_INET, ip_addr))[0])
+
+
+def cidr_to_range(cidr):
+    """Returns (family, first, last) integer addresses of a CIDR string."""
+    prefix, _, prefix_len = cidr.partition('/')
+    family, first = ip_to_int(prefix)
+    bits = 128 if family == socket.AF_INET6 else 32
+    host_mask = (1 << (bits - int(prefix_len or bits))) - 1
+    first &= ~host_mask
+    return family, first, first | host_mask
+
+
+class SubnetPrefixIndex(object):
+    """Maps addresses to the subnet of a network containing them.
+
+    Built from the subnet list of SubnetHandler.get_vn_subnets(), subnets
+    are kept per address family as integer intervals sorted by start
+    address, so a lookup is a bisect on integers. Should subnets overlap,
+    the first matching one in ipam order wins, as with a linear scan.
+    """
+
+    def __init__(self, subnets_info):
+        # family -> sorted [(first, last, position, subnet id)]
+        intervals = {}
+        for position, subnet_info in enumerate(subnets_info or []):
+            family, first, last = cidr_to_range(subnet_info['cidr'])
+            intervals.setdefault(family, []).append(
+                (first, last, position, subnet_info['id']))
+
+        self._starts = {}
+        self._intervals = {}
+        self._overlapping = set()
+        for family, family_intervals in intervals.items():
+            family_intervals.sort()
+            for prev, cur in zip(family_intervals, family_intervals[1:]):
+                if cur[0] <= prev[1]:
+                    self._overlapping.add(family)
+                    break
+            self._intervals[family] = family_intervals
+            self._starts[family] = [interval[0]
+                                    for interval in family_intervals]
+
+    def lookup(self, ip_addr):
+        """Returns the id of the subnet containing ip_addr, or None."""
+        try:
+            family, value = ip_to_int(ip_addr)
+        except (socket.error, ValueError, TypeError):
+            return None
+        intervals = self._intervals.get(family)
+        if not intervals:
+            return None
+
+        if family in self._overlapping:
+            matches = [interval for interval in intervals
+                       if interval[0] <= value <= interval[1]]
+            if not matches:
+                return None
+            return min(matches, key=lambda interval: interval[2])[3]
+
+        pos = bisect.bisect_right(self._starts[family], value) - 1
+        if pos >= 0 and value <= intervals[pos][1]:
+            return intervals[pos][3]
+        return None
+
+
+class CidrOverlapIndex(object):
+    """Finds which of a set of CIDRs overlap another one.
+
+    Built once from (cidr, value) pairs, CIDRs are kept per address family
+    as ranges sorted by first address along with the running maximum of
+    their last addresses. A range [first, last] overlaps some indexed range
+    iff the maximum last address of the ranges starting at or before last
+    is at least first, which takes a bisect to tell.
+    """
+
+    def __init__(self, cidrs=None):
+        ranges = {}
+        for position, (cidr, value) in enumerate(cidrs or []):
+            family, first, last = cidr_to_range(cidr)
+            ranges.setdefault(family, []).append(
+                (first, last, position, value))
+
+        self._ranges = {}
+        self._starts = {}
+        self._max_lasts = {}
+        for family, family_ranges in ranges.items():
+            family_ranges.sort()
+            max_lasts = []
+            for cidr_range in family_ranges:
+                max_lasts.append(max(cidr_range[1],
+                                     max_lasts[-1] if max_lasts else -1))
+            self._ranges[family] = family_ranges
+            self._starts[family] = [r[0] for r in family_ranges]
+            self._max_lasts[family] = max_lasts
+
+    def overlapping(self, cidr):
+        """Returns the values of the indexed CIDRs overlapping cidr.
+
+        The values are in the order the CIDRs were given.
+        """
+        family, first, last = cidr_to_range(cidr)
+        ranges = self._ranges.get(family)
+        if not ranges:
+            return []
+
+        max_lasts = self._max_lasts[family]
+        pos = bisect.bisect_right(self._starts[family], last) - 1
+        matches = []
+        # none of the ranges up to pos reaches first once max_lasts does not
+        while pos >= 0 and max_lasts[pos] >= first:
+            if ranges[pos][1] >= first:
+                matches.append(ranges[pos])
+            pos -= 1
+        return [match[3] for match in sorted(matches,
+                                             key=lambda match: match[2])]
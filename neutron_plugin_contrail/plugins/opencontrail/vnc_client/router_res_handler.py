@@ -12,16 +12,28 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+import time
+
 from cfgm_common import exceptions as vnc_exc
 import contrail_res_handler as res_handler
-import netaddr
 from neutron.common import constants as n_constants
+import prefix_index
 import subnet_res_handler as subnet_handler
 import vmi_res_handler as vmi_handler
+import vn_res_handler as vn_handler
 from vnc_api import vnc_api
 
 
 class LogicalRouterMixin(object):
+    # project id -> (expires at, index) of the last indexes built, common
+    # to all handlers
+    _router_indexes = {}
+
+    @staticmethod
+    def invalidate_router_index():
+        """Drops the indexes built, eg. as a router interface changed."""
+        LogicalRouterMixin._router_indexes.clear()
 
     @staticmethod
     def _get_external_gateway_info(rtr_obj):
@@ -150,6 +162,7 @@ class LogicalRouterDeleteHandler(res_handler.ResourceDeleteHandler,
             self._resource_delete(id=rtr_id)
         except vnc_exc.RefsExistError:
             self._raise_contrail_exception('RouterInUse', router_id=rtr_id)
+        self.invalidate_router_index()
 
 
 class LogicalRouterUpdateHandler(res_handler.ResourceUpdateHandler,
@@ -189,43 +202,81 @@ class LogicalRouterGetHandler(res_handler.ResourceGetHandler,
 
         return resp['logical-routers']
 
-    def _get_router_list_for_ids(self, rtr_ids, extensions_enabled=True):
+    def _get_router_list_for_ids(self, rtr_ids, extensions_enabled=True,
+                                 fields=None):
+        # missing routers are left out
+        rtr_objs = dict((rtr_obj.uuid, rtr_obj) for rtr_obj in
+                        self._resource_list_by_uuids(rtr_ids))
         ret_list = []
         for rtr_id in rtr_ids or []:
-            try:
-                rtr_obj = self._resource_get(id=rtr_id)
-                rtr_info = self._rtr_obj_to_neutron_dict(
-                    rtr_obj,
-                    contrail_extensions_enabled=extensions_enabled)
-                ret_list.append(rtr_info)
-            except vnc_exc.NoIdError:
-                pass
+            rtr_obj = rtr_objs.pop(rtr_id, None)
+            if rtr_obj is None:
+                continue
+            rtr_info = self._rtr_obj_to_neutron_dict(
+                rtr_obj,
+                contrail_extensions_enabled=extensions_enabled,
+                fields=fields)
+            ret_list.append(rtr_info)
         return ret_list
 
-    def _get_router_list_for_project(self, project_id=None):
-        project_rtrs = self._router_list_project(project_id=project_id)
-        rtr_uuids = [rtr['uuid'] for rtr in project_rtrs]
-        return self._get_router_list_for_ids(rtr_uuids)
+    def _get_router_list_for_project(self, project_id=None, fields=None):
+        return [self._rtr_obj_to_neutron_dict(rtr_obj, fields=fields)
+                for rtr_obj in self._router_list_project(
+                    project_id=project_id, detail=True)]
 
     def _fip_pool_ref_routers(self, project_id):
         """TODO."""
         return []
 
-    def get_vmi_obj_router_id(self, vmi_obj, project_id=None):
-        vmi_get_handler = vmi_handler.VMInterfaceGetHandler(
-            self._vnc_lib)
-
-        port_net_id = vmi_obj.get_virtual_network_refs()[0]['uuid']
-        # find router_id from port
+    def get_network_router_index(self, project_id=None):
+        """Returns a dict of the id of the router each network connects to.
+
+        The routers are listed in detail and their interfaces read in bulk.
+        Should a network connect to several routers, the first one listed
+        wins. Indexes are reused for router_index_ttl seconds if set, the
+        dict must not be modified.
+        """
+        router_index_ttl = self._kwargs.get('router_index_ttl', 0)
+        now = time.time()
+        if router_index_ttl:
+            expires_at, index = self._router_indexes.get(project_id,
+                                                         (0, None))
+            if expires_at > now:
+                return index
+
+        vmi_get_handler = self._get_handler(vmi_handler.VMInterfaceGetHandler)
         router_list = self._router_list_project(project_id=project_id,
                                                 detail=True)
+        vmi_ids = [vmi_ref['uuid'] for router_obj in router_list or []
+                   for vmi_ref in (
+                       router_obj.get_virtual_machine_interface_refs() or [])]
+        vmi_net_ids = {}
+        for vmi_obj in vmi_get_handler._resource_list_by_uuids(vmi_ids):
+            vn_refs = vmi_obj.get_virtual_network_refs()
+            if vn_refs:
+                vmi_net_ids[vmi_obj.uuid] = vn_refs[0]['uuid']
+
+        index = {}
         for router_obj in router_list or []:
-            for vmi in (router_obj.get_virtual_machine_interface_refs()
-                        or []):
-                vmi_obj = vmi_get_handler.get_vmi_obj(vmi['uuid'])
-                if (vmi_obj.get_virtual_network_refs()[0]['uuid'] ==
-                        port_net_id):
-                    return router_obj.uuid
+            for vmi_ref in (router_obj.get_virtual_machine_interface_refs()
+                            or []):
+                net_id = vmi_net_ids.get(vmi_ref['uuid'])
+                if net_id:
+                    index.setdefault(net_id, router_obj.uuid)
+
+        if router_index_ttl:
+            self._router_indexes[project_id] = (now + router_index_ttl,
+                                                index)
+        return index
+
+    def get_vmi_obj_router_id(self, vmi_obj, project_id=None,
+                              router_index=None):
+        if router_index is None:
+            router_index = self.get_network_router_index(project_id)
+
+        port_net_id = vmi_obj.get_virtual_network_refs()[0]['uuid']
+        # find router_id from port
+        return router_index.get(port_net_id)
 
     def resource_get(self, context, rtr_uuid, fields=None):
         try:
@@ -247,53 +298,47 @@ class LogicalRouterGetHandler(res_handler.ResourceGetHandler,
                 return ret_list
 
         if not filters:
-            return self._get_router_list_for_project()
+            return self._get_router_list_for_project(fields=fields)
 
-        all_rtrs = []  # all n/ws in all projects
         if 'id' in filters:
             return self._get_router_list_for_ids(filters['id'],
-                                                 extensions_enabled)
+                                                 extensions_enabled,
+                                                 fields=fields)
 
+        # routers are read in detail, a project at a time
+        rtr_lists = []
         if 'tenant_id' in filters:
             # read all routers in project, and prune below
             project_ids = self._validate_project_ids(
                 context, project_ids=filters['tenant_id'])
             for p_id in project_ids:
                 if 'router:external' in filters:
-                    all_rtrs.append(self._fip_pool_ref_routers(p_id))
+                    rtr_lists.append(functools.partial(
+                        self._fip_pool_ref_routers, p_id))
                 else:
-                    project_rtrs = self._router_list_project(p_id)
-                    all_rtrs.append(project_rtrs)
+                    rtr_lists.append(functools.partial(
+                        self._router_list_project, p_id, detail=True))
 
         else:
             # read all routers in all projects
-            project_rtrs = self._router_list_project()
-            all_rtrs.append(project_rtrs)
+            rtr_lists.append(functools.partial(self._router_list_project,
+                                               detail=True))
 
         # prune phase
-        for project_rtrs in all_rtrs:
-            for proj_rtr in project_rtrs:
-                proj_rtr_id = proj_rtr['uuid']
-                if not self._filters_is_present(filters, 'id', proj_rtr_id):
-                    continue
-
-                proj_rtr_fq_name = unicode(proj_rtr['fq_name'])
-                if not self._filters_is_present(filters, 'contrail:fq_name',
-                                                proj_rtr_fq_name):
-                    continue
-                try:
-                    rtr_obj = self._resource_get(id=proj_rtr['uuid'])
-                    if not self._filters_is_present(
-                            filters, 'name',
-                            rtr_obj.get_display_name() or rtr_obj.name):
-                        continue
-                    rtr_info = self._rtr_obj_to_neutron_dict(
-                        rtr_obj,
-                        contrail_extensions_enabled=extensions_enabled,
-                        fields=fields)
-                    ret_list.append(rtr_info)
-                except vnc_exc.NoIdError:
-                    continue
+        for rtr_obj in self._iter_lists(rtr_lists):
+            rtr_fq_name = unicode(rtr_obj.get_fq_name())
+            if not self._filters_is_present(filters, 'contrail:fq_name',
+                                            rtr_fq_name):
+                continue
+            if not self._filters_is_present(
+                    filters, 'name',
+                    rtr_obj.get_display_name() or rtr_obj.name):
+                continue
+            rtr_info = self._rtr_obj_to_neutron_dict(
+                rtr_obj,
+                contrail_extensions_enabled=extensions_enabled,
+                fields=fields)
+            ret_list.append(rtr_info)
 
         return ret_list
 
@@ -302,7 +347,7 @@ class LogicalRouterGetHandler(res_handler.ResourceGetHandler,
         if count is not None:
             return count
 
-        rtrs_info = self.router_list(filters=filters)
+        rtrs_info = self.resource_list(context, filters, fields=['id'])
         return len(rtrs_info)
 
 
@@ -313,11 +358,10 @@ class LogicalRouterInterfaceHandler(res_handler.ResourceGetHandler,
     resource_list_method = 'logical_routers_list'
     resource_update_method = 'logical_router_update'
 
-    def __init__(self, vnc_lib):
-        super(LogicalRouterInterfaceHandler, self).__init__(vnc_lib)
-        self._vmi_handler = vmi_handler.VMInterfaceHandler(
-            self._vnc_lib)
-        self._subnet_handler = subnet_handler.SubnetHandler(self._vnc_lib)
+    def __init__(self, vnc_lib, **kwargs):
+        super(LogicalRouterInterfaceHandler, self).__init__(vnc_lib, **kwargs)
+        self._vmi_handler = self._get_handler(vmi_handler.VMInterfaceHandler)
+        self._subnet_handler = self._get_handler(subnet_handler.SubnetHandler)
 
     def _get_subnet_cidr(self, subnet_id, subnet_dict):
         for subnet in subnet_dict:
@@ -331,45 +375,64 @@ class LogicalRouterInterfaceHandler(res_handler.ResourceGetHandler,
             if router_obj.get_virtual_machine_interface_refs():
                 vmis = [x['uuid']
                         for x in router_obj.virtual_machine_interface_refs]
-                router_vmi_objs = self._vnc_lib.virtual_machine_interfaces_list(
-                    obj_uuids=vmis, detail=True,
-                    fields=['instance_ip_back_refs'])
+                router_vmi_objs = self._vmi_handler._resource_list_by_uuids(
+                    vmis, fields=['instance_ip_back_refs'])
             # It's possible router ports are on the same network, but
             # different subnets.
-            new_ipnet = netaddr.IPNetwork(subnet_cidr)
+            # read the networks and instance ips of all the ports at once
+            net_ids = set()
+            for vmi_obj in router_vmi_objs:
+                net_ids.add(self._vmi_handler.get_vmi_net_id(vmi_obj))
+            net_ids.discard(None)
+            # long uuid lists are split over several list queries
+            vn_get_handler = self._get_handler(vn_handler.VNetworkGetHandler)
+            vn_objs = {}
+            for vn_obj in vn_get_handler._resource_list_by_uuids(
+                    list(net_ids)):
+                vn_objs[vn_obj.uuid] = vn_obj
             port_req_memo = {'virtual-machines': {},
                              'instance-ips': {},
                              'subnets': {}}
+            for ip_obj in self._vmi_handler._get_vmi_iip_objs(
+                    router_vmi_objs):
+                port_req_memo['instance-ips'][ip_obj.uuid] = ip_obj
+
+            router_cidrs = []
             for vmi_obj in router_vmi_objs:
-                net_id = self._vmi_handler.get_vmi_net_id(vmi_obj)
-                vn_obj = self._vnc_lib.virtual_network_read(id=net_id)
+                vn_obj = vn_objs.get(self._vmi_handler.get_vmi_net_id(vmi_obj))
+                if vn_obj is None:
+                    continue
+                vn_subnets = port_req_memo['subnets'].get(vn_obj.uuid)
+                if vn_subnets is None:
+                    vn_subnets = (
+                        subnet_handler.SubnetHandler.get_vn_subnets(vn_obj))
+                    port_req_memo['subnets'][vn_obj.uuid] = vn_subnets
 
                 fixed_ips = self._vmi_handler.get_vmi_ip_dict(vmi_obj, vn_obj,
                                                               port_req_memo)
-                vn_subnets = (
-                    subnet_handler.SubnetHandler.get_vn_subnets(
-                        vn_obj))
                 for ip in fixed_ips:
                     if ip['subnet_id'] == subnet_id:
                         msg = ("Router %s already has a port on subnet %s"
                                % (router_obj.uuid, subnet_id))
                         self._raise_contrail_exception(
                             'BadRequest', resource='router', msg=msg)
-                    sub_id = ip['subnet_id']
-                    cidr = self._get_subnet_cidr(sub_id, vn_subnets)
-                    ipnet = netaddr.IPNetwork(cidr)
-                    match1 = netaddr.all_matching_cidrs(new_ipnet, [cidr])
-                    match2 = netaddr.all_matching_cidrs(ipnet, [subnet_cidr])
-                    if match1 or match2:
-                        data = {'subnet_cidr': subnet_cidr,
-                                'subnet_id': subnet_id,
-                                'cidr': cidr,
-                                'sub_id': sub_id}
-                        msg = (("Cidr %(subnet_cidr)s of subnet "
-                                "%(subnet_id)s overlaps with cidr %(cidr)s "
-                                "of subnet %(sub_id)s") % data)
-                        self._raise_contrail_exception(
-                            'BadRequest', resource='router', msg=msg)
+                    cidr = self._get_subnet_cidr(ip['subnet_id'], vn_subnets)
+                    if cidr:
+                        router_cidrs.append((cidr, (ip['subnet_id'], cidr)))
+
+            overlaps = prefix_index.CidrOverlapIndex(
+                router_cidrs).overlapping(subnet_cidr)
+            if overlaps:
+                sub_id, cidr = overlaps[0]
+                data = {'subnet_cidr': subnet_cidr,
+                        'subnet_id': subnet_id,
+                        'cidr': cidr,
+                        'sub_id': sub_id}
+                msg = (("Cidr %(subnet_cidr)s of subnet "
+                        "%(subnet_id)s overlaps with cidr %(cidr)s "
+                        "of subnet %(sub_id)s") % data)
+                self._raise_contrail_exception(
+                    'BadRequest', resource='router', msg=msg)
         except vnc_exc.NoIdError:
             pass
 
@@ -391,6 +454,10 @@ class LogicalRouterInterfaceHandler(res_handler.ResourceGetHandler,
             subnet_id = fixed_ips[0]['subnet_id']
 
         subnet_vnc = self._subnet_handler._subnet_read(subnet_id=subnet_id)
+        if subnet_vnc is None:
+            self._raise_contrail_exception('SubnetNotFound',
+                                           subnet_id=subnet_id,
+                                           resource='router')
         if not subnet_vnc.default_gateway:
             self._raise_contrail_exception(
                 'BadRequest', resource='router',
@@ -460,6 +527,7 @@ class LogicalRouterInterfaceHandler(res_handler.ResourceGetHandler,
         self._vnc_lib.virtual_machine_interface_update(vmi_obj)
         router_obj.add_virtual_machine_interface(vmi_obj)
         self._resource_update(router_obj)
+        self.invalidate_router_index()
         info = {
             'id': router_id,
             'tenant_id': self._project_id_vnc_to_neutron(vn_obj.parent_uuid),
@@ -502,6 +570,7 @@ class LogicalRouterInterfaceHandler(res_handler.ResourceGetHandler,
             vmi_obj = self._vnc_lib.virtual_machine_interface_read(id=port_id)
         router_obj.del_virtual_machine_interface(vmi_obj)
         self._vnc_lib.logical_router_update(router_obj)
+        self.invalidate_router_index()
         self._vmi_handler.resource_delete(context, port_id=port_id)
         info = {'id': router_id,
                 'tenant_id': tenant_id,
@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 import uuid
 
 from cfgm_common import exceptions as vnc_exc
@@ -42,8 +43,9 @@ class SecurityGroupMixin(object):
 
         # get security group rules
         sg_q_dict['security_group_rules'] = []
-        rule_list = sgrule_handler.SecurityGroupRuleHandler(
-            self._vnc_lib).security_group_rules_read(sg_obj)
+        rule_list = self._get_handler(
+            sgrule_handler.SecurityGroupRuleHandler).security_group_rules_read(
+            sg_obj)
 
         if rule_list:
             for rule in rule_list:
@@ -177,45 +179,64 @@ class SecurityGroupGetHandler(SecurityGroupBaseGet, SecurityGroupMixin):
         # collect phase
         self._ensure_default_security_group_exists(context['tenant'])
 
-        all_sgs = []  # all sgs in all projects
+        # sgs in all projects, a project is only read once the previous
+        # one is pruned
+        sg_lists = []
         if context and not context['is_admin']:
-            project_sgs = self.resource_list_by_project(
+            sg_lists.append(functools.partial(
+                self.resource_list_by_project,
                 self._project_id_neutron_to_vnc(context['tenant']),
-                filters=filters)
-            all_sgs.append(project_sgs)
+                filters=filters))
         else:  # admin context
             if filters and 'tenant_id' in filters:
                 project_ids = self._validate_project_ids(
                     context, filters['tenant_id'])
                 for p_id in project_ids:
-                    project_sgs = self.resource_list_by_project(p_id,
-                                                                filters=filters)
-                    all_sgs.append(project_sgs)
+                    sg_lists.append(functools.partial(
+                        self.resource_list_by_project, p_id,
+                        filters=filters))
             else:  # no tenant id filter
-                all_sgs.append(self.resource_list_by_project(None,
-                                                             filters=filters))
+                sg_lists.append(functools.partial(
+                    self.resource_list_by_project, None, filters=filters))
 
         # prune phase
-        no_rule = res_handler.SGHandler(
-            self._vnc_lib).get_no_rule_security_group(create=False)
-        for project_sgs in all_sgs:
-            for sg_obj in project_sgs:
-                if no_rule and sg_obj.uuid == no_rule.uuid:
-                    continue
-                if not self._filters_is_present(
-                        filters, 'name',
-                        sg_obj.get_display_name() or sg_obj.name):
-                    continue
-                if not self._filters_is_present(
-                        filters, 'description',
-                        sg_obj.get_id_perms().get_description()):
-                    continue
-                sg_info = self._security_group_vnc_to_neutron(
-                    sg_obj, contrail_extensions_enabled, fields=fields)
-                ret_list.append(sg_info)
+        no_rule = self._get_handler(
+            res_handler.SGHandler).get_no_rule_security_group(create=False)
+        for sg_obj in self._iter_lists(sg_lists):
+            if no_rule and sg_obj.uuid == no_rule.uuid:
+                continue
+            if not self._filters_is_present(
+                    filters, 'name',
+                    sg_obj.get_display_name() or sg_obj.name):
+                continue
+            if not self._filters_is_present(
+                    filters, 'description',
+                    sg_obj.get_id_perms().get_description()):
+                continue
+            sg_info = self._security_group_vnc_to_neutron(
+                sg_obj, contrail_extensions_enabled, fields=fields)
+            ret_list.append(sg_info)
 
         return ret_list
 
+    def resource_count(self, context, filters=None):
+        self._ensure_default_security_group_exists(context['tenant'])
+        if not context['is_admin']:
+            # as listed, only the groups of the tenant are counted
+            filters = dict(filters or {}, tenant_id=[context['tenant']])
+        count = self._resource_count_optimized(filters)
+        if count is None:
+            return len(self.resource_list(context, filters, fields=['id']))
+
+        if not filters:
+            # the group of ports without any is counted but not listed
+            no_rule = self._get_handler(
+                res_handler.SGHandler).get_no_rule_security_group(
+                    create=False)
+            if no_rule:
+                count -= 1
+        return count
+
 
 class SecurityGroupDeleteHandler(SecurityGroupBaseGet,
                                  res_handler.ResourceDeleteHandler):
@@ -239,6 +260,7 @@ class SecurityGroupDeleteHandler(SecurityGroupBaseGet,
         except vnc_exc.RefsExistError:
             self._raise_contrail_exception(
                 'SecurityGroupInUse', id=sg_id, resource='security_group')
+        sgrule_handler.rule_index.drop_sg(sg_id)
 
 
 class SecurityGroupUpdateHandler(res_handler.ResourceUpdateHandler,
@@ -248,6 +270,7 @@ class SecurityGroupUpdateHandler(res_handler.ResourceUpdateHandler,
 
     def resource_update_obj(self, sg_obj):
         self._resource_update(sg_obj)
+        sgrule_handler.rule_index.index_sg(sg_obj)
 
     def resource_update(self, context, sg_id, sg_q):
         sg_q['id'] = sg_id
@@ -262,6 +285,7 @@ class SecurityGroupUpdateHandler(res_handler.ResourceUpdateHandler,
                 'SecurityGroupNotFound', id=sg_id, resource='security_group')
 
         self._resource_update(sg_obj)
+        sgrule_handler.rule_index.index_sg(sg_obj)
 
         ret_sg_q = self._security_group_vnc_to_neutron(
             sg_obj, contrail_extensions_enabled)
@@ -313,8 +337,9 @@ class SecurityGroupCreateHandler(res_handler.ResourceCreateHandler,
         def_rule['protocol'] = 'any'
         def_rule['ethertype'] = 'IPv4'
         def_rule['security_group_id'] = sg_uuid
-        sgrule_handler.SecurityGroupRuleHandler(
-            self._vnc_lib).resource_create(context, def_rule)
+        self._get_handler(
+            sgrule_handler.SecurityGroupRuleHandler).resource_create(
+            context, def_rule)
 
         def_rule = {}
         def_rule['port_range_min'] = 0
@@ -325,8 +350,9 @@ class SecurityGroupCreateHandler(res_handler.ResourceCreateHandler,
         def_rule['protocol'] = 'any'
         def_rule['ethertype'] = 'IPv6'
         def_rule['security_group_id'] = sg_uuid
-        sgrule_handler.SecurityGroupRuleHandler(
-            self._vnc_lib).resource_create(context, def_rule)
+        self._get_handler(
+            sgrule_handler.SecurityGroupRuleHandler).resource_create(
+            context, def_rule)
 
         ret_sg_q = self._security_group_vnc_to_neutron(
             sg_obj, contrail_extensions_enabled)
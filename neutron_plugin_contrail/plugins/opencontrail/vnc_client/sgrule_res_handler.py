@@ -12,9 +12,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import uuid
 
 from cfgm_common import exceptions as vnc_exc
+import eventlet
 from neutron.common import constants
 from vnc_api import vnc_api
 
@@ -22,7 +24,66 @@ import contrail_res_handler as res_handler
 import sg_res_handler as sg_handler
 
 
+class SecurityGroupRuleIndex(object):
+    """Process local index of the rules of the security groups seen.
+
+    Maps a rule uuid to the uuid of its group and its position among the
+    group entries. Groups are indexed as they are scanned for a rule and
+    as they are updated or deleted by this process. Others may change
+    them meanwhile, so an entry is only a hint to check against the group.
+    Once more than max_entries rules are indexed, the groups least
+    recently indexed or looked up are dropped.
+    """
+
+    def __init__(self, max_entries=10000):
+        self._max_entries = max_entries
+        # rule uuid -> (sg uuid, position)
+        self._rules = {}
+        # sg uuid -> rule uuids, least recently used first
+        self._sg_rules = collections.OrderedDict()
+
+    def index_sg(self, sg_obj):
+        self.drop_sg(sg_obj.uuid)
+        sgr_entries = sg_obj.get_security_group_entries()
+        if sgr_entries is None:
+            return
+        rule_ids = []
+        for position, sg_rule in enumerate(sgr_entries.get_policy_rule()):
+            rule_id = sg_rule.get_rule_uuid()
+            self._rules[rule_id] = (sg_obj.uuid, position)
+            rule_ids.append(rule_id)
+        self._sg_rules[sg_obj.uuid] = rule_ids
+        # the group just indexed is kept even if larger than max_entries
+        while (len(self._rules) > self._max_entries and
+               len(self._sg_rules) > 1):
+            self.drop_sg(next(iter(self._sg_rules)))
+
+    def drop_sg(self, sg_id):
+        for rule_id in self._sg_rules.pop(sg_id, []):
+            if self._rules.get(rule_id, (None,))[0] == sg_id:
+                del self._rules[rule_id]
+
+    def lookup(self, rule_id):
+        """Returns (sg uuid, position) of rule_id, or (None, None)."""
+        sg_id, position = self._rules.get(rule_id, (None, None))
+        if sg_id is not None:
+            # (re)insert as most recently used
+            self._sg_rules[sg_id] = self._sg_rules.pop(sg_id)
+        return sg_id, position
+
+    def clear(self):
+        self._rules.clear()
+        self._sg_rules.clear()
+
+
+# shared by all the handlers of the process
+rule_index = SecurityGroupRuleIndex()
+
+
 class SecurityGroupRuleMixin(object):
+    # projects scanned concurrently for a rule missing from the index
+    rule_find_pool_size = 10
+
     def _security_group_rule_vnc_to_neutron(self, sg_id, sg_rule,
                                             sg_obj=None, fields=None):
         sgr_q_dict = {}
@@ -31,8 +92,8 @@ class SecurityGroupRuleMixin(object):
 
         if not sg_obj:
             try:
-                sg_obj = sg_handler.SecurityGroupHandler(
-                    self._vnc_lib).get_sg_obj(id=sg_id)
+                sg_obj = self._get_handler(
+                    sg_handler.SecurityGroupHandler).get_sg_obj(id=sg_id)
             except vnc_exc.NoIdError:
                 self._raise_contrail_exception(
                     'SecurityGroupNotFound',
@@ -62,8 +123,9 @@ class SecurityGroupRuleMixin(object):
                 remote_sg = addr.get_security_group()
                 try:
                     if remote_sg != ':'.join(sg_obj.get_fq_name()):
-                        remote_sg_obj = sg_handler.SecurityGroupHandler(
-                            self._vnc_lib).get_sg_obj(fq_name_str=remote_sg)
+                        remote_sg_obj = self._get_handler(
+                            sg_handler.SecurityGroupHandler).get_sg_obj(
+                            fq_name_str=remote_sg)
                     else:
                         remote_sg_obj = sg_obj
                     remote_sg_uuid = remote_sg_obj.uuid
@@ -99,26 +161,71 @@ class SecurityGroupRuleMixin(object):
         return sgr_q_dict
     # end _security_group_rule_vnc_to_neutron
 
+    @staticmethod
+    def _sg_rule_lookup(sg_obj, sgr_id, position=None):
+        sgr_entries = sg_obj.get_security_group_entries()
+        if sgr_entries is None:
+            return None
+        sg_rules = sgr_entries.get_policy_rule()
+        if (position is not None and position < len(sg_rules) and
+                sg_rules[position].get_rule_uuid() == sgr_id):
+            return sg_rules[position]
+        for sg_rule in sg_rules:
+            if sg_rule.get_rule_uuid() == sgr_id:
+                return sg_rule
+        return None
+
+    def _security_group_rule_find_indexed(self, sgr_id):
+        sg_id, position = rule_index.lookup(sgr_id)
+        if sg_id is None:
+            return None, None
+        try:
+            sg_obj = self._get_handler(
+                sg_handler.SecurityGroupHandler).get_sg_obj(id=sg_id)
+        except vnc_exc.NoIdError:
+            rule_index.drop_sg(sg_id)
+            return None, None
+
+        sg_rule = self._sg_rule_lookup(sg_obj, sgr_id, position)
+        if sg_rule is None:
+            # the group changed meanwhile
+            rule_index.index_sg(sg_obj)
+            return None, None
+        return sg_obj, sg_rule
+
     def _security_group_rule_find(self, sgr_id, project_uuid=None):
+        sg_obj, sg_rule = self._security_group_rule_find_indexed(sgr_id)
+        if sg_obj:
+            if project_uuid and sg_obj.parent_uuid != project_uuid:
+                return None, None
+            return sg_obj, sg_rule
+
         dom_projects = []
         if not project_uuid:
             dom_projects = self._project_list_domain(None)
         else:
             dom_projects = [{'uuid': project_uuid}]
 
-        for project in dom_projects:
-            proj_id = project['uuid']
-            project_sgs = sg_handler.SecurityGroupHandler(
-                self._vnc_lib).resource_list_by_project(proj_id)
-
+        def _scan_project(project):
+            found = None
+            project_sgs = self._get_handler(
+                sg_handler.SecurityGroupHandler).resource_list_by_project(
+                project['uuid'])
             for sg_obj in project_sgs:
-                sgr_entries = sg_obj.get_security_group_entries()
-                if sgr_entries is None:
-                    continue
-
-                for sg_rule in sgr_entries.get_policy_rule():
-                    if sg_rule.get_rule_uuid() == sgr_id:
-                        return sg_obj, sg_rule
+                rule_index.index_sg(sg_obj)
+                sg_rule = self._sg_rule_lookup(sg_obj, sgr_id)
+                if sg_rule is not None and found is None:
+                    found = sg_obj, sg_rule
+            return found
+
+        if len(dom_projects) == 1:
+            results = [_scan_project(dom_projects[0])]
+        else:
+            pool = eventlet.GreenPool(self.rule_find_pool_size)
+            results = pool.imap(_scan_project, dom_projects)
+        for found in results:
+            if found:
+                return found
 
         return None, None
     # end _security_group_rule_find
@@ -163,27 +270,30 @@ class SecurityGroupRuleGetHandler(res_handler.ResourceGetHandler,
         return sg_rules
     # end security_group_rules_read
 
-    def resource_list(self, context, filters=None, fields=None):
-        ret_list = []
-
-        # collect phase
+    def _get_sg_lists(self, context, filters):
+        sg_handler_obj = self._get_handler(sg_handler.SecurityGroupHandler)
         all_sgs = []
         if filters and 'tenant_id' in filters:
             project_ids = self._validate_project_ids(context,
                                                      filters['tenant_id'])
             for p_id in project_ids:
-                project_sgs = sg_handler.SecurityGroupHandler(
-                    self._vnc_lib).resource_list_by_project(p_id)
+                project_sgs = sg_handler_obj.resource_list_by_project(p_id)
 
                 all_sgs.append(project_sgs)
         else:  # no filters
             p_id = None
             if context and not context['is_admin']:
                 p_id = self._project_id_neutron_to_vnc(context['tenant'])
-            project_sgs = sg_handler.SecurityGroupHandler(
-                self._vnc_lib).resource_list_by_project(p_id)
+            project_sgs = sg_handler_obj.resource_list_by_project(p_id)
 
             all_sgs.append(project_sgs)
+        return all_sgs
+
+    def resource_list(self, context, filters=None, fields=None):
+        ret_list = []
+
+        # collect phase
+        all_sgs = self._get_sg_lists(context, filters)
 
         # prune phase
         for project_sgs in all_sgs:
@@ -197,6 +307,21 @@ class SecurityGroupRuleGetHandler(res_handler.ResourceGetHandler,
 
         return ret_list
 
+    def resource_count(self, context, filters=None):
+        # rules are entries of their group, count them without converting
+        filter_ids = filters.get('id') if filters else None
+        count = 0
+        for project_sgs in self._get_sg_lists(context, filters):
+            for sg_obj in project_sgs:
+                sgr_entries = sg_obj.get_security_group_entries()
+                if sgr_entries is None:
+                    continue
+                for sg_rule in sgr_entries.get_policy_rule():
+                    if (not filter_ids or
+                            sg_rule.get_rule_uuid() in filter_ids):
+                        count += 1
+        return count
+
 
 class SecurityGroupRuleDeleteHandler(res_handler.ResourceDeleteHandler,
                                      SecurityGroupRuleMixin):
@@ -204,8 +329,8 @@ class SecurityGroupRuleDeleteHandler(res_handler.ResourceDeleteHandler,
         rules = sg_obj.get_security_group_entries()
         rules.get_policy_rule().remove(sg_rule)
         sg_obj.set_security_group_entries(rules)
-        sg_handler.SecurityGroupHandler(
-            self._vnc_lib).resource_update_obj(sg_obj)
+        self._get_handler(
+            sg_handler.SecurityGroupHandler).resource_update_obj(sg_obj)
         return
     # end _security_group_rule_delete
 
@@ -225,6 +350,7 @@ class SecurityGroupRuleDeleteHandler(res_handler.ResourceDeleteHandler,
 class SecurityGroupRuleCreateHandler(res_handler.ResourceCreateHandler,
                                      SecurityGroupRuleMixin):
     resource_create_method = "security_group_rule_create"
+    bulk_create_serialize_on = 'security_group_id'
 
     def _convert_protocol(self, value):
         IP_PROTOCOL_MAP = {constants.PROTO_NUM_TCP: constants.PROTO_NAME_TCP,
@@ -316,8 +442,9 @@ class SecurityGroupRuleCreateHandler(res_handler.ResourceCreateHandler,
                 subnet=vnc_api.SubnetType(pfx, pfx_len))]
         elif sgr_q['remote_group_id']:
             try:
-                sg_obj = sg_handler.SecurityGroupHandler(
-                    self._vnc_lib).get_sg_obj(id=sgr_q['remote_group_id'])
+                sg_obj = self._get_handler(
+                    sg_handler.SecurityGroupHandler).get_sg_obj(
+                    id=sgr_q['remote_group_id'])
             except vnc_exc.NoIdError:
                 self._raise_contrail_exception('SecurityGroupNotFound',
                                                id=sgr_q['remote_group_id'],
@@ -360,7 +487,7 @@ class SecurityGroupRuleCreateHandler(res_handler.ResourceCreateHandler,
     # end _security_group_rule_neutron_to_vnc
 
     def _security_group_rule_create(self, sg_id, sg_rule, project_id):
-        sghandler = sg_handler.SecurityGroupHandler(self._vnc_lib)
+        sghandler = self._get_handler(sg_handler.SecurityGroupHandler)
         try:
             sg_vnc = sghandler.get_sg_obj(id=sg_id)
         except vnc_exc.NoIdError:
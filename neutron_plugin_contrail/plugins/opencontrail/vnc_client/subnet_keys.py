@@ -0,0 +1,135 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+
+from cfgm_common import exceptions as vnc_exc
+import eventlet
+
+
+def network_has_subnet(vn_obj, subnet_id):
+    """Tells whether subnet_id is one of the subnets of vn_obj."""
+    for ipam_ref in vn_obj.get_network_ipam_refs() or []:
+        for subnet_vnc in ipam_ref['attr'].get_ipam_subnets() or []:
+            if subnet_vnc.subnet_uuid == subnet_id:
+                return True
+    return False
+
+
+class SubnetKeyResolver(object):
+    """Process local LRU of the subnet id to subnet key mappings.
+
+    The API server keeps the key of a subnet, '<network uuid> <cidr>', in
+    its key-value store under the subnet id. That key never changes for the
+    lifetime of the subnet id, so mappings are kept without expiry until
+    the subnet or its network is deleted, or max_entries is exceeded. The
+    reverse key to id mapping is not cached: a key is reused when a subnet
+    is re-created with the same cidr.
+
+    A subnet deleted by another server keeps its mapping here, callers
+    must check the network still holds the subnet, and evict the mapping
+    otherwise.
+    """
+
+    def __init__(self, max_entries=10000, pool_size=10):
+        self._max_entries = max_entries
+        self._pool_size = pool_size
+        self._keys = collections.OrderedDict()
+
+    def _cached(self, subnet_id):
+        subnet_key = self._keys.pop(subnet_id, None)
+        if subnet_key is not None:
+            # refresh LRU position
+            self._keys[subnet_id] = subnet_key
+        return subnet_key
+
+    def _store(self, subnet_id, subnet_key):
+        self._keys.pop(subnet_id, None)
+        while len(self._keys) >= self._max_entries:
+            self._keys.popitem(last=False)
+        self._keys[subnet_id] = subnet_key
+
+    def resolve(self, vnc_lib, subnet_id):
+        """Returns the key of subnet_id, raises NoIdError if unknown."""
+        subnet_key = self._cached(subnet_id)
+        if subnet_key is None:
+            subnet_key = vnc_lib.kv_retrieve(subnet_id)
+            self._store(subnet_id, subnet_key)
+        return subnet_key
+
+    def resolve_many(self, vnc_lib, subnet_ids):
+        """Returns a dict of the keys of the known subnet_ids.
+
+        The mappings not cached are retrieved concurrently on a pool of
+        pool_size green threads.
+        """
+        keys = {}
+        missing = []
+        for subnet_id in subnet_ids:
+            subnet_key = self._cached(subnet_id)
+            if subnet_key is not None:
+                keys[subnet_id] = subnet_key
+            elif subnet_id not in missing:
+                missing.append(subnet_id)
+
+        def _retrieve(subnet_id):
+            try:
+                return subnet_id, vnc_lib.kv_retrieve(subnet_id)
+            except vnc_exc.NoIdError:
+                return subnet_id, None
+
+        if len(missing) == 1:
+            results = [_retrieve(missing[0])]
+        else:
+            results = eventlet.GreenPool(self._pool_size).imap(_retrieve,
+                                                               missing)
+        for subnet_id, subnet_key in results:
+            if subnet_key is not None:
+                self._store(subnet_id, subnet_key)
+                keys[subnet_id] = subnet_key
+        return keys
+
+    def resolve_network(self, vnc_lib, subnet_id):
+        """Returns (key, network object) of subnet_id.
+
+        Raises NoIdError, evicting the mapping, unless the network still
+        holds the subnet.
+        """
+        subnet_key = self.resolve(vnc_lib, subnet_id)
+        try:
+            vn_obj = vnc_lib.virtual_network_read(id=subnet_key.split()[0])
+        except vnc_exc.NoIdError:
+            self.evict(subnet_id)
+            raise
+        if not network_has_subnet(vn_obj, subnet_id):
+            self.evict(subnet_id)
+            raise vnc_exc.NoIdError(subnet_id)
+        return subnet_key, vn_obj
+
+    def evict(self, subnet_id):
+        self._keys.pop(subnet_id, None)
+
+    def evict_network(self, net_id):
+        """Drops the mappings of all the subnets of network net_id."""
+        prefix = '%s ' % net_id
+        for subnet_id, subnet_key in self._keys.items():
+            if subnet_key.startswith(prefix):
+                del self._keys[subnet_id]
+
+    def clear(self):
+        self._keys.clear()
+
+
+# shared by all the clients of the process, subnet ids being unique
+resolver = SubnetKeyResolver()
@@ -12,12 +12,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 import uuid
 
 from cfgm_common import exceptions as vnc_exc
 import contrail_res_handler as res_handler
 from contrail_res_handler import ContrailResourceHandler
 import netaddr
+import prefix_index
+import subnet_keys
 import vn_res_handler as vn_handler
 from vnc_api import vnc_api
 
@@ -42,6 +45,32 @@ class SubnetMixin(object):
         network = netaddr.IPNetwork('%s/%s' % (pfx, pfx_len))
         return '%s %s/%s' % (net_id, str(network.ip), pfx_len)
 
+    def _subnet_vnc_matches(self, subnet_vnc, net_id, subnet_key,
+                            subnet_id=None):
+        # a cached key may outlive its subnet, deleted or re-created with
+        # the same cidr by another server, the id must match too
+        return (self._subnet_vnc_get_key(subnet_vnc, net_id) == subnet_key
+                and (subnet_id is None or
+                     subnet_vnc.subnet_uuid == subnet_id))
+
+    def _subnet_not_found(self, subnet_id):
+        subnet_keys.resolver.evict(subnet_id)
+        self._raise_contrail_exception('SubnetNotFound',
+                                       subnet_id=subnet_id,
+                                       resource='subnet')
+
+    @staticmethod
+    def _subnet_vnc_cidr(subnet_vnc):
+        return '%s/%s' % (subnet_vnc.subnet.get_ip_prefix(),
+                          subnet_vnc.subnet.get_ip_prefix_len())
+
+    @staticmethod
+    def subnet_cidr_index(subnet_vncs):
+        """Indexes subnet_vncs by cidr, for overlap queries."""
+        return prefix_index.CidrOverlapIndex(
+            (SubnetMixin._subnet_vnc_cidr(subnet_vnc), subnet_vnc)
+            for subnet_vnc in subnet_vncs or [])
+
     def subnet_cidr_overlaps(self, subnet1, subnet2):
         cidr = lambda sn: netaddr.IPNetwork('%s/%s' % (
             sn.subnet.get_ip_prefix(), sn.subnet.get_ip_prefix_len()))
@@ -52,7 +81,7 @@ class SubnetMixin(object):
     def _subnet_vnc_read_mapping(self, id=None, key=None):
         if id:
             try:
-                subnet_key = self._vnc_lib.kv_retrieve(id)
+                subnet_key = subnet_keys.resolver.resolve(self._vnc_lib, id)
             except vnc_exc.NoIdError:
                 self._raise_contrail_exception('SubnetNotFound',
                                                subnet_id=id,
@@ -66,14 +95,31 @@ class SubnetMixin(object):
                 subnet_id = None
             return subnet_id
 
+    def _subnet_vnc_read_mappings(self, ids):
+        """Returns the keys of the subnets ids, in the order of ids."""
+        subnet_key_map = subnet_keys.resolver.resolve_many(self._vnc_lib, ids)
+        for subnet_id in ids:
+            if subnet_id not in subnet_key_map:
+                self._raise_contrail_exception('SubnetNotFound',
+                                               subnet_id=subnet_id,
+                                               resource='subnet')
+        return [subnet_key_map[subnet_id] for subnet_id in ids]
+
     def get_vn_obj_for_subnet_id(self, subnet_id):
-        subnet_key = self._vnc_lib.kv_retrieve(subnet_id)
+        subnet_key = self._subnet_vnc_read_mapping(id=subnet_id)
         net_uuid = subnet_key.split(' ')[0]
-        return self._resource_get(id=net_uuid)
+        try:
+            vn_obj = self._resource_get(id=net_uuid)
+        except vnc_exc.NoIdError:
+            self._subnet_not_found(subnet_id)
+        if not subnet_keys.network_has_subnet(vn_obj, subnet_id):
+            self._subnet_not_found(subnet_id)
+        return vn_obj
 
     def _subnet_read(self, subnet_key=None, subnet_id=None):
         if not subnet_key:
-            subnet_key = self._vnc_lib.kv_retrieve(subnet_id)
+            subnet_key = subnet_keys.resolver.resolve(self._vnc_lib,
+                                                      subnet_id)
 
         net_uuid = subnet_key.split(' ')[0]
         try:
@@ -87,10 +133,13 @@ class SubnetMixin(object):
         for ipam_ref in ipam_refs or []:
             subnet_vncs = ipam_ref['attr'].get_ipam_subnets()
             for subnet_vnc in subnet_vncs:
-                if self._subnet_vnc_get_key(subnet_vnc,
-                                            net_uuid) == subnet_key:
+                if self._subnet_vnc_matches(subnet_vnc, net_uuid,
+                                            subnet_key, subnet_id):
                     return subnet_vnc
 
+        if subnet_id:
+            subnet_keys.resolver.evict(subnet_id)
+
     def _get_allocation_pools_dict(self, alloc_objs, gateway_ip, cidr):
         allocation_pools = []
         for alloc_obj in alloc_objs or []:
@@ -352,6 +401,7 @@ class SubnetMixin(object):
 
 
 class SubnetCreateHandler(res_handler.ResourceCreateHandler, SubnetMixin):
+    bulk_create_serialize_on = 'network_id'
 
     def _get_netipam_obj(self, ipam_fq_name=None, vn_obj=None):
         if ipam_fq_name:
@@ -397,20 +447,23 @@ class SubnetCreateHandler(res_handler.ResourceCreateHandler, SubnetMixin):
             vnsn_data = vnc_api.VnSubnetsType([subnet_vnc])
             vn_obj.add_network_ipam(netipam_obj, vnsn_data)
         else:  # virtual-network already linked to this ipam
-            for subnet in net_ipam_ref['attr'].get_ipam_subnets():
-                if self.subnet_cidr_overlaps(subnet_vnc, subnet):
-                    existing_sn_id = self._subnet_vnc_read_mapping(
-                        key=self._subnet_vnc_get_key(subnet, net_id))
-                    # duplicate !!
-                    msg = ("Cidr %s overlaps with another subnet of subnet %s"
-                           ) % (subnet_q['cidr'], existing_sn_id)
-                    self._raise_contrail_exception(
-                        'BadRequest', resource='subnet', msg=msg)
+            overlaps = self.subnet_cidr_index(
+                net_ipam_ref['attr'].get_ipam_subnets()).overlapping(
+                    self._subnet_vnc_cidr(subnet_vnc))
+            if overlaps:
+                existing_sn_id = self._subnet_vnc_read_mapping(
+                    key=self._subnet_vnc_get_key(overlaps[0], net_id))
+                # duplicate !!
+                msg = ("Cidr %s overlaps with another subnet of subnet %s"
+                       ) % (subnet_q['cidr'], existing_sn_id)
+                self._raise_contrail_exception(
+                    'BadRequest', resource='subnet', msg=msg)
             vnsn_data = net_ipam_ref['attr']
             vnsn_data.ipam_subnets.append(subnet_vnc)
             # TODO(): Add 'ref_update' API that will set this field
             vn_obj._pending_field_updates.add('network_ipam_refs')
         self._resource_update(vn_obj)
+        vn_handler.VNetworkMixin.invalidate_shared_vns()
 
         # Read in subnet from server to get updated values for gw etc.
         subnet_vnc = self._subnet_read(subnet_key)
@@ -426,13 +479,16 @@ class SubnetDeleteHandler(res_handler.ResourceDeleteHandler, SubnetMixin):
         subnet_key = self._subnet_vnc_read_mapping(id=subnet_id)
         net_id = subnet_key.split()[0]
 
-        vn_obj = self._resource_get(id=net_id)
+        try:
+            vn_obj = self._resource_get(id=net_id)
+        except vnc_exc.NoIdError:
+            self._subnet_not_found(subnet_id)
         ipam_refs = vn_obj.get_network_ipam_refs()
         for ipam_ref in ipam_refs or []:
             orig_subnets = ipam_ref['attr'].get_ipam_subnets()
             new_subnets = [subnet_vnc for subnet_vnc in orig_subnets
-                           if self._subnet_vnc_get_key(
-                               subnet_vnc, net_id) != subnet_key]
+                           if not self._subnet_vnc_matches(
+                               subnet_vnc, net_id, subnet_key, subnet_id)]
             if len(orig_subnets) != len(new_subnets):
                 # matched subnet to be deleted
                 ipam_ref['attr'].set_ipam_subnets(new_subnets)
@@ -443,6 +499,11 @@ class SubnetDeleteHandler(res_handler.ResourceDeleteHandler, SubnetMixin):
                     self._raise_contrail_exception(
                         'SubnetInUse', subnet_id=subnet_id,
                         resource='subnet')
+                subnet_keys.resolver.evict(subnet_id)
+                vn_handler.VNetworkMixin.invalidate_shared_vns()
+                return
+
+        self._subnet_not_found(subnet_id)
 
 
 class SubnetGetHandler(res_handler.ResourceGetHandler, SubnetMixin):
@@ -456,63 +517,83 @@ class SubnetGetHandler(res_handler.ResourceGetHandler, SubnetMixin):
         try:
             vn_obj = self._resource_get(id=net_id)
         except vnc_exc.NoIdError:
-            self._raise_contrail_exception(
-                'SubnetNotFound', subnet_id=subnet_id, resource='subnet')
+            # the network was deleted by another server
+            subnet_keys.resolver.evict_network(net_id)
+            self._subnet_not_found(subnet_id)
 
         ipam_refs = vn_obj.get_network_ipam_refs()
         for ipam_ref in ipam_refs or []:
             subnet_vncs = ipam_ref['attr'].get_ipam_subnets()
             for subnet_vnc in subnet_vncs:
-                if self._subnet_vnc_get_key(subnet_vnc, net_id) == subnet_key:
+                if self._subnet_vnc_matches(subnet_vnc, net_id, subnet_key,
+                                            subnet_id):
                     ret_subnet_q = self._subnet_vnc_to_neutron(
                         subnet_vnc, vn_obj, ipam_ref['to'], fields=fields)
                     return ret_subnet_q
 
-        return {}
+        # the subnet was deleted by another server
+        self._subnet_not_found(subnet_id)
 
     def resource_count(self, context, filters):
-        subnets_info = self.resource_list(context, filters)
-        return len(subnets_info)
+        # subnets are only converted when filtered on a computed attribute
+        return sum(1 for _ in self._get_subnet_list_after_apply_filter_(
+            self._iter_lists(self._get_vn_lists(context, filters)), filters,
+            convert=False))
 
     def _get_subnet_list_after_apply_filter_(self, vn_list, filters,
-                                             fields=None):
-        ret_subnets = []
+                                             fields=None, convert=True):
         ret_dict = {}
+        shared_only = (filters and 'shared' in filters and
+                       filters['shared'][0])
+        check_converted = (filters and not shared_only and
+                           ('id' in filters or 'ip_version' in filters))
         for vn_obj in vn_list:
             if vn_obj.uuid in ret_dict:
                 continue
             ret_dict[vn_obj.uuid] = 1
 
+            # check what can be on the network and the subnet objects,
+            # before converting the subnets
+            if shared_only:
+                if not vn_obj.is_shared:
+                    continue
+            elif filters:
+                if not self._filters_is_present(
+                        filters, 'tenant_id',
+                        self._project_id_vnc_to_neutron(vn_obj.parent_uuid)):
+                    continue
+                if not self._filters_is_present(filters, 'network_id',
+                                                vn_obj.uuid):
+                    continue
+
             ipam_refs = vn_obj.get_network_ipam_refs()
             for ipam_ref in ipam_refs or []:
                 subnet_vncs = ipam_ref['attr'].get_ipam_subnets()
                 for subnet_vnc in subnet_vncs:
+                    if filters and not shared_only:
+                        # old subnets only get their id on conversion
+                        if (subnet_vnc.subnet_uuid and
+                                not self._filters_is_present(
+                                    filters, 'id', subnet_vnc.subnet_uuid)):
+                            continue
+                        if not self._filters_is_present(
+                                filters, 'name',
+                                subnet_vnc.get_subnet_name() or ''):
+                            continue
+
+                    if not convert and not (
+                            check_converted and
+                            ('ip_version' in filters or
+                             not subnet_vnc.subnet_uuid)):
+                        yield subnet_vnc
+                        continue
+
                     sn_info = self._subnet_vnc_to_neutron(
                         subnet_vnc, vn_obj, ipam_ref['to'])
-                    sn_id = sn_info['id']
-                    sn_proj_id = sn_info['tenant_id']
-                    sn_net_id = sn_info['network_id']
-                    sn_name = sn_info['name']
-
-                    if (filters and 'shared' in filters and
-                            filters['shared'][0]):
-                        if not vn_obj.is_shared:
-                            continue
-                    elif filters:
+
+                    if filters and not shared_only:
                         if not self._filters_is_present(filters, 'id',
-                                                        sn_id):
-                            continue
-                        if not self._filters_is_present(filters,
-                                                        'tenant_id',
-                                                        sn_proj_id):
-                            continue
-                        if not self._filters_is_present(filters,
-                                                        'network_id',
-                                                        sn_net_id):
-                            continue
-                        if not self._filters_is_present(filters,
-                                                        'name',
-                                                        sn_name):
+                                                        sn_info['id']):
                             continue
                         if not self._filters_is_present(filters,
                                                         'ip_version',
@@ -520,36 +601,45 @@ class SubnetGetHandler(res_handler.ResourceGetHandler, SubnetMixin):
                             continue
                     if fields:
                         sn_info = self._filter_res_dict(sn_info, fields)
-                    ret_subnets.append(sn_info)
+                    yield sn_info
 
-        return ret_subnets
-
-    def resource_list(self, context, filters, fields=None):
-        vn_get_handler = vn_handler.VNetworkGetHandler(self._vnc_lib)
-        all_vn_objs = []
+    def _get_vn_lists(self, context, filters):
+        """Returns the getters of the network lists holding the subnets."""
+        vn_get_handler = self._get_handler(vn_handler.VNetworkGetHandler)
+        # the lists are only read as subnets are collected
+        vn_lists = []
         if filters and 'id' in filters:
             # required subnets are specified,
             # just read in corresponding net_ids
             net_ids = []
-            for subnet_id in filters['id']:
-                subnet_key = self._subnet_vnc_read_mapping(id=subnet_id)
+            for subnet_key in self._subnet_vnc_read_mappings(filters['id']):
                 net_id = subnet_key.split()[0]
-                net_ids.append(net_id)
-
-            all_vn_objs.extend(vn_get_handler.get_vn_obj_list(
-                obj_uuids=net_ids, detail=True))
+                if net_id not in net_ids:
+                    net_ids.append(net_id)
+
+            vn_lists.append(functools.partial(
+                vn_get_handler._resource_list_by_uuids, net_ids))
+        elif (context['is_admin'] and filters and 'tenant_id' in filters and
+                not filters.get('shared', [False])[0]):
+            # only networks of the projects can match
+            for proj_id in self._validate_project_ids(context,
+                                                      filters['tenant_id']):
+                vn_lists.append(functools.partial(
+                    vn_get_handler.get_vn_list_project, proj_id))
         else:
             if not context['is_admin']:
                 proj_id = context['tenant']
             else:
                 proj_id = None
-            vn_objs = vn_get_handler.get_vn_list_project(proj_id)
-            all_vn_objs.extend(vn_objs)
-            vn_objs = vn_get_handler.vn_list_shared()
-            all_vn_objs.extend(vn_objs)
+            vn_lists.append(functools.partial(
+                vn_get_handler.get_vn_list_project, proj_id))
+            vn_lists.append(vn_get_handler.vn_list_shared)
+        return vn_lists
 
-        return self._get_subnet_list_after_apply_filter_(all_vn_objs, filters,
-                                                         fields=fields)
+    def resource_list(self, context, filters, fields=None):
+        return list(self._get_subnet_list_after_apply_filter_(
+            self._iter_lists(self._get_vn_lists(context, filters)), filters,
+            fields=fields))
 
 
 class SubnetUpdateHandler(res_handler.ResourceUpdateHandler, SubnetMixin):
@@ -595,7 +685,8 @@ class SubnetUpdateHandler(res_handler.ResourceUpdateHandler, SubnetMixin):
 
             if apply_subnet_host_routes:
                 old_host_routes = subnet_vnc.get_host_routes()
-                subnet_host_handler = SubnetHostRoutesHandler(self._vnc_lib)
+                subnet_host_handler = self._get_handler(
+                    SubnetHostRoutesHandler)
                 subnet_host_handler.port_update_iface_route_table(
                     vn_obj, subnet_cidr, subnet_id, host_routes,
                     old_host_routes)
@@ -606,6 +697,7 @@ class SubnetUpdateHandler(res_handler.ResourceUpdateHandler, SubnetMixin):
 
         vn_obj._pending_field_updates.add('network_ipam_refs')
         self._resource_update(vn_obj)
+        vn_handler.VNetworkMixin.invalidate_shared_vns()
         ret_subnet_q = self._subnet_vnc_to_neutron(
             subnet_vnc, vn_obj, ipam_ref['to'])
 
@@ -628,19 +720,21 @@ class SubnetUpdateHandler(res_handler.ResourceUpdateHandler, SubnetMixin):
 
         subnet_key = self._subnet_vnc_read_mapping(id=subnet_id)
         net_id = subnet_key.split()[0]
-        vn_obj = self._resource_get(id=net_id)
+        try:
+            vn_obj = self._resource_get(id=net_id)
+        except vnc_exc.NoIdError:
+            self._subnet_not_found(subnet_id)
         ipam_refs = vn_obj.get_network_ipam_refs()
         for ipam_ref in ipam_refs or []:
             subnets = ipam_ref['attr'].get_ipam_subnets()
             for subnet_vnc in subnets:
-                if self._subnet_vnc_get_key(
-                        subnet_vnc,
-                        net_id) == subnet_key:
+                if self._subnet_vnc_matches(subnet_vnc, net_id, subnet_key,
+                                            subnet_id):
                     return self._subnet_update(
                         subnet_q, subnet_id, vn_obj, subnet_vnc, ipam_ref,
                         apply_subnet_host_routes=apply_subnet_host_routes)
 
-        return {}
+        self._subnet_not_found(subnet_id)
 
 
 class SubnetHostRoutesHandler(res_handler.ContrailResourceHandler,
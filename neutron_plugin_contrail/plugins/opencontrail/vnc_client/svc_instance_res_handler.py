@@ -38,7 +38,7 @@ class SvcInstanceMixin(object):
         si_props = si_obj.get_service_instance_properties()
         if si_props:
             vn_fq_name = si_props.get_right_virtual_network()
-            vn_obj = vn_handler.VNetworkHandler(self._vnc_lib).get_vn_obj(
+            vn_obj = self._get_handler(vn_handler.VNetworkHandler).get_vn_obj(
                 fq_name_str=vn_fq_name)
             si_q_dict['external_net'] = str(vn_obj.uuid) + ' ' + vn_obj.name
             si_q_dict['internal_net'] = ''
@@ -131,8 +131,8 @@ class SvcInstanceCreateHandler(res_handler.ResourceCreateHandler,
                 'ProjectNotFound', project_id=project_id,
                 resource='svc_instance')
         net_id = si_q['external_net']
-        ext_vn = vn_handler.VNetworkHandler(
-            self._vnc_lib).get_vn_obj(id=net_id)
+        ext_vn = self._get_handler(
+            vn_handler.VNetworkHandler).get_vn_obj(id=net_id)
         scale_out = vnc_api.ServiceScaleOutType(
             max_instances=1, auto_scale=False)
         si_prop = vnc_api.ServiceInstanceType(
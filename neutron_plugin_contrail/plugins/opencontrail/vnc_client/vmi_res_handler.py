@@ -23,12 +23,14 @@ from vnc_api import vnc_api
 
 import contrail_res_handler as res_handler
 import fip_res_handler
+import prefix_index
 import sg_res_handler as sg_handler
 import subnet_res_handler as subnet_handler
 import vn_res_handler as vn_handler
 
 
 class VMInterfaceMixin(object):
+
     @staticmethod
     def _port_fixed_ips_is_present(check, against):
         # filters = {'fixed_ips': {'ip_address': ['20.0.0.5', '20.0.0.6']}}
@@ -98,34 +100,45 @@ class VMInterfaceMixin(object):
 
     @staticmethod
     def _ip_address_to_subnet_id(ip_addr, vn_obj, memo_req):
-        subnets_info = memo_req['subnets'].get(vn_obj.uuid)
-        for subnet_info in subnets_info or []:
-            if (netaddr.IPAddress(ip_addr) in
-                    netaddr.IPSet([subnet_info['cidr']])):
-                return subnet_info['id']
-
-        ipam_refs = vn_obj.get_network_ipam_refs()
-        for ipam_ref in ipam_refs or []:
-            subnet_vncs = ipam_ref['attr'].get_ipam_subnets()
-            for subnet_vnc in subnet_vncs:
-                cidr = '%s/%s' % (subnet_vnc.subnet.get_ip_prefix(),
-                                  subnet_vnc.subnet.get_ip_prefix_len())
-                if netaddr.IPAddress(ip_addr) in netaddr.IPSet([cidr]):
-                    return subnet_vnc.subnet_uuid
+        # index the network's subnets once per request
+        indexes = memo_req.setdefault('subnet-indexes', {})
+        try:
+            index = indexes[vn_obj.uuid]
+        except KeyError:
+            subnets_info = memo_req['subnets'].get(vn_obj.uuid)
+            if subnets_info is None:
+                subnets_info = (
+                    subnet_handler.SubnetHandler.get_vn_subnets(vn_obj))
+            index = prefix_index.SubnetPrefixIndex(subnets_info)
+            indexes[vn_obj.uuid] = index
+        return index.lookup(ip_addr)
+
+    def _get_vmi_iip_objs(self, vmi_objs, memo_iips=None):
+        """Reads the instance ips of vmi_objs not in memo_iips at once."""
+        iip_uuids = set()
+        for vmi_obj in vmi_objs or []:
+            ip_back_refs = getattr(vmi_obj, 'instance_ip_back_refs', None)
+            for ip_back_ref in ip_back_refs or []:
+                if ip_back_ref['uuid'] not in (memo_iips or {}):
+                    iip_uuids.add(ip_back_ref['uuid'])
+        iip_list_handler = self._get_handler(res_handler.InstanceIpHandler)
+        return iip_list_handler._resource_list_by_uuids(list(iip_uuids))
 
     def get_vmi_ip_dict(self, vmi_obj, vn_obj, port_req_memo):
         ip_dict_list = []
+        # fetch them from request context cache/memo if there, the missing
+        # ones with a single read
+        memo_iips = port_req_memo.setdefault('instance-ips', {})
+        for ip_obj in self._get_vmi_iip_objs([vmi_obj], memo_iips):
+            memo_iips[ip_obj.uuid] = ip_obj
+
         ip_back_refs = getattr(vmi_obj, 'instance_ip_back_refs', None)
         for ip_back_ref in ip_back_refs or []:
-            iip_uuid = ip_back_ref['uuid']
-            # fetch it from request context cache/memo if there
             try:
-                ip_obj = port_req_memo['instance-ips'][iip_uuid]
+                ip_obj = memo_iips[ip_back_ref['uuid']]
             except KeyError:
-                try:
-                    ip_obj = self._vnc_lib.instance_ip_read(id=iip_uuid)
-                except vnc_exc.NoIdError:
-                    continue
+                # deleted meanwhile
+                continue
 
             ip_addr = ip_obj.get_instance_ip_address()
             subnet_id = self._ip_address_to_subnet_id(ip_addr, vn_obj,
@@ -192,6 +205,20 @@ class VMInterfaceMixin(object):
         if rtr_back_refs:
             return rtr_back_refs[0]['uuid']
 
+    @staticmethod
+    def _vmi_device_owner_is_property(vmi_obj):
+        """Tells if the port device_owner is the one set on the vmi.
+
+        It is not for router gateway ports, which _get_vmi_device_id_owner
+        only tells apart by reading their vm and service instance.
+        """
+        if getattr(vmi_obj, 'logical_router_back_refs', None) is not None:
+            return True
+        if vmi_obj.parent_type == 'virtual-machine':
+            return True
+        vm_refs = vmi_obj.get_virtual_machine_refs()
+        return not vm_refs or vm_refs[0]['to'][-1] == vm_refs[0]['uuid']
+
     def _get_vmi_device_id_owner(self, vmi_obj, port_req_memo):
         # port can be router interface or vm interface
         # for performance read logical_router_back_ref only when we have to
@@ -220,6 +247,10 @@ class VMInterfaceMixin(object):
                              extensions_enabled=False, fields=None):
         port_q_dict = {}
 
+        def _wanted(*port_fields):
+            # skip the conversion steps whose output is not asked for
+            return not fields or bool(set(port_fields) & set(fields))
+
         if not getattr(vmi_obj, 'display_name'):
             # for ports created directly via vnc_api
             port_q_dict['name'] = vmi_obj.get_fq_name()[-1]
@@ -245,17 +276,21 @@ class VMInterfaceMixin(object):
         if 'virtual-machines' not in port_req_memo:
             port_req_memo['virtual-machines'] = {}
 
-        try:
-            vn_obj = port_req_memo['networks'][net_id]
-        except KeyError:
-            vn_obj = self._vnc_lib.virtual_network_read(id=net_id)
-            port_req_memo['networks'][net_id] = vn_obj
-            subnets_info = (
-                subnet_handler.SubnetHandler.get_vn_subnets(vn_obj))
-            port_req_memo['subnets'][net_id] = subnets_info
+        vn_obj = None
+        if (_wanted('fixed_ips') or
+                (_wanted('tenant_id') and vmi_obj.parent_type != "project")):
+            try:
+                vn_obj = port_req_memo['networks'][net_id]
+            except KeyError:
+                vn_obj = self._vnc_lib.virtual_network_read(id=net_id)
+                port_req_memo['networks'][net_id] = vn_obj
+                subnets_info = (
+                    subnet_handler.SubnetHandler.get_vn_subnets(vn_obj))
+                port_req_memo['subnets'][net_id] = subnets_info
 
         if vmi_obj.parent_type != "project":
-            proj_id = self._project_id_vnc_to_neutron(vn_obj.parent_uuid)
+            proj_id = (self._project_id_vnc_to_neutron(vn_obj.parent_uuid)
+                       if vn_obj else None)
         else:
             proj_id = self._project_id_vnc_to_neutron(vmi_obj.parent_uuid)
 
@@ -276,37 +311,41 @@ class VMInterfaceMixin(object):
         if address_pairs:
             port_q_dict['allowed_address_pairs'] = address_pairs
 
-        port_q_dict['fixed_ips'] = self.get_vmi_ip_dict(vmi_obj, vn_obj,
-                                                        port_req_memo)
-
-        port_q_dict['security_groups'] = []
-        sg_refs = vmi_obj.get_security_group_refs()
-        # read the no rule sg
-        no_rule_sg = res_handler.SGHandler(
-            self._vnc_lib).get_no_rule_security_group()
-        for sg_ref in sg_refs or []:
-            if no_rule_sg and sg_ref['uuid'] == no_rule_sg.uuid:
-                # hide the internal sg
-                continue
+        if _wanted('fixed_ips'):
+            port_q_dict['fixed_ips'] = self.get_vmi_ip_dict(vmi_obj, vn_obj,
+                                                            port_req_memo)
+
+        if _wanted('security_groups'):
+            port_q_dict['security_groups'] = []
+            sg_refs = vmi_obj.get_security_group_refs()
+            # read the no rule sg
+            no_rule_sg = self._get_handler(
+                res_handler.SGHandler).get_no_rule_security_group()
+            for sg_ref in sg_refs or []:
+                if no_rule_sg and sg_ref['uuid'] == no_rule_sg.uuid:
+                    # hide the internal sg
+                    continue
 
-            port_q_dict['security_groups'].append(sg_ref['uuid'])
+                port_q_dict['security_groups'].append(sg_ref['uuid'])
 
         port_q_dict['admin_state_up'] = vmi_obj.get_id_perms().enable
 
-        device_id, device_owner = self._get_vmi_device_id_owner(vmi_obj,
-                                                                port_req_memo)
-        port_q_dict['device_id'] = device_id
+        if _wanted('device_id', 'device_owner', 'status'):
+            device_id, device_owner = self._get_vmi_device_id_owner(
+                vmi_obj, port_req_memo)
+            port_q_dict['device_id'] = device_id
 
-        if device_owner is not None:
-            port_q_dict['device_owner'] = device_owner
-        else:
-            port_q_dict['device_owner'] = (
-                vmi_obj.get_virtual_machine_interface_device_owner() or '')
+            if device_owner is not None:
+                port_q_dict['device_owner'] = device_owner
+            else:
+                port_q_dict['device_owner'] = (
+                    vmi_obj.get_virtual_machine_interface_device_owner() or
+                    '')
 
-        if port_q_dict['device_id']:
-            port_q_dict['status'] = n_constants.PORT_STATUS_ACTIVE
-        else:
-            port_q_dict['status'] = n_constants.PORT_STATUS_DOWN
+            if port_q_dict['device_id']:
+                port_q_dict['status'] = n_constants.PORT_STATUS_ACTIVE
+            else:
+                port_q_dict['status'] = n_constants.PORT_STATUS_DOWN
 
         if extensions_enabled:
             extra_dict = {'contrail:fq_name': vmi_obj.get_fq_name()}
@@ -330,7 +369,7 @@ class VMInterfaceMixin(object):
                 delete_vm_list.append(vm_ref)
 
         if instance_name or delete_vm_list:
-            vm_handler = res_handler.VMachineHandler(self._vnc_lib)
+            vm_handler = self._get_handler(res_handler.VMachineHandler)
 
         if instance_name:
             try:
@@ -365,8 +404,8 @@ class VMInterfaceMixin(object):
         # When there is no-security-group for a port,the internal
         # no_rule group should be used.
         if create_no_rule and not sec_group_list:
-            sg_obj = res_handler.SGHandler(
-                self._vnc_lib).get_no_rule_security_group()
+            sg_obj = self._get_handler(
+                res_handler.SGHandler).get_no_rule_security_group()
             vmi_obj.add_security_group(sg_obj)
 
     def _set_vmi_extra_dhcp_options(self, vmi_obj, extra_dhcp_options):
@@ -413,7 +452,7 @@ class VMInterfaceMixin(object):
         ip_back_refs = getattr(vmi_obj, 'instance_ip_back_refs', None)
         vmi_obj_ips = []
         if ip_back_refs:
-            ip_handler = res_handler.InstanceIpHandler(self._vnc_lib)
+            ip_handler = self._get_handler(res_handler.InstanceIpHandler)
             for ip_back_ref in ip_back_refs:
                 try:
                     ip_obj = ip_handler.get_iip_obj(id=ip_back_ref['uuid'])
@@ -424,7 +463,7 @@ class VMInterfaceMixin(object):
 
     def _check_vmi_fixed_ips(self, vmi_obj, fixed_ips, net_id):
         vmi_obj_ips = self._get_vmi_ip_list(vmi_obj)
-        ip_handler = res_handler.InstanceIpHandler(self._vnc_lib)
+        ip_handler = self._get_handler(res_handler.InstanceIpHandler)
         for fixed_ip in fixed_ips or []:
             ip_addr = fixed_ip.get('ip_address')
             if not ip_addr or ip_addr in vmi_obj_ips:
@@ -496,7 +535,7 @@ class VMInterfaceMixin(object):
                 subnets[subnet_vnc.subnet_uuid] = cidr
 
         stale_ip_ids = {}
-        ip_handler = res_handler.InstanceIpHandler(self._vnc_lib)
+        ip_handler = self._get_handler(res_handler.InstanceIpHandler)
         for iip in getattr(vmi_obj, 'instance_ip_back_refs', []):
             iip_obj = ip_handler.get_iip_obj(id=iip['uuid'])
             ip_addr = iip_obj.get_instance_ip_address()
@@ -570,7 +609,7 @@ class VMInterfaceMixin(object):
     def get_vmi_tenant_id(self, vmi_obj):
         if vmi_obj.parent_type != "project":
             net_id = vmi_obj.get_virtual_network_refs()[0]['uuid']
-            vn_get_handler = vn_handler.VNetworkGetHandler(self._vnc_lib)
+            vn_get_handler = self._get_handler(vn_handler.VNetworkGetHandler)
             vn_obj = vn_get_handler.get_vn_obj(id=net_id)
             return vn_get_handler.get_vn_tenant_id(vn_obj)
 
@@ -605,14 +644,47 @@ class VMInterfaceCreateHandler(res_handler.ResourceCreateHandler,
             tenant_id = context['tenant']
         return tenant_id
 
-    def _create_vmi_obj(self, port_q, vn_obj):
-        project_id = self._project_id_neutron_to_vnc(port_q['tenant_id'])
-        try:
-            proj_obj = self._project_read(proj_id=project_id)
-        except vnc_exc.NoIdError:
-            self._raise_contrail_exception(
-                'ProjectNotFound',
-                projec_id=project_id, resource='port')
+    @staticmethod
+    def _get_create_memo():
+        # objects shared by the ports of a bulk create, read only once
+        return {'networks': {}, 'projects': {}, 'default_sgs': {}}
+
+    def _get_vn_obj_for_create(self, net_id, create_memo):
+        if net_id not in create_memo['networks']:
+            try:
+                create_memo['networks'][net_id] = (
+                    self._vnc_lib.virtual_network_read(id=net_id))
+            except vnc_exc.NoIdError:
+                self._raise_contrail_exception(
+                    'NetworkNotFound', net_id=net_id, resource='port')
+        return create_memo['networks'][net_id]
+
+    def _get_proj_obj_for_create(self, tenant_id, create_memo):
+        project_id = self._project_id_neutron_to_vnc(tenant_id)
+        if project_id not in create_memo['projects']:
+            try:
+                create_memo['projects'][project_id] = self._project_read(
+                    proj_id=project_id)
+            except vnc_exc.NoIdError:
+                self._raise_contrail_exception(
+                    'ProjectNotFound',
+                    projec_id=project_id, resource='port')
+        return create_memo['projects'][project_id]
+
+    def _get_default_sg_id_for_create(self, proj_obj, create_memo):
+        if proj_obj.uuid not in create_memo['default_sgs']:
+            sg_get_handler = self._get_handler(
+                sg_handler.SecurityGroupHandler)
+            create_memo['default_sgs'][proj_obj.uuid] = (
+                sg_get_handler._ensure_default_security_group_exists(
+                    proj_obj.uuid))
+        return create_memo['default_sgs'][proj_obj.uuid]
+
+    def _create_vmi_obj(self, port_q, vn_obj, create_memo=None):
+        if create_memo is None:
+            create_memo = self._get_create_memo()
+        proj_obj = self._get_proj_obj_for_create(port_q['tenant_id'],
+                                                 create_memo)
         id_perms = vnc_api.IdPermsType(enable=True)
         vmi_uuid = str(uuid.uuid4())
         if port_q.get('name'):
@@ -627,15 +699,15 @@ class VMInterfaceCreateHandler(res_handler.ResourceCreateHandler,
         if ('security_groups' not in port_q or
                 port_q['security_groups'].__class__ is object):
             sg_obj = vnc_api.SecurityGroup("default", proj_obj)
-            uid = sg_handler.SecurityGroupHandler(
-                self._vnc_lib)._ensure_default_security_group_exists(
-                proj_obj.uuid)
-            sg_obj.uuid = uid
+            sg_obj.uuid = self._get_default_sg_id_for_create(proj_obj,
+                                                             create_memo)
             vmi_obj.add_security_group(sg_obj)
 
         return vmi_obj
 
-    def resource_create(self, context, port_q):
+    def resource_create(self, context, port_q, create_memo=None):
+        if create_memo is None:
+            create_memo = self._get_create_memo()
         if 'network_id' not in port_q or 'tenant_id' not in port_q:
             raise self._raise_contrail_exception(
                 'BadRequest', resource='port',
@@ -645,11 +717,7 @@ class VMInterfaceCreateHandler(res_handler.ResourceCreateHandler,
             'apply_subnet_host_routes', False)
 
         net_id = port_q['network_id']
-        try:
-            vn_obj = self._vnc_lib.virtual_network_read(id=net_id)
-        except vnc_exc.NoIdError:
-            self._raise_contrail_exception(
-                'NetworkNotFound', net_id=net_id, resource='port')
+        vn_obj = self._get_vn_obj_for_create(net_id, create_memo)
 
         tenant_id = self._get_tenant_id_for_create(context, port_q)
         proj_id = self._project_id_neutron_to_vnc(tenant_id)
@@ -660,7 +728,7 @@ class VMInterfaceCreateHandler(res_handler.ResourceCreateHandler,
             self._validate_mac_address(proj_id, net_id, port_q['mac_address'])
 
         # initialize port object
-        vmi_obj = self._create_vmi_obj(port_q, vn_obj)
+        vmi_obj = self._create_vmi_obj(port_q, vn_obj, create_memo)
         vmi_obj = self._neutron_port_to_vmi(port_q, vmi_obj=vmi_obj)
 
         # determine creation of v4 and v6 ip object
@@ -706,13 +774,31 @@ class VMInterfaceCreateHandler(res_handler.ResourceCreateHandler,
         # create interface route table for the port if
         # subnet has a host route for this port ip.
         if apply_subnet_host_routes:
-            subnet_host_handler = subnet_handler.SubnetHostRoutesHandler(
-                self._vnc_lib)
+            subnet_host_handler = self._get_handler(
+                subnet_handler.SubnetHostRoutesHandler)
             subnet_host_handler.port_check_and_add_iface_route_table(
                 ret_port_q['fixed_ips'], vn_obj, vmi_obj)
 
         return ret_port_q
 
+    def resource_create_bulk(self, context, ports_q):
+        create_memo = self._get_create_memo()
+        # resolve the networks and projects of the batch up front, the
+        # concurrent creates then only read them from the memo
+        for port_q in ports_q:
+            if 'network_id' in port_q:
+                self._get_vn_obj_for_create(port_q['network_id'],
+                                            create_memo)
+            if 'tenant_id' in port_q:
+                self._get_proj_obj_for_create(port_q['tenant_id'],
+                                              create_memo)
+
+        return self._resource_create_bulk(
+            lambda port_q: self.resource_create(context, port_q,
+                                                create_memo),
+            ports_q,
+            lambda port: self.resource_delete(context, port['id']))
+
 
 class VMInterfaceUpdateHandler(res_handler.ResourceUpdateHandler,
                                VMInterfaceMixin):
@@ -778,7 +864,7 @@ class VMInterfaceDeleteHandler(res_handler.ResourceDeleteHandler,
 
         # release instance IP address
         iip_back_refs = list((getattr(vmi_obj, 'instance_ip_back_refs', [])))
-        ip_handler = res_handler.InstanceIpHandler(self._vnc_lib)
+        ip_handler = self._get_handler(res_handler.InstanceIpHandler)
 
         for iip_back_ref in iip_back_refs or []:
             # if name contains IP address then this is shared ip
@@ -793,7 +879,7 @@ class VMInterfaceDeleteHandler(res_handler.ResourceDeleteHandler,
         # disassociate any floating IP used by instance
         fip_back_refs = getattr(vmi_obj, 'floating_ip_back_refs', None)
         if fip_back_refs:
-            fip_handler = fip_res_handler.FloatingIpHandler(self._vnc_lib)
+            fip_handler = self._get_handler(fip_res_handler.FloatingIpHandler)
             for fip_back_ref in fip_back_refs:
                 fip_handler.resource_update(context, fip_back_ref['uuid'],
                                             {'port_id': None})
@@ -820,14 +906,25 @@ class VMInterfaceGetHandler(res_handler.ResourceGetHandler, VMInterfaceMixin):
     resource_get_method = 'virtual_machine_interface_read'
     back_ref_fields = ['logical_router_back_refs', 'instance_ip_back_refs',
                        'floating_ip_back_refs']
+    field_back_refs = {'fixed_ips': ['instance_ip_back_refs'],
+                       'device_id': ['logical_router_back_refs'],
+                       'device_owner': ['logical_router_back_refs'],
+                       'status': ['logical_router_back_refs']}
 
     # returns vm objects, net objects, and instance ip objects
     def _get_vmis_nets_ips(self, context, project_ids=None,
-                           device_ids=None, vmi_uuids=None, vn_ids=None):
-        vn_list_handler = vn_handler.VNetworkGetHandler(self._vnc_lib)
+                           device_ids=None, vmi_uuids=None, vn_ids=None,
+                           fields=None, back_ref_fields=None):
+        # fields are the port fields to compute, None for all, read with
+        # back_ref_fields, all of them by default
+        if back_ref_fields is None:
+            back_ref_fields = self.back_ref_fields
         pool = eventlet.GreenPool()
-        vn_objs_t = pool.spawn(vn_list_handler.get_vn_obj_list,
-                               parent_id=project_ids, detail=True)
+        vn_objs_t = None
+        if not fields or 'fixed_ips' in fields or 'tenant_id' in fields:
+            vn_list_handler = self._get_handler(vn_handler.VNetworkGetHandler)
+            vn_objs_t = pool.spawn(vn_list_handler.get_vn_obj_list,
+                                   parent_id=project_ids, detail=True)
 
         vmi_objs_t = None
         vmi_obj_uuids_t = None
@@ -840,45 +937,46 @@ class VMInterfaceGetHandler(res_handler.ResourceGetHandler, VMInterfaceMixin):
 
         if back_ref_id:
             vmi_objs_t = pool.spawn(self._resource_list,
-                                    back_ref_id=back_ref_id, back_refs=True)
+                                    back_ref_id=back_ref_id,
+                                    fields=back_ref_fields)
 
         if vmi_uuids:
             vmi_obj_uuids_t = pool.spawn(self._resource_list,
-                                         obj_uuids=vmi_uuids, back_refs=True)
+                                         obj_uuids=vmi_uuids,
+                                         fields=back_ref_fields)
         elif not back_ref_id:
             vmi_objs_t = pool.spawn(self._resource_list,
-                                    parent_id=project_ids, back_refs=True)
-
-        # if admin no need to filter we can retrieve all the ips object
-        # with only one call
-        if context['is_admin']:
-            iip_list_handler = res_handler.InstanceIpHandler(self._vnc_lib)
-            iip_objs_t = pool.spawn(iip_list_handler.get_iip_obj_list,
-                                    detail=True)
-
-        pool.waitall()
-
-        vn_objs = vn_objs_t._exit_event._result
-        if context['is_admin']:
-            iips_objs = iip_objs_t._exit_event._result
-        else:
-            vn_ids = [vn_obj.uuid for vn_obj in vn_objs]
-            iip_list_handler = res_handler.InstanceIpHandler(self._vnc_lib)
-            iips_objs = iip_list_handler.get_iip_obj_list(back_ref_id=vn_ids,
-                                                          detail=True)
+                                    parent_id=project_ids,
+                                    fields=back_ref_fields)
 
         vmi_objs = []
         if vmi_objs_t is not None:
-            vmi_objs = vmi_objs_t._exit_event._result
+            vmi_objs = vmi_objs_t.wait()
 
         if vmi_obj_uuids_t is not None:
-            vmi_objs.extend(vmi_obj_uuids_t._exit_event._result)
+            vmi_objs.extend(vmi_obj_uuids_t.wait())
+
+        # only read the ips of the listed ports, while the networks may
+        # still be in flight
+        iip_objs_t = None
+        if not fields or 'fixed_ips' in fields:
+            iip_objs_t = pool.spawn(self._get_vmi_iip_objs, vmi_objs)
+
+        pool.waitall()
+
+        vn_objs = []
+        if vn_objs_t is not None:
+            vn_objs = vn_objs_t._exit_event._result
+        iips_objs = []
+        if iip_objs_t is not None:
+            iips_objs = iip_objs_t._exit_event._result
 
         return vmi_objs, vn_objs, iips_objs
 
     # get vmi related resources filtered by project_ids
     def _get_vmi_resources(self, context, project_ids=None, ids=None,
-                           device_ids=None, vn_ids=None):
+                           device_ids=None, vn_ids=None, fields=None,
+                           back_ref_fields=None):
         if device_ids:
             rtr_objs = self._vnc_lib.logical_routers_list(obj_uuids=device_ids,
                                                           detail=True)
@@ -891,19 +989,86 @@ class VMInterfaceGetHandler(res_handler.ResourceGetHandler, VMInterfaceMixin):
 
         return self._get_vmis_nets_ips(context, project_ids=project_ids,
                                        device_ids=device_ids,
-                                       vmi_uuids=ids, vn_ids=vn_ids)
+                                       vmi_uuids=ids, vn_ids=vn_ids,
+                                       fields=fields,
+                                       back_ref_fields=back_ref_fields)
 
-    def _get_ports_dict(self, vmi_objs, memo_req, extensions_enabled=False):
-        ret_ports = []
+    def _compile_port_filters(self, filters, tenant_ids):
+        """Compiles the port list filters into a check on vmi objects.
+
+        The check is evaluated before conversion, on the vmi and the request
+        memo. It returns False for ports the prune phase would drop, and
+        True when they may pass, including when a filter can not be told
+        without converting the port.
+        """
+        checks = []
+
+        if tenant_ids:
+            def _check_tenant(vmi_obj, memo_req):
+                if vmi_obj.parent_type != 'project':
+                    # owned by the network project
+                    return True
+                return (self._project_id_vnc_to_neutron(vmi_obj.parent_uuid)
+                        in tenant_ids)
+            checks.append(_check_tenant)
+
+        if 'name' in filters:
+            def _check_name(vmi_obj, memo_req):
+                name = (getattr(vmi_obj, 'display_name') or
+                        vmi_obj.get_fq_name()[-1])
+                return name in filters['name']
+            checks.append(_check_name)
+
+        if 'device_owner' in filters:
+            def _check_device_owner(vmi_obj, memo_req):
+                if not self._vmi_device_owner_is_property(vmi_obj):
+                    return True
+                device_owner = (
+                    vmi_obj.get_virtual_machine_interface_device_owner() or
+                    '')
+                return device_owner in filters['device_owner']
+            checks.append(_check_device_owner)
+
+        if 'fixed_ips' in filters:
+            check_ips = filters['fixed_ips']
+
+            def _check_fixed_ips(vmi_obj, memo_req):
+                vn_obj = None
+                if 'subnet_id' in check_ips:
+                    vn_obj = memo_req['networks'].get(
+                        self.get_vmi_net_id(vmi_obj))
+                    if vn_obj is None:
+                        return True
+
+                fixed_ips = []
+                ip_back_refs = getattr(vmi_obj, 'instance_ip_back_refs', None)
+                for ip_back_ref in ip_back_refs or []:
+                    ip_obj = memo_req['instance-ips'].get(ip_back_ref['uuid'])
+                    if ip_obj is None:
+                        return True
+                    fixed_ip = {'ip_address': ip_obj.get_instance_ip_address()}
+                    if vn_obj is not None:
+                        fixed_ip['subnet_id'] = self._ip_address_to_subnet_id(
+                            fixed_ip['ip_address'], vn_obj, memo_req)
+                    fixed_ips.append(fixed_ip)
+                return self._port_fixed_ips_is_present(check_ips, fixed_ips)
+            checks.append(_check_fixed_ips)
+
+        return lambda vmi_obj, memo_req: all(check(vmi_obj, memo_req)
+                                             for check in checks)
+
+    def _get_ports_dict(self, vmi_objs, memo_req, extensions_enabled=False,
+                        fields=None, pre_filter=None):
+        # converted as they are consumed, pruned ports are not held
         for vmi_obj in vmi_objs or []:
+            if pre_filter is not None and not pre_filter(vmi_obj, memo_req):
+                continue
             try:
-                port_info = self._vmi_to_neutron_port(
-                    vmi_obj, memo_req, extensions_enabled=extensions_enabled)
+                yield self._vmi_to_neutron_port(
+                    vmi_obj, memo_req, extensions_enabled=extensions_enabled,
+                    fields=fields)
             except vnc_exc.NoIdError:
                 continue
-            ret_ports.append(port_info)
-
-        return ret_ports
 
     def get_vmi_list(self, **kwargs):
         return self._resource_list(**kwargs)
@@ -928,21 +1093,33 @@ class VMInterfaceGetHandler(res_handler.ResourceGetHandler, VMInterfaceMixin):
             project_ids = self._validate_project_ids(context,
                                                      filters['tenant_id'])
 
+        # only compute and read what the fields and filters need
+        filter_fields = [f for f in ('name', 'device_owner', 'fixed_ips')
+                         if f in filters]
+        if tenant_ids:
+            filter_fields.append('tenant_id')
+        conv_fields, back_ref_fields = self._plan_projection(fields,
+                                                             filter_fields)
+
         # choose the most appropriate way of retrieving ports
         # before pruning by other filters
         if 'device_id' in filters:
             vmi_objs, vn_objs, iip_objs = self._get_vmi_resources(
                 context, project_ids, device_ids=filters['device_id'],
-                vn_ids=filters.get('network_id'))
+                vn_ids=filters.get('network_id'), fields=conv_fields,
+                back_ref_fields=back_ref_fields)
         else:
             vmi_objs, vn_objs, iip_objs = self._get_vmi_resources(
                 context, project_ids, ids=filters.get('id'),
-                vn_ids=filters.get('network_id'))
+                vn_ids=filters.get('network_id'), fields=conv_fields,
+                back_ref_fields=back_ref_fields)
 
         memo_req = self._get_vmi_memo_req_dict(vn_objs, iip_objs, None)
         ports = self._get_ports_dict(
             vmi_objs, memo_req,
-            extensions_enabled=contrail_extensions_enabled)
+            extensions_enabled=contrail_extensions_enabled,
+            fields=conv_fields,
+            pre_filter=self._compile_port_filters(filters, tenant_ids))
 
         # prune phase
         ret_ports = []
@@ -951,10 +1128,11 @@ class VMInterfaceGetHandler(res_handler.ResourceGetHandler, VMInterfaceMixin):
                 continue
 
             # TODO(safchain) revisit these filters if necessary
-            if not self._filters_is_present(filters, 'name', port['name']):
+            if not self._filters_is_present(filters, 'name',
+                                            port.get('name')):
                 continue
             if not self._filters_is_present(
-                    filters, 'device_owner', port['device_owner']):
+                    filters, 'device_owner', port.get('device_owner')):
                 continue
             if 'fixed_ips' in filters and not self._port_fixed_ips_is_present(
                     filters['fixed_ips'], port['fixed_ips']):
@@ -994,20 +1172,17 @@ class VMInterfaceGetHandler(res_handler.ResourceGetHandler, VMInterfaceMixin):
                 'network:dhcp' in filters.get('device_owner', [])):
             return 0
 
-        if 'tenant_id' in filters:
-            if isinstance(filters['tenant_id'], list):
-                project_id = self._project_id_neutron_to_vnc(
-                    filters['tenant_id'][0])
-            else:
-                project_id = self._project_id_neutron_to_vnc(
-                    filters['tenant_id'])
-
-            nports = len(self._resource_list(parent_id=project_id))
-        else:
-            # across all projects - TODO() very expensive,
-            # get only a count from api-server!
-            nports = len(self.resource_list(filters=filters))
-
+        if (filters.keys() == ['network_id'] and
+                (not context or context['is_admin'])):
+            # ports are back referring to their network
+            return self._resource_list(
+                back_ref_id=filters['network_id'], count=True,
+                back_refs=False,
+                detail=False)['virtual-machine-interfaces']['count']
+
+        # only the ids are converted, others are computed when filtered on
+        nports = len(self.resource_list(context, filters=filters,
+                                        fields=['id']))
         return nports
 
 
@@ -12,15 +12,30 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+import time
+
 from cfgm_common import exceptions as vnc_exc
 from neutron.common import constants as n_constants
 from vnc_api import vnc_api
 
 import contrail_res_handler as res_handler
+import subnet_keys
 import vmi_res_handler as vmi_handler
 
 
 class VNetworkMixin(object):
+    # seconds the networks all tenants see, shared or external, are
+    # listed for
+    shared_vns_ttl = 5
+    # list -> (expires at, networks) of the last listings, common to all
+    # handlers
+    _shared_vns = {}
+
+    @staticmethod
+    def invalidate_shared_vns():
+        """Drops the shared networks listed, eg. as one of them changed."""
+        VNetworkMixin._shared_vns.clear()
 
     def neutron_dict_to_vn(self, vn_obj, network_q):
         net_name = network_q.get('name')
@@ -187,6 +202,7 @@ class VNetworkCreateHandler(res_handler.ResourceCreateHandler, VNetworkMixin):
         vn_obj = self.neutron_dict_to_vn(self.create_vn_obj(network_q),
                                          network_q)
         self._resource_create(vn_obj)
+        self.invalidate_shared_vns()
 
         if vn_obj.router_external:
             fip_pool_obj = vnc_api.FloatingIpPool('floating-ip-pool', vn_obj)
@@ -218,8 +234,8 @@ class VNetworkUpdateHandler(res_handler.ResourceUpdateHandler, VNetworkMixin):
     def _validate_shared_attr(self, is_shared, vn_obj):
         if not is_shared and vn_obj.is_shared:
             for vmi in vn_obj.get_virtual_machine_interface_back_refs() or []:
-                vmi_obj = vmi_handler.VMInterfaceHandler(
-                    self._vnc_lib).get_vmi_obj(vmi['uuid'])
+                vmi_obj = self._get_handler(
+                    vmi_handler.VMInterfaceHandler).get_vmi_obj(vmi['uuid'])
                 if vmi_obj.parent_type == 'project' and (
                    vmi_obj.parent_uuid != vn_obj.parent_uuid):
                     self._raise_contrail_exception(
@@ -254,6 +270,7 @@ class VNetworkUpdateHandler(res_handler.ResourceUpdateHandler, VNetworkMixin):
         vn_obj = self.neutron_dict_to_vn(
             self._get_vn_obj_from_net_q(network_q), network_q)
         self._resource_update(vn_obj)
+        self.invalidate_shared_vns()
 
         ret_network_q = self.vn_to_neutron_dict(
             vn_obj, contrail_extensions_enabled=contrail_extensions_enabled)
@@ -318,6 +335,20 @@ class VNetworkGetHandler(res_handler.ResourceGetHandler, VNetworkMixin):
         return ret_list
     # end _network_list_shared
 
+    def _network_list_cached(self, list_getter):
+        """Returns list_getter(), a list of the networks all tenants see.
+
+        Every tenant list asks for these, a listing is reused for
+        shared_vns_ttl seconds. The objects must not be modified.
+        """
+        now = time.time()
+        key = list_getter.__name__
+        expires_at, nets = self._shared_vns.get(key, (0, None))
+        if expires_at <= now:
+            nets = list_getter()
+            self._shared_vns[key] = (now + self.shared_vns_ttl, nets)
+        return list(nets)
+
     def get_vn_obj(self, id=None, fq_name_str=None):
         return self._resource_get(id=id, fq_name_str=fq_name_str)
 
@@ -331,67 +362,74 @@ class VNetworkGetHandler(res_handler.ResourceGetHandler, VNetworkMixin):
         ret_dict = {}
 
         def _collect_without_prune(net_ids):
-            for net_id in net_ids:
-                try:
-                    net_obj = self._resource_get(id=net_id)
-                    net_info = self.vn_to_neutron_dict(
-                        net_obj,
-                        contrail_extensions_enabled=contrail_exts_enabled,
-                        fields=fields)
-                    ret_dict[net_id] = net_info
-                except vnc_exc.NoIdError:
-                    pass
+            # missing networks are left out
+            for net_obj in self._resource_list_by_uuids(net_ids):
+                net_info = self.vn_to_neutron_dict(
+                    net_obj,
+                    contrail_extensions_enabled=contrail_exts_enabled,
+                    fields=fields)
+                ret_dict[net_obj.uuid] = net_info
         # end _collect_without_prune
 
-        # collect phase
-        all_net_objs = []  # all n/ws in all projects
+        # lists of the networks all tenants see, reused for a while
+        shared_list = functools.partial(self._network_list_cached,
+                                        self._network_list_shared)
+        external_list = functools.partial(self._network_list_cached,
+                                          self._network_list_router_external)
+
+        # collect phase, the lists are only read as the prune phase goes
+        net_lists = []  # n/ws in all projects
         if context and not context['is_admin']:
             if filters and 'id' in filters:
                 _collect_without_prune(filters['id'])
             elif filters and 'name' in filters:
-                net_objs = self._network_list_project(context['tenant'])
-                all_net_objs.extend(net_objs)
-                all_net_objs.extend(self._network_list_shared())
-                all_net_objs.extend(self._network_list_router_external())
+                net_lists.append(functools.partial(
+                    self._network_list_project, context['tenant']))
+                net_lists.append(shared_list)
+                net_lists.append(external_list)
             elif (filters and 'shared' in filters and filters['shared'][0] and
                   'router:external' not in filters):
-                all_net_objs.extend(self._network_list_shared())
+                net_lists.append(shared_list)
             elif (filters and 'router:external' in filters and
                   'shared' not in filters):
-                all_net_objs.extend(self._network_list_router_external())
+                net_lists.append(external_list)
             elif (filters and 'router:external' in filters and
                   'shared' in filters):
-                all_net_objs.extend(self._network_list_shared_and_ext())
+                net_lists.append(functools.partial(
+                    self._network_list_cached,
+                    self._network_list_shared_and_ext))
             else:
                 project_uuid = self._project_id_neutron_to_vnc(
                     context['tenant'])
                 if not filters:
-                    all_net_objs.extend(self._network_list_router_external())
-                    all_net_objs.extend(self._network_list_shared())
-                all_net_objs.extend(self._network_list_project(project_uuid))
+                    net_lists.append(external_list)
+                    net_lists.append(shared_list)
+                net_lists.append(functools.partial(
+                    self._network_list_project, project_uuid))
         # admin role from here on
         elif filters and 'tenant_id' in filters:
             # project-id is present
             if 'id' in filters:
                 # required networks are also specified,
                 # just read and populate ret_dict
-                # prune is skipped because all_net_objs is empty
+                # prune is skipped because net_lists is empty
                 _collect_without_prune(filters['id'])
             else:
                 # read all networks in project, and prune below
                 proj_ids = self._validate_project_ids(context,
                                                       filters['tenant_id'])
                 for p_id in proj_ids:
-                    all_net_objs.extend(self._network_list_project(p_id))
+                    net_lists.append(functools.partial(
+                        self._network_list_project, p_id))
                 if 'router:external' in filters:
-                    all_net_objs.extend(self._network_list_router_external())
+                    net_lists.append(self._network_list_router_external)
         elif filters and 'id' in filters:
             # required networks are specified, just read and populate ret_dict
-            # prune is skipped because all_net_objs is empty
+            # prune is skipped because net_lists is empty
             _collect_without_prune(filters['id'])
         elif filters and 'name' in filters:
-            net_objs = self._network_list_project(None)
-            all_net_objs.extend(net_objs)
+            net_lists.append(functools.partial(self._network_list_project,
+                                               None))
         elif filters and 'shared' in filters:
             if filters['shared'][0]:
                 nets = self._network_list_shared()
@@ -410,10 +448,15 @@ class VNetworkGetHandler(res_handler.ResourceGetHandler, VNetworkMixin):
                     ret_dict[net.uuid] = net_info
         else:
             # read all networks in all projects
-            all_net_objs.extend(self._resource_list(detail=True))
+            net_lists.append(functools.partial(self._resource_list,
+                                               detail=True))
 
-        # prune phase
-        for net_obj in all_net_objs:
+        # prune phase, the few lists of a tenant are read concurrently
+        if context and not context['is_admin']:
+            net_objs = self._iter_lists_concurrently(net_lists)
+        else:
+            net_objs = self._iter_lists(net_lists)
+        for net_obj in net_objs:
             if net_obj.uuid in ret_dict:
                 continue
             net_fq_name = unicode(net_obj.get_fq_name())
@@ -445,11 +488,7 @@ class VNetworkGetHandler(res_handler.ResourceGetHandler, VNetworkMixin):
             except vnc_exc.NoIdError:
                 continue
             ret_dict[net_obj.uuid] = net_info
-        ret_list = []
-        for net in ret_dict.values():
-            ret_list.append(net)
-
-        return ret_list
+        return ret_dict.values()
 
     def resource_get(self, context, net_uuid, fields=None):
         contrail_extensions_enabled = self._kwargs.get(
@@ -468,7 +507,8 @@ class VNetworkGetHandler(res_handler.ResourceGetHandler, VNetworkMixin):
         if count is not None:
             return count
 
-        nets_info = self.resource_list(context=None, filters=filters)
+        nets_info = self.resource_list(context=None, filters=filters,
+                                       fields=['id'])
         return len(nets_info)
 
     def get_vn_list_project(self, project_id, count=False):
@@ -490,13 +530,12 @@ class VNetworkGetHandler(res_handler.ResourceGetHandler, VNetworkMixin):
         return ret_val
 
     def vn_list_shared(self):
-        ret_list = []
-        nets = self.get_vn_list_project(project_id=None)
-        for net in nets:
-            if not net.get_is_shared():
-                continue
-            ret_list.append(net)
-        return ret_list
+        """Returns the networks shared with all tenants.
+
+        These are filtered by the API server and the list is reused for
+        shared_vns_ttl seconds, the objects must not be modified.
+        """
+        return self._network_list_cached(self._network_list_shared)
 
 
 class VNetworkDeleteHandler(res_handler.ResourceDeleteHandler):
@@ -517,6 +556,8 @@ class VNetworkDeleteHandler(res_handler.ResourceDeleteHandler):
         except vnc_api.RefsExistError:
             self._raise_contrail_exception('NetworkInUse', net_id=net_id,
                                            resource='network')
+        subnet_keys.resolver.evict_network(net_id)
+        VNetworkMixin.invalidate_shared_vns()
 
 
 class VNetworkHandler(VNetworkGetHandler,
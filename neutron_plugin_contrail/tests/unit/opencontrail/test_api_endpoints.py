@@ -0,0 +1,153 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+import requests
+from requests.packages.urllib3 import exceptions as urllib3_exc
+
+from neutron_plugin_contrail.plugins.opencontrail import api_endpoints
+
+
+class EndpointBalancerTest(unittest.TestCase):
+
+    def _balancer(self, policy=api_endpoints.POLICY_EWMA):
+        endpoints = [api_endpoints.Endpoint('10.0.0.%d' % i, '8082')
+                     for i in range(1, 4)]
+        return api_endpoints.EndpointBalancer(endpoints, policy=policy)
+
+    def test_parse_endpoints(self):
+        self.assertEqual(
+            api_endpoints.parse_endpoints('10.0.0.1, 10.0.0.2:9100', 8082),
+            [('10.0.0.1', '8082'), ('10.0.0.2', '9100')])
+
+    def test_ewma_prefers_fastest(self):
+        balancer = self._balancer()
+        for endpoint, latency in zip(balancer.endpoints, [0.5, 0.1, 0.3]):
+            endpoint.ewma = latency
+        self.assertEqual(balancer.select().host, '10.0.0.2')
+
+        balancer.endpoints[1].outstanding = 5
+        self.assertEqual(balancer.select().host, '10.0.0.3')
+
+    def test_least_outstanding(self):
+        balancer = self._balancer(api_endpoints.POLICY_LEAST_OUTSTANDING)
+        for endpoint, outstanding in zip(balancer.endpoints, [2, 1, 3]):
+            endpoint.outstanding = outstanding
+        self.assertEqual(balancer.select().host, '10.0.0.2')
+
+    def test_failover_on_connection_error(self):
+        balancer = self._balancer()
+        tried = []
+
+        def _request(endpoint):
+            tried.append(endpoint.host)
+            if len(tried) == 1:
+                raise requests.exceptions.ConnectionError()
+            return endpoint.host
+
+        result = balancer.call(_request)
+        self.assertEqual(len(tried), 2)
+        self.assertEqual(result, tried[1])
+        down = [ep for ep in balancer.endpoints if ep.host == tried[0]][0]
+        self.assertEqual(down.failures, 1)
+        self.assertNotEqual(balancer.select().host, tried[0])
+
+    def test_all_endpoints_down_raises(self):
+        balancer = self._balancer()
+
+        def _request(endpoint):
+            raise requests.exceptions.ConnectionError()
+
+        self.assertRaises(requests.exceptions.ConnectionError,
+                          balancer.call, _request)
+
+    def test_read_timeout_not_retried_when_not_idempotent(self):
+        balancer = self._balancer()
+        tried = []
+
+        def _post(endpoint):
+            tried.append(endpoint.host)
+            raise requests.exceptions.ReadTimeout()
+
+        self.assertRaises(requests.exceptions.ReadTimeout,
+                          balancer.call, _post, idempotent=False)
+        self.assertEqual(len(tried), 1)
+
+    def test_connect_timeout_retried_when_not_idempotent(self):
+        balancer = self._balancer()
+        tried = []
+
+        def _post(endpoint):
+            tried.append(endpoint.host)
+            if len(tried) == 1:
+                raise requests.exceptions.ConnectTimeout()
+            return endpoint.host
+
+        self.assertEqual(balancer.call(_post, idempotent=False), tried[1])
+
+    def test_read_timeout_retried_when_idempotent(self):
+        balancer = self._balancer()
+        tried = []
+
+        def _get(endpoint):
+            tried.append(endpoint.host)
+            if len(tried) == 1:
+                raise requests.exceptions.ReadTimeout()
+            return endpoint.host
+
+        self.assertEqual(balancer.call(_get), tried[1])
+
+
+    def test_request_not_sent(self):
+        refused = requests.exceptions.ConnectionError(
+            urllib3_exc.MaxRetryError(
+                None, '/neutron/network',
+                reason=urllib3_exc.NewConnectionError(None, 'refused')))
+        dropped = requests.exceptions.ConnectionError(
+            urllib3_exc.ProtocolError('Connection aborted.'))
+        self.assertTrue(api_endpoints.request_not_sent(refused))
+        self.assertTrue(api_endpoints.request_not_sent(
+            requests.exceptions.ConnectTimeout()))
+        self.assertFalse(api_endpoints.request_not_sent(dropped))
+        self.assertFalse(api_endpoints.request_not_sent(
+            requests.exceptions.ReadTimeout()))
+
+
+class _Client(object):
+    api_server_host = '10.0.0.1'
+
+    def __init__(self):
+        self.calls = []
+
+    def virtual_network_read(self, id=None):
+        self.calls.append(id)
+        return id
+
+
+class BalancedVncApiTest(unittest.TestCase):
+
+    def setUp(self):
+        endpoints = [api_endpoints.Endpoint('10.0.0.1', '8082')]
+        self.vnc_lib = api_endpoints.BalancedVncApi(
+            api_endpoints.EndpointBalancer(endpoints),
+            lambda host, port: _Client())
+        self.vnc_lib.connect()
+
+    def test_methods_dispatched(self):
+        self.assertEqual(self.vnc_lib.virtual_network_read(id='vn'), 'vn')
+
+    def test_data_attributes_not_dispatched(self):
+        self.assertEqual(self.vnc_lib.api_server_host, '10.0.0.1')
+        self.assertRaises(AttributeError, getattr, self.vnc_lib, 'missing')
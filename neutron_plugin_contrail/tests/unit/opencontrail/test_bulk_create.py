@@ -0,0 +1,159 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+import eventlet
+
+from neutron_plugin_contrail.plugins.opencontrail import contrail_plugin_v3
+from neutron_plugin_contrail.plugins.opencontrail import contrail_plugin_vpc
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    contrail_res_handler as res_handler)
+
+
+class _Handler(res_handler.ResourceCreateHandler):
+    bulk_create_serialize_on = 'parent'
+
+    def __init__(self, fail_name=None):
+        super(_Handler, self).__init__(None)
+        self.fail_name = fail_name
+        self.fail_delete = None
+        self.created = []
+        self.deleted = []
+        self.in_flight = {}
+
+    def resource_create(self, context, resource):
+        parent = resource['parent']
+        if self.in_flight.get(parent):
+            raise AssertionError('concurrent creates on %s' % parent)
+        self.in_flight[parent] = True
+        eventlet.sleep(0.01)
+        self.in_flight[parent] = False
+        if resource['name'] == self.fail_name:
+            raise ValueError(resource['name'])
+        self.created.append(resource['name'])
+        return {'id': resource['name']}
+
+    def resource_delete(self, context, id):
+        if id == self.fail_delete:
+            raise RuntimeError(id)
+        self.deleted.append(id)
+
+
+class BulkCreateTest(unittest.TestCase):
+
+    def _resources(self):
+        return [{'name': 'res-%d' % i, 'parent': 'parent-%d' % (i % 3)}
+                for i in range(9)]
+
+    def test_results_in_order(self):
+        handler = _Handler()
+        results = handler.resource_create_bulk({}, self._resources())
+        self.assertEqual([r['id'] for r in results],
+                         ['res-%d' % i for i in range(9)])
+        self.assertEqual(handler.deleted, [])
+
+    def test_failure_rolls_back(self):
+        handler = _Handler(fail_name='res-4')
+        self.assertRaises(ValueError, handler.resource_create_bulk, {},
+                          self._resources())
+        self.assertNotIn('res-4', handler.created)
+        self.assertEqual(sorted(handler.deleted), sorted(handler.created))
+
+    def test_failed_rollback_logged(self):
+        logged = []
+
+        class _Log(object):
+            def exception(self, msg, *args):
+                logged.append(args)
+
+        self.addCleanup(setattr, res_handler, 'LOG', res_handler.LOG)
+        res_handler.LOG = _Log()
+        handler = _Handler(fail_name='res-4')
+        handler.fail_delete = 'res-0'
+        # the create failure is raised, not the rollback one
+        self.assertRaises(ValueError, handler.resource_create_bulk, {},
+                          self._resources())
+        self.assertEqual(logged, [('res-0',)])
+        self.assertNotIn('res-0', handler.deleted)
+
+
+class _Context(object):
+
+    def __init__(self):
+        self.tenant_id = 'tenant'
+
+
+class _RecordingHandler(res_handler.ResourceCreateHandler):
+
+    def __init__(self, fail_name=None):
+        super(_RecordingHandler, self).__init__(None)
+        self.fail_name = fail_name
+        self.created = []
+        self.deleted = []
+
+    def resource_create(self, context, resource):
+        if resource['name'] == self.fail_name:
+            raise ValueError(resource['name'])
+        self.created.append(resource['name'])
+        return dict(resource, id=resource['name'])
+
+    def resource_delete(self, context, id):
+        self.deleted.append(id)
+
+
+class PluginBulkCreateTest(unittest.TestCase):
+    # the collections neutron sends bulk requests for
+    bulk_resources = ['network', 'subnet', 'port', 'security_group',
+                      'security_group_rule', 'route_table', 'nat_instance']
+
+    def setUp(self):
+        super(PluginBulkCreateTest, self).setUp()
+        plugin_cls = contrail_plugin_v3.NeutronPluginContrailCoreV3
+        self.plugin = plugin_cls.__new__(plugin_cls)
+        self.plugin.base_binding_dict = {}
+        self.plugin._set_user_auth_token = lambda: None
+        self.plugin._validate_subnet_create = lambda subnet: None
+        self.plugin._res_handlers = dict(
+            (res_type, _RecordingHandler())
+            for res_type in self.bulk_resources)
+
+        # bind the vpc extension like the contrail_extensions option does
+        vpc = contrail_plugin_vpc.NeutronPluginContrailVpc()
+        vpc.set_core(self.plugin)
+        for method in dir(vpc):
+            if method.startswith('create_'):
+                setattr(self.plugin, method, getattr(vpc, method))
+
+    def _create_bulk(self, res_type, names):
+        body = {res_type + 's': [{res_type: {'name': name}}
+                                 for name in names]}
+        create_bulk = getattr(self.plugin, 'create_%s_bulk' % res_type)
+        return create_bulk(_Context(), body)
+
+    def test_bulk_create_per_collection(self):
+        for res_type in self.bulk_resources:
+            names = ['%s-%d' % (res_type, i) for i in range(3)]
+            results = self._create_bulk(res_type, names)
+            self.assertEqual([res['id'] for res in results], names)
+            self.assertEqual(
+                sorted(self.plugin._res_handlers[res_type].created), names)
+
+    def test_nat_instance_failure_rolls_back(self):
+        handler = _RecordingHandler(fail_name='nat-1')
+        self.plugin._res_handlers['nat_instance'] = handler
+        self.assertRaises(ValueError, self._create_bulk, 'nat_instance',
+                          ['nat-0', 'nat-1', 'nat-2'])
+        self.assertEqual(handler.created, ['nat-0'])
+        self.assertEqual(handler.deleted, ['nat-0'])
@@ -0,0 +1,65 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from neutron_plugin_contrail.plugins.opencontrail import cache_coherence
+from neutron_plugin_contrail.plugins.opencontrail import vnc_cache
+from neutron_plugin_contrail.tests.unit.opencontrail import test_vnc_cache
+
+
+class CacheCoherenceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vnc = test_vnc_cache._FakeVnc()
+        self.vnc.objs['vn1'] = test_vnc_cache._Obj('vn1', ['d', 'p', 'net1'])
+        self.cache = vnc_cache.CachingVncApi(self.vnc, ttl=5)
+        self.bus = cache_coherence.InProcessChangeStream()
+        self.coherence = cache_coherence.CacheCoherence(
+            self.cache, self.bus, ttl=300, fallback_ttl=5)
+        self.coherence.start()
+        self.bus.connect()
+
+    def _read(self):
+        return self.cache.virtual_network_read(id='vn1')
+
+    def test_notification_evicts(self):
+        self._read()
+        self._read()
+        self.assertEqual(self.vnc.reads, 1)
+
+        self.bus.publish({'oper': 'UPDATE', 'type': 'virtual_network',
+                          'uuid': 'vn1'})
+        self._read()
+        self.assertEqual(self.vnc.reads, 2)
+        self.assertEqual(self.coherence.get_stats()['notifications'], 1)
+
+    def test_notified_refs_evicted(self):
+        self._read()
+        self.bus.publish({'oper': 'CREATE',
+                          'type': 'virtual_machine_interface',
+                          'uuid': 'vmi1', 'fq_name': ['d', 'p', 'vmi1'],
+                          'obj_dict': {'virtual_network_refs': [
+                              {'to': ['d', 'p', 'net1'], 'uuid': 'vn1'}]}})
+        self._read()
+        self.assertEqual(self.vnc.reads, 2)
+
+    def test_ttl_follows_stream(self):
+        self.assertEqual(self.cache._ttl, 300)
+        self._read()
+        self.bus.disconnect()
+        self.assertEqual(self.cache._ttl, 5)
+        self.assertEqual(self.cache.get_cache_stats()['entries'], 0)
+        self.bus.publish({'oper': 'DELETE', 'uuid': 'vn1'})
+        self.assertEqual(self.coherence.get_stats()['notifications'], 0)
@@ -0,0 +1,80 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from neutron_plugin_contrail.plugins.opencontrail import connection_pool
+
+
+class SessionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        super(SessionPoolTest, self).setUp()
+        self._patcher = mock.patch.object(connection_pool.requests, 'Session')
+        self.session_cls = self._patcher.start()
+        self.session_cls.side_effect = lambda: mock.Mock()
+
+    def tearDown(self):
+        self._patcher.stop()
+        super(SessionPoolTest, self).tearDown()
+
+    def test_session_reused(self):
+        pool = connection_pool.SessionPool('test', pool_size=2)
+        with pool.session() as first:
+            pass
+        with pool.session() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(pool.get_stats()['hits'], 1)
+        self.assertEqual(pool.get_stats()['misses'], 1)
+
+    def test_concurrent_checkouts_get_distinct_sessions(self):
+        pool = connection_pool.SessionPool('test', pool_size=2)
+        with pool.session() as first:
+            with pool.session() as second:
+                self.assertIsNot(first, second)
+        self.assertEqual(pool.get_stats()['idle'], 2)
+
+    def test_pool_size_bounds_idle_sessions(self):
+        pool = connection_pool.SessionPool('test', pool_size=1)
+        with pool.session() as first:
+            with pool.session() as second:
+                pass
+        self.assertEqual(pool.get_stats()['idle'], 1)
+        self.assertTrue(first.close.called or second.close.called)
+
+    def test_idle_session_expired(self):
+        pool = connection_pool.SessionPool('test', idle_timeout=60)
+        with mock.patch.object(connection_pool.time, 'time') as now:
+            now.return_value = 1000
+            with pool.session() as first:
+                pass
+            now.return_value = 1061
+            with pool.session() as second:
+                pass
+        self.assertIsNot(first, second)
+        first.close.assert_called_once_with()
+        self.assertEqual(pool.get_stats()['expired'], 1)
+        self.assertEqual(pool.get_stats()['misses'], 2)
+
+    def test_failed_session_not_reused(self):
+        pool = connection_pool.SessionPool('test')
+        try:
+            with pool.session() as session:
+                raise IOError()
+        except IOError:
+            pass
+        session.close.assert_called_once_with()
+        self.assertEqual(pool.get_stats()['idle'], 0)
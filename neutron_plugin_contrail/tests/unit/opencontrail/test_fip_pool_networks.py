@@ -0,0 +1,149 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    fip_res_handler as fip_handler)
+
+
+class _Fip(object):
+
+    def __init__(self, pool_id, net_name):
+        self.parent_uuid = pool_id
+        self.fq_name = ['default-domain', 'admin', net_name, 'pool', 'fip']
+
+    def get_fq_name(self):
+        return self.fq_name
+
+
+class _FqNameVnc(object):
+
+    def __init__(self):
+        self.resolved = []
+
+    def fq_name_to_id(self, obj_type, fq_name):
+        self.resolved.append(fq_name)
+        return '%s-id' % fq_name[-1]
+
+
+class FloatingIpPoolNetworksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vnc = _FqNameVnc()
+        self.networks = fip_handler.FloatingIpPoolNetworks(max_entries=2)
+
+    def test_resolved_once_per_pool(self):
+        for _ in range(3):
+            self.assertEqual('public-id', self.networks.network_id(
+                self.vnc, _Fip('pool-1', 'public')))
+        self.assertEqual([['default-domain', 'admin', 'public']],
+                         self.vnc.resolved)
+
+    def test_least_recently_used_dropped(self):
+        self.networks.network_id(self.vnc, _Fip('pool-1', 'net-1'))
+        self.networks.network_id(self.vnc, _Fip('pool-2', 'net-2'))
+        self.networks.network_id(self.vnc, _Fip('pool-1', 'net-1'))
+        self.networks.network_id(self.vnc, _Fip('pool-3', 'net-3'))
+        self.networks.network_id(self.vnc, _Fip('pool-1', 'net-1'))
+        self.assertEqual(3, len(self.vnc.resolved))
+        self.networks.network_id(self.vnc, _Fip('pool-2', 'net-2'))
+        self.assertEqual(4, len(self.vnc.resolved))
+
+    def test_not_cached_without_pool_id(self):
+        self.networks.network_id(self.vnc, _Fip(None, 'net-1'))
+        self.networks.network_id(self.vnc, _Fip(None, 'net-1'))
+        self.assertEqual(2, len(self.vnc.resolved))
+
+
+class _FipObj(_Fip):
+
+    def __init__(self, index, vmi_id):
+        super(_FipObj, self).__init__('pool-1', 'public')
+        self.uuid = 'fip-%d' % index
+        self.vmi_id = vmi_id
+
+    def get_project_refs(self):
+        return [{'uuid': '1d1bd4b0-5a8d-4bb1-a0cd-000000000000'}]
+
+    def get_virtual_machine_interface_refs(self):
+        return [{'uuid': self.vmi_id}]
+
+    def get_floating_ip_address(self):
+        return None
+
+    def get_floating_ip_fixed_ip_address(self):
+        return None
+
+
+class _Vmi(object):
+
+    def __init__(self, vmi_id):
+        self.uuid = vmi_id
+
+    def get_virtual_machine_interface_properties(self):
+        return None
+
+    def get_virtual_network_refs(self):
+        return [{'uuid': 'private'}]
+
+
+class _FipVnc(_FqNameVnc):
+
+    def __init__(self, fips, vmis):
+        super(_FipVnc, self).__init__()
+        self.fips = fips
+        self.vmis = dict((vmi.uuid, vmi) for vmi in vmis)
+        self.calls = []
+
+    def floating_ips_list(self, **kwargs):
+        self.calls.append('floating_ips_list')
+        return list(self.fips)
+
+    def logical_routers_list(self, **kwargs):
+        self.calls.append('logical_routers_list')
+        return []
+
+    def virtual_machine_interfaces_list(self, obj_uuids=None, **kwargs):
+        self.calls.append('virtual_machine_interfaces_list')
+        return [self.vmis[vmi_id] for vmi_id in obj_uuids
+                if vmi_id in self.vmis]
+
+
+class FloatingIpListTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(fip_handler.pool_networks.clear)
+
+    def test_interfaces_read_in_bulk(self):
+        # the interface of the last floating ip was deleted
+        vnc = _FipVnc([_FipObj(i, 'vmi-%d' % i) for i in range(5)],
+                      [_Vmi('vmi-%d' % i) for i in range(4)])
+        handler = fip_handler.FloatingIpGetHandler(vnc)
+        fips = handler.resource_list({'is_admin': True})
+        self.assertEqual([fip['port_id'] for fip in fips],
+                         ['vmi-0', 'vmi-1', 'vmi-2', 'vmi-3', None])
+        self.assertEqual(
+            vnc.calls.count('virtual_machine_interfaces_list'), 1)
+
+    def test_count_not_converted(self):
+        vnc = _FipVnc([_FipObj(i, 'vmi-%d' % i) for i in range(5)],
+                      [_Vmi('vmi-%d' % i) for i in range(5)])
+        handler = fip_handler.FloatingIpGetHandler(vnc)
+        count = handler.resource_count(
+            {'is_admin': True}, {'port_id': ['vmi-%d' % i for i in range(5)]})
+        self.assertEqual(count, 5)
+        # no port, router or pool network read to count
+        self.assertEqual(vnc.calls, ['floating_ips_list'])
+        self.assertEqual(vnc.resolved, [])
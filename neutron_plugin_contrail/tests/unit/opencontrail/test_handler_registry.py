@@ -0,0 +1,135 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    contrail_res_handler as res_handler)
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    router_res_handler as rtr_handler)
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    subnet_res_handler as subnet_handler)
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    vmi_res_handler as vmi_handler)
+
+
+class HandlerRegistryTest(unittest.TestCase):
+
+    def test_handlers_shared(self):
+        registry = res_handler.HandlerRegistry(None)
+        vmi = vmi_handler.VMInterfaceGetHandler(None, registry=registry)
+        sg = vmi._get_handler(res_handler.SGHandler)
+        self.assertIs(vmi._get_handler(res_handler.SGHandler), sg)
+        self.assertIs(sg._registry, registry)
+        self.assertIs(registry.get(res_handler.SGHandler), sg)
+
+    def test_settings_passed_to_handlers(self):
+        registry = res_handler.HandlerRegistry(None, router_index_ttl=60)
+        sg = registry.get(res_handler.SGHandler)
+        self.assertEqual(sg._kwargs, {'router_index_ttl': 60})
+
+        # handlers without a registry build their own with their settings
+        vmi = vmi_handler.VMInterfaceGetHandler(None,
+                                                list_uuids_max_length=64)
+        self.assertEqual(
+            vmi._get_handler(res_handler.SGHandler)._kwargs,
+            {'list_uuids_max_length': 64})
+
+    def test_plugin_settings_passed_to_internal_handlers(self):
+        settings = {'contrail_extensions_enabled': True,
+                    'apply_subnet_host_routes': True}
+        registry = res_handler.HandlerRegistry(None, **settings)
+        rtr_iface = registry.get(rtr_handler.LogicalRouterInterfaceHandler)
+        # the ports and subnets of router interfaces are handled as the
+        # ones the plugin handles
+        self.assertIs(rtr_iface._vmi_handler,
+                      registry.get(vmi_handler.VMInterfaceHandler))
+        self.assertEqual(rtr_iface._vmi_handler._kwargs, settings)
+        self.assertIs(rtr_iface._subnet_handler,
+                      registry.get(subnet_handler.SubnetHandler))
+        self.assertEqual(rtr_iface._subnet_handler._kwargs, settings)
+
+    def test_port_conversions_share_handlers(self):
+        built = []
+        answering = []
+
+        class _Counting(res_handler.HandlerRegistry):
+            def get(self, handler_cls):
+                if handler_cls not in self._handlers:
+                    built.append(handler_cls)
+                return super(_Counting, self).get(handler_cls)
+
+        def _get_no_rule_security_group(sg_handler):
+            answering.append(sg_handler)
+            return _NoRuleSg()
+
+        self.addCleanup(setattr, res_handler.SGHandler,
+                        'get_no_rule_security_group',
+                        res_handler.SGHandler.get_no_rule_security_group)
+        res_handler.SGHandler.get_no_rule_security_group = (
+            _get_no_rule_security_group)
+
+        registry = _Counting(None)
+        vmi = vmi_handler.VMInterfaceGetHandler(None, registry=registry)
+        ports = [vmi._vmi_to_neutron_port(_Vmi(i), {},
+                                          fields=['id', 'security_groups'])
+                 for i in range(10)]
+
+        self.assertEqual(ports[3], {'id': 'vmi-3', 'security_groups': ['sg']})
+        self.assertEqual(built, [res_handler.SGHandler])
+        self.assertEqual(len(answering), 10)
+        sg = registry.get(res_handler.SGHandler)
+        for sg_handler in answering:
+            self.assertIs(sg_handler, sg)
+
+        # another registry, eg. of another plugin, has its own handlers
+        other = vmi_handler.VMInterfaceGetHandler(
+            None, registry=res_handler.HandlerRegistry(None))
+        other._vmi_to_neutron_port(_Vmi(0), {}, fields=['security_groups'])
+        self.assertIsNot(answering[-1], sg)
+
+
+class _NoRuleSg(object):
+    uuid = 'no-rule-sg'
+
+
+class _IdPerms(object):
+    enable = True
+
+
+class _Vmi(object):
+    parent_type = 'project'
+    parent_uuid = '1d1bd4b0-5a8d-4bb1-a0cd-000000000000'
+    display_name = 'port'
+
+    def __init__(self, index):
+        self.uuid = 'vmi-%d' % index
+
+    def get_virtual_network_refs(self):
+        return [{'uuid': 'vn-1'}]
+
+    def get_security_group_refs(self):
+        return [{'uuid': 'sg'}, {'uuid': 'no-rule-sg'}]
+
+    def get_virtual_machine_interface_mac_addresses(self):
+        return None
+
+    def get_virtual_machine_interface_dhcp_option_list(self):
+        return None
+
+    def get_virtual_machine_interface_allowed_address_pairs(self):
+        return None
+
+    def get_id_perms(self):
+        return _IdPerms()
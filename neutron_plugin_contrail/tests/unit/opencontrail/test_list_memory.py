@@ -0,0 +1,78 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import types
+import unittest
+
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    contrail_res_handler as res_handler)
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    vmi_res_handler as vmi_handler)
+
+
+class IterListsTest(unittest.TestCase):
+
+    def test_list_read_once_previous_consumed(self):
+        read = []
+
+        def _list_getter(name, size):
+            def _list():
+                read.append(name)
+                return ['%s-%d' % (name, i) for i in range(size)]
+            return _list
+
+        objs = res_handler.ContrailResourceHandler._iter_lists(
+            [_list_getter('p1', 2), _list_getter('p2', 1)])
+        self.assertEqual(read, [])
+        self.assertEqual(next(objs), 'p1-0')
+        self.assertEqual(next(objs), 'p1-1')
+        self.assertEqual(read, ['p1'])
+        self.assertEqual(next(objs), 'p2-0')
+        self.assertEqual(read, ['p1', 'p2'])
+        self.assertEqual(list(objs), [])
+
+
+class _Vmi(object):
+
+    def __init__(self, name):
+        self.display_name = name
+
+
+class PortsDictTest(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = vmi_handler.VMInterfaceGetHandler(None)
+        self.converted = []
+
+        def _vmi_to_neutron_port(vmi_obj, memo_req, **kwargs):
+            self.converted.append(vmi_obj.display_name)
+            return {'name': vmi_obj.display_name}
+
+        self.handler._vmi_to_neutron_port = _vmi_to_neutron_port
+
+    def test_ports_converted_as_consumed(self):
+        ports = self.handler._get_ports_dict(
+            [_Vmi('port-%d' % i) for i in range(3)], {})
+        self.assertIsInstance(ports, types.GeneratorType)
+        self.assertEqual(self.converted, [])
+        self.assertEqual(next(ports), {'name': 'port-0'})
+        self.assertEqual(self.converted, ['port-0'])
+
+    def test_filtered_ports_not_converted(self):
+        ports = self.handler._get_ports_dict(
+            [_Vmi('port-%d' % i) for i in range(3)], {},
+            pre_filter=lambda vmi_obj, memo: vmi_obj.display_name != 'port-1')
+        self.assertEqual([port['name'] for port in ports],
+                         ['port-0', 'port-2'])
+        self.assertEqual(self.converted, ['port-0', 'port-2'])
@@ -0,0 +1,95 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from neutron_plugin_contrail.plugins.opencontrail import contrail_plugin_v3
+from neutron_plugin_contrail.plugins.opencontrail import contrail_plugin_vpc
+from neutron_plugin_contrail.plugins.opencontrail import pagination
+
+
+class PaginateTest(unittest.TestCase):
+
+    def setUp(self):
+        super(PaginateTest, self).setUp()
+        self.resources = [{'id': 'id-%d' % i, 'name': 'net-%d' % (i % 3)}
+                          for i in range(9)]
+
+    def _ids(self, page):
+        return [res['id'] for res in page]
+
+    def test_limit_and_marker(self):
+        page = pagination.paginate(iter(self.resources), limit=4)
+        self.assertEqual(self._ids(page), ['id-0', 'id-1', 'id-2', 'id-3'])
+        page = pagination.paginate(iter(self.resources), limit=4,
+                                   marker_obj=page[-1])
+        self.assertEqual(self._ids(page), ['id-4', 'id-5', 'id-6', 'id-7'])
+
+    def test_sorts(self):
+        page = pagination.paginate(self.resources,
+                                   sorts=[('name', False)], limit=4)
+        self.assertEqual(self._ids(page), ['id-2', 'id-5', 'id-8', 'id-1'])
+        page = pagination.paginate(self.resources,
+                                   sorts=[('name', False)], limit=4,
+                                   marker_obj=page[-1])
+        self.assertEqual(self._ids(page), ['id-4', 'id-7', 'id-0', 'id-3'])
+
+    def test_page_reverse(self):
+        page = pagination.paginate(self.resources, limit=3,
+                                   marker_obj=self.resources[5],
+                                   page_reverse=True)
+        self.assertEqual(self._ids(page), ['id-2', 'id-3', 'id-4'])
+
+
+class _Context(object):
+    tenant_id = 'tenant'
+
+
+class _ListHandler(object):
+
+    def __init__(self, resources):
+        self.resources = dict((res['id'], res) for res in resources)
+
+    def resource_list(self, context, filters, fields):
+        return sorted(self.resources.values(), key=lambda res: res['id'])
+
+    def resource_get(self, context, id, fields):
+        return self.resources[id]
+
+
+class RouteTablePageTest(unittest.TestCase):
+
+    def setUp(self):
+        super(RouteTablePageTest, self).setUp()
+        plugin_cls = contrail_plugin_v3.NeutronPluginContrailCoreV3
+        self.plugin = plugin_cls.__new__(plugin_cls)
+        self.plugin._set_user_auth_token = lambda: None
+        self.plugin._res_handlers = {'route_table': _ListHandler(
+            [{'id': 'id-%d' % i, 'name': 'rt-%d' % (i % 2)}
+             for i in range(5)])}
+        self.vpc = contrail_plugin_vpc.NeutronPluginContrailVpc()
+        self.vpc.set_core(self.plugin)
+
+    def _ids(self, page):
+        return [res['id'] for res in page]
+
+    def test_route_tables_paged(self):
+        page = self.vpc.get_route_tables(_Context(), limit=2)
+        self.assertEqual(self._ids(page), ['id-0', 'id-1'])
+        page = self.vpc.get_route_tables(_Context(), limit=2,
+                                         marker=page[-1]['id'])
+        self.assertEqual(self._ids(page), ['id-2', 'id-3'])
+        page = self.vpc.get_route_tables(_Context(), sorts=[('name', True)],
+                                         limit=3)
+        self.assertEqual(self._ids(page), ['id-0', 'id-2', 'id-4'])
@@ -0,0 +1,160 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    vmi_res_handler as vmi_handler)
+from neutron_plugin_contrail.tests.unit.opencontrail import vnc_mock
+
+
+class _Obj(object):
+    def __init__(self, uuid, **kwargs):
+        self.uuid = uuid
+        self.parent_uuid = None
+        self.__dict__.update(kwargs)
+
+
+class _Vmi(_Obj):
+    parent_type = 'project'
+    display_name = None
+    device_owner = 'compute:nova'
+    vm_refs = None
+
+    def get_fq_name(self):
+        return ['default-domain', 'demo', self.uuid]
+
+    def get_virtual_machine_refs(self):
+        return self.vm_refs
+
+    def get_virtual_network_refs(self):
+        return [{'uuid': 'vn-1'}]
+
+    def get_virtual_machine_interface_device_owner(self):
+        return self.device_owner
+
+
+class _Iip(_Obj):
+    def get_instance_ip_address(self):
+        return self.address
+
+
+class _CountingVnc(vnc_mock.MockVnc):
+    def __init__(self):
+        self.iips_listed = []
+
+    def __getattr__(self, method):
+        func = super(_CountingVnc, self).__getattr__(method)
+        if method != 'instance_ips_list':
+            return func
+
+        def _list(**kwargs):
+            ret = func(**kwargs)
+            self.iips_listed.append(len(ret))
+            return ret
+        return _list
+
+
+class PortListInstanceIpsTest(unittest.TestCase):
+    niips = 20000
+    nports = 10
+
+    def setUp(self):
+        super(PortListInstanceIpsTest, self).setUp()
+        collection = vnc_mock.MockVnc.resources_collection
+        saved = dict(collection)
+        self.addCleanup(collection.update, saved)
+        self.addCleanup(collection.clear)
+
+        collection['instance_ip'] = dict(
+            ('iip-%d' % i, _Obj('iip-%d' % i)) for i in range(self.niips))
+        collection['virtual_machine_interface'] = dict(
+            ('vmi-%d' % i, _Obj('vmi-%d' % i, instance_ip_back_refs=[
+                {'uuid': 'iip-%d' % (2 * i)},
+                {'uuid': 'iip-%d' % (2 * i + 1)}]))
+            for i in range(self.nports))
+        self.vnc = _CountingVnc()
+        self.handler = vmi_handler.VMInterfaceGetHandler(self.vnc)
+
+    def _list(self, is_admin):
+        return self.handler._get_vmis_nets_ips(
+            {'is_admin': is_admin},
+            vmi_uuids=['vmi-%d' % i for i in range(self.nports)])
+
+    def test_only_port_ips_read(self):
+        for is_admin in (True, False):
+            self.vnc.iips_listed = []
+            vmi_objs, _, iip_objs = self._list(is_admin)
+            self.assertEqual(len(vmi_objs), self.nports)
+            self.assertEqual(sorted(iip.uuid for iip in iip_objs),
+                             sorted('iip-%d' % i
+                                    for i in range(2 * self.nports)))
+            self.assertEqual(self.vnc.iips_listed, [2 * self.nports])
+
+    def test_reads_chunked(self):
+        # 'iip-<n>' uuids, 8 of at most 6 characters and a comma per list
+        self.handler = vmi_handler.VMInterfaceGetHandler(
+            self.vnc, list_uuids_max_length=8 * 7)
+        _, _, iip_objs = self._list(True)
+        self.assertEqual(len(iip_objs), 2 * self.nports)
+        self.assertEqual(sum(self.vnc.iips_listed), 2 * self.nports)
+        self.assertEqual(len(self.vnc.iips_listed), 3)
+
+    def test_projection(self):
+        self.assertEqual(self.handler._plan_projection(None),
+                         (None, self.handler.back_ref_fields))
+        self.assertEqual(
+            self.handler._plan_projection(['id', 'device_id'], ['name']),
+            (set(['id', 'device_id', 'name']), ['logical_router_back_refs']))
+
+        fields, back_ref_fields = self.handler._plan_projection(['id'])
+        vmi_objs, _, iip_objs = self.handler._get_vmis_nets_ips(
+            {'is_admin': True},
+            vmi_uuids=['vmi-%d' % i for i in range(self.nports)],
+            fields=fields, back_ref_fields=back_ref_fields)
+        self.assertEqual(len(vmi_objs), self.nports)
+        self.assertEqual(iip_objs, [])
+        self.assertEqual(self.vnc.iips_listed, [])
+
+    def test_pre_conversion_filters(self):
+        memo_req = {'networks': {},
+                    'instance-ips': {'iip-1': _Iip('iip-1',
+                                                   address='10.0.0.3')}}
+
+        def _passes(vmi, **filters):
+            return self.handler._compile_port_filters(filters, [])(vmi,
+                                                                    memo_req)
+
+        self.assertTrue(_passes(_Vmi('vmi-1'), name=['vmi-1']))
+        self.assertFalse(_passes(_Vmi('vmi-1', display_name='web'),
+                                 name=['vmi-1']))
+
+        self.assertFalse(_passes(_Vmi('vmi-1'), device_owner=['network:dhcp']))
+        # router gateway ports only get their owner on conversion
+        gw_port = _Vmi('vmi-1', vm_refs=[{'uuid': 'vm-1', 'to': ['si_1']}])
+        self.assertTrue(_passes(gw_port, device_owner=['network:dhcp']))
+
+        port = _Vmi('vmi-1', instance_ip_back_refs=[{'uuid': 'iip-1'}])
+        self.assertTrue(_passes(port,
+                                fixed_ips={'ip_address': ['10.0.0.3']}))
+        self.assertFalse(_passes(port,
+                                 fixed_ips={'ip_address': ['10.0.0.4']}))
+        # subnets are resolved on the memo networks, not read here
+        self.assertTrue(_passes(port, fixed_ips={'subnet_id': ['sn-1']}))
+
+    def test_scale(self):
+        # what the admin path used to read, whatever the ports listed
+        self.vnc.instance_ips_list(detail=True)
+        self._list(True)
+        self.assertEqual(self.vnc.iips_listed, [self.niips, 2 * self.nports])
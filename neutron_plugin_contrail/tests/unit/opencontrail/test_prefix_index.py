@@ -0,0 +1,64 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    prefix_index)
+
+
+class SubnetPrefixIndexTest(unittest.TestCase):
+
+    def test_lookup(self):
+        index = prefix_index.SubnetPrefixIndex(
+            [{'id': 'a', 'cidr': '10.0.0.0/24'},
+             {'id': 'b', 'cidr': '10.0.2.0/23'},
+             {'id': 'c', 'cidr': 'fd00::/64'}])
+        self.assertEqual(index.lookup('10.0.0.5'), 'a')
+        self.assertEqual(index.lookup('10.0.3.255'), 'b')
+        self.assertEqual(index.lookup('fd00::1'), 'c')
+        self.assertIsNone(index.lookup('10.0.1.1'))
+        self.assertIsNone(index.lookup('fd01::1'))
+        self.assertIsNone(index.lookup('not-an-ip'))
+
+    def test_overlapping_keeps_ipam_order(self):
+        index = prefix_index.SubnetPrefixIndex(
+            [{'id': 'narrow', 'cidr': '10.0.0.128/25'},
+             {'id': 'wide', 'cidr': '10.0.0.0/16'}])
+        self.assertEqual(index.lookup('10.0.0.200'), 'narrow')
+        self.assertEqual(index.lookup('10.0.1.1'), 'wide')
+
+
+class CidrOverlapIndexTest(unittest.TestCase):
+
+    def test_overlapping(self):
+        index = prefix_index.CidrOverlapIndex(
+            [('10.0.0.0/24', 'a'), ('10.0.4.0/22', 'b'),
+             ('fd00::/64', 'c'), ('10.1.0.0/16', 'd')])
+        self.assertEqual(index.overlapping('10.0.0.128/25'), ['a'])
+        self.assertEqual(index.overlapping('10.0.0.0/8'), ['a', 'b', 'd'])
+        self.assertEqual(index.overlapping('10.0.6.1/32'), ['b'])
+        self.assertEqual(index.overlapping('fd00::/48'), ['c'])
+        self.assertEqual(index.overlapping('10.0.1.0/24'), [])
+        self.assertEqual(index.overlapping('10.0.8.0/21'), [])
+        self.assertEqual(index.overlapping('::/0'), ['c'])
+
+    def test_overlapping_ranges_indexed(self):
+        index = prefix_index.CidrOverlapIndex(
+            [('10.0.0.0/8', 'wide'), ('10.0.0.0/24', 'a'),
+             ('10.2.0.0/16', 'b')])
+        self.assertEqual(index.overlapping('10.3.0.0/24'), ['wide'])
+        self.assertEqual(index.overlapping('10.2.3.0/24'), ['wide', 'b'])
+        self.assertEqual(prefix_index.CidrOverlapIndex().overlapping(
+            '10.0.0.0/24'), [])
@@ -0,0 +1,240 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import BaseHTTPServer
+import json
+import threading
+import unittest
+
+import eventlet
+import mock
+import requests
+
+from neutron_plugin_contrail.plugins.opencontrail import api_endpoints
+from neutron_plugin_contrail.plugins.opencontrail import connection_pool
+from neutron_plugin_contrail.plugins.opencontrail import contrail_plugin
+from neutron_plugin_contrail.plugins.opencontrail import request_batcher
+
+
+class _BatchHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Stand-in api server answering /neutron/batch and /neutron/<type>."""
+
+    def _reply(self, status, data):
+        reply = json.dumps(data)
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def do_POST(self):
+        self.server.round_trips += 1
+        self.server.auth_tokens.append(self.headers.get('X-AUTH-TOKEN'))
+        body = json.loads(self.rfile.read(
+            int(self.headers['Content-Length'])))
+        if self.path == '/neutron/batch':
+            if not self.server.batch_supported:
+                return self._reply(404, {'message': 'not found'})
+            if self.server.batch_status != 200:
+                return self._reply(self.server.batch_status,
+                                   {'message': 'unavailable'})
+            operations = body['operations']
+        else:
+            operations = [body]
+        results = []
+        for operation in operations:
+            name = operation['data']['resource']['name']
+            if name == 'bad':
+                results.append({'status_code': 400,
+                                'data': {'message': 'bad name'}})
+            else:
+                obj_type = operation['context']['type']
+                results.append({'status_code': 200,
+                                'data': {'name': name, 'type': obj_type}})
+        if self.path != '/neutron/batch':
+            # single operations are answered as is
+            return self._reply(results[0]['status_code'],
+                               results[0]['data'])
+        self._reply(200, results)
+
+    def log_message(self, *args):
+        pass
+
+
+class _BatchServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                                _BatchHandler)
+        self.server.round_trips = 0
+        self.server.auth_tokens = []
+        self.server.batch_supported = True
+        self.server.batch_status = 200
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.shutdown)
+        self.url = 'http://127.0.0.1:%d/neutron' % self.server.server_port
+
+    def _operation(self, obj_type, name):
+        return {'context': {'type': obj_type, 'operation': 'CREATE'},
+                'data': {'resource': {'name': name}}}
+
+    def _operations(self):
+        types = ('port', 'subnet', 'security_group_rule')
+        return [self._operation(types[i % 3],
+                                'bad' if i == 7 else 'res-%d' % i)
+                for i in range(20)]
+
+
+class RequestBatcherTest(_BatchServerTest):
+
+    def _send_batch(self, key, operations):
+        response = requests.post(self.url + '/batch',
+                                 data=json.dumps({'operations': operations}))
+        return [(r['status_code'], r['data']) for r in response.json()]
+
+    def _send_one(self, operation):
+        response = requests.post(
+            '%s/%s' % (self.url, operation['context']['type']),
+            data=json.dumps(operation))
+        return response.status_code, response.json()
+
+    def test_concurrent_calls_share_round_trips(self):
+        batcher = request_batcher.RequestBatcher(self._send_batch,
+                                                 max_size=10, window=0.05)
+        pool = eventlet.GreenPool()
+        operations = self._operations()
+        results = list(pool.imap(lambda op: batcher.submit(None, op),
+                                 operations))
+        batched_round_trips = self.server.round_trips
+
+        self.server.round_trips = 0
+        for operation in operations:
+            self._send_one(operation)
+
+        self.assertEqual(batched_round_trips, 2)
+        self.assertEqual(self.server.round_trips, len(operations))
+        self.assertEqual(results[7], (400, {'message': 'bad name'}))
+        self.assertEqual(results[0], (200, {'name': 'res-0', 'type': 'port'}))
+        self.assertEqual(results[5], (200, {'name': 'res-5',
+                                            'type': 'security_group_rule'}))
+
+    def test_window_flushes_partial_batch(self):
+        batcher = request_batcher.RequestBatcher(self._send_batch,
+                                                 max_size=10, window=0.01)
+        result = batcher.submit(None, self._operation('network', 'net'))
+        self.assertEqual(result, (200, {'name': 'net', 'type': 'network'}))
+        self.assertEqual(self.server.round_trips, 1)
+
+    def test_batches_per_key(self):
+        sent = []
+
+        def _send_batch(key, items):
+            sent.append((key, items))
+            return items
+
+        batcher = request_batcher.RequestBatcher(_send_batch, max_size=10,
+                                                 window=0.01)
+        pool = eventlet.GreenPool()
+        results = list(pool.imap(batcher.submit, ['a', 'b', 'a'], [1, 2, 3]))
+        self.assertEqual(results, [1, 2, 3])
+        self.assertEqual(sorted(sent), [('a', [1, 3]), ('b', [2])])
+
+    def test_send_failure_raised_to_all_callers(self):
+        def _send_batch(key, items):
+            raise requests.exceptions.ConnectionError()
+
+        batcher = request_batcher.RequestBatcher(_send_batch, max_size=2)
+        pool = eventlet.GreenPool()
+        threads = [pool.spawn(batcher.submit, None, i) for i in range(2)]
+        for thread in threads:
+            self.assertRaises(requests.exceptions.ConnectionError,
+                              thread.wait)
+
+
+class _Context(object):
+    user_id = 'user'
+    tenant_id = 'tenant'
+    tenant = 'tenant'
+    is_admin = False
+    roles = ['member']
+
+
+class PluginBatchTest(_BatchServerTest):
+    """Relays operations through the plugin to the stand-in api server."""
+
+    def setUp(self):
+        super(PluginBatchTest, self).setUp()
+        plugin_cls = contrail_plugin.NeutronPluginContrailCoreV2
+        # the relay only needs the state _build_auth_details() sets up
+        self.plugin = plugin_cls.__new__(plugin_cls)
+        self.plugin._apiserverconnect = 'http'
+        self.plugin._apiinsecure = False
+        self.plugin._use_api_certs = False
+        self.plugin._authn_token = None
+        self.plugin._token_manager = None
+        self.plugin._api_endpoints = api_endpoints.EndpointBalancer(
+            [api_endpoints.Endpoint('127.0.0.1',
+                                    str(self.server.server_port))])
+        self.plugin._api_session_pool = connection_pool.SessionPool(
+            'apiserver')
+        self.plugin._batcher = request_batcher.RequestBatcher(
+            self.plugin._request_backend_batch, max_size=10, window=0.05)
+
+    def _request_backend(self, operation):
+        return self.plugin._request_backend(
+            _Context(), operation['data'], operation['context']['type'],
+            operation['context']['operation'])
+
+    def test_results_split_per_operation(self):
+        pool = eventlet.GreenPool()
+        results = list(pool.imap(self._request_backend, self._operations()))
+        self.assertEqual(self.server.round_trips, 2)
+        self.assertEqual(results[0], (200, {'name': 'res-0', 'type': 'port'}))
+        self.assertEqual(results[7], (400, {'message': 'bad name'}))
+        self.assertEqual(results[19], (200, {'name': 'res-19',
+                                             'type': 'subnet'}))
+
+    def test_batch_not_supported(self):
+        self.server.batch_supported = False
+        operations = self._operations()[:3]
+        results = self.plugin._request_backend_batch(None, operations)
+        self.assertEqual([result[1]['name'] for result in results],
+                         ['res-0', 'res-1', 'res-2'])
+        # the batch request, then each operation alone
+        self.assertEqual(self.server.round_trips, 4)
+        self.assertIsNone(self.plugin._batcher)
+
+        # later operations are relayed one by one right away
+        self.server.round_trips = 0
+        self.assertEqual(self._request_backend(operations[0]),
+                         (200, {'name': 'res-0', 'type': 'port'}))
+        self.assertEqual(self.server.round_trips, 1)
+
+    def test_batch_failure_status_copied_to_all(self):
+        self.server.batch_status = 503
+        results = self.plugin._request_backend_batch(
+            None, self._operations()[:3])
+        self.assertEqual(results, [(503, {'message': 'unavailable'})] * 3)
+        self.assertIsNotNone(self.plugin._batcher)
+
+    def test_token_fetch_failure(self):
+        self.plugin._token_manager = mock.Mock()
+        self.plugin._token_manager.get_token.side_effect = RuntimeError(
+            'Authentication Failure')
+        # the operation is still relayed, without a token
+        self.assertEqual(
+            self._request_backend(self._operation('port', 'res-0')),
+            (200, {'name': 'res-0', 'type': 'port'}))
+        self.assertEqual(self.server.auth_tokens, [None])
@@ -0,0 +1,310 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+import uuid
+
+import eventlet
+
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    contrail_res_handler as res_handler)
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    sg_res_handler as sg_handler)
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    sgrule_res_handler as sgrule_handler)
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    subnet_res_handler as subnet_handler)
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    vmi_res_handler as vmi_handler)
+from neutron_plugin_contrail.tests.unit.opencontrail import vnc_mock
+
+
+class _CountingVnc(object):
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.queries = []
+
+    def virtual_networks_list(self, parent_id=None, count=False,
+                              detail=False, **kwargs):
+        assert count and not detail
+        self.queries.append(parent_id)
+        eventlet.sleep(0)
+        if parent_id is None:
+            total = sum(self.counts.values())
+        else:
+            total = self.counts.get(parent_id, 0)
+        return {'virtual-networks': {'count': total}}
+
+
+class _Handler(res_handler.ResourceGetHandler):
+    resource_list_method = 'virtual_networks_list'
+
+
+class ResourceCountTest(unittest.TestCase):
+
+    def setUp(self):
+        self.projects = [str(uuid.uuid4()) for _ in range(3)]
+        self.vnc = _CountingVnc(dict(zip(self.projects, [1, 2, 4])))
+        self.handler = _Handler(self.vnc)
+
+    def test_count_all(self):
+        self.assertEqual(self.handler._resource_count_optimized(None), 7)
+        self.assertEqual(self.vnc.queries, [None])
+
+    def test_count_per_project(self):
+        tenant_ids = [p.replace('-', '') for p in self.projects]
+        count = self.handler._resource_count_optimized(
+            {'tenant_id': tenant_ids + tenant_ids[:1]})
+        self.assertEqual(count, 7)
+        self.assertEqual(sorted(self.vnc.queries), sorted(self.projects))
+
+    def test_other_filters_not_counted(self):
+        self.assertIsNone(self.handler._resource_count_optimized(
+            {'tenant_id': [self.projects[0]], 'name': ['net']}))
+        self.assertEqual(self.vnc.queries, [])
+
+
+class _ListingVnc(object):
+
+    def __init__(self, uuids):
+        self.uuids = uuids
+        self.queries = []
+
+    def virtual_networks_list(self, obj_uuids=None, detail=False, **kwargs):
+        assert detail
+        self.queries.append(obj_uuids)
+        eventlet.sleep(0)
+        return [obj_uuid for obj_uuid in obj_uuids if obj_uuid in self.uuids]
+
+
+class ResourceListByUuidsTest(unittest.TestCase):
+
+    def test_chunks(self):
+        uuids = [str(uuid.uuid4()) for _ in range(10)]
+        vnc = _ListingVnc(set(uuids[:8]))
+        handler = _Handler(vnc, list_uuids_max_length=4 * 37)
+        objs = handler._resource_list_by_uuids(uuids + uuids[:2])
+        self.assertEqual(sorted(objs), sorted(uuids[:8]))
+        self.assertEqual([len(query) for query in vnc.queries], [4, 4, 2])
+
+    def test_empty(self):
+        vnc = _ListingVnc(set())
+        self.assertEqual(_Handler(vnc)._resource_list_by_uuids([]), [])
+        self.assertEqual(vnc.queries, [])
+
+
+class _Obj(object):
+
+    def __init__(self, obj_uuid, parent_uuid=None, **kwargs):
+        self.uuid = obj_uuid
+        self.parent_uuid = parent_uuid
+        self.__dict__.update(kwargs)
+
+    def __getattr__(self, name):
+        # the getters of the attributes not set return None
+        if name.startswith('get_'):
+            return lambda: None
+        raise AttributeError(name)
+
+
+class _IdPerms(object):
+    enable = True
+
+    def get_description(self):
+        return None
+
+
+class _Vmi(_Obj):
+    parent_type = 'project'
+    display_name = 'port'
+    ref_fields = ['virtual_network_refs']
+
+    def get_fq_name(self):
+        return ['default-domain', 'demo', self.uuid]
+
+    def get_virtual_network_refs(self):
+        return self.virtual_network_refs
+
+    def get_id_perms(self):
+        return _IdPerms()
+
+
+class _Addr(_Obj):
+
+    def get_security_group(self):
+        return self.security_group
+
+    def get_subnet(self):
+        return self.subnet
+
+
+class _SgRule(_Obj):
+
+    def get_rule_uuid(self):
+        return self.uuid
+
+    def get_src_addresses(self):
+        return [_Addr(None, security_group='local', subnet=None)]
+
+    def get_dst_addresses(self):
+        return [_Addr(None, security_group=None, subnet=_Obj(
+            None, get_ip_prefix=lambda: '0.0.0.0',
+            get_ip_prefix_len=lambda: 0))]
+
+    def get_protocol(self):
+        return 'any'
+
+    def get_dst_ports(self):
+        return [_Obj(None, get_start_port=lambda: 0,
+                     get_end_port=lambda: 65535)]
+
+
+class _Sg(_Obj):
+    display_name = 'sg'
+
+    def get_display_name(self):
+        return self.display_name
+
+    def get_fq_name(self):
+        return ['default-domain', 'demo', self.uuid]
+
+    def get_id_perms(self):
+        return _IdPerms()
+
+    def get_security_group_entries(self):
+        if self.rule_ids is None:
+            return None
+        rules = [_SgRule(rule_id) for rule_id in self.rule_ids]
+        return _Obj(None, get_policy_rule=lambda: rules)
+
+
+class _Subnet(_Obj):
+    default_gateway = '10.0.0.1'
+    subnet = _Obj(None, get_ip_prefix=lambda: '10.0.0.0',
+                  get_ip_prefix_len=lambda: 24)
+
+    def get_subnet_name(self):
+        return self.name
+
+
+class _Vn(_Obj):
+    is_shared = False
+
+    def get_network_ipam_refs(self):
+        subnets = [_Subnet(None, name=name,
+                           subnet_uuid='%s-sn-%d' % (self.uuid, index))
+                   for index, name in enumerate(self.subnet_names)]
+        return [{'to': ['default-domain', 'default-project', 'ipam'],
+                 'attr': _Obj(None, get_ipam_subnets=lambda: subnets)}]
+
+
+class _MockVncTest(unittest.TestCase):
+
+    def setUp(self):
+        collection = vnc_mock.MockVnc.resources_collection
+        saved = dict(collection)
+        self.addCleanup(collection.update, saved)
+        self.addCleanup(collection.clear)
+        self.vnc = vnc_mock.MockVnc()
+        self.projects = [str(uuid.uuid4()) for _ in range(2)]
+        self.admin = {'is_admin': True, 'tenant': None}
+
+    def _add(self, resource, objs):
+        vnc_mock.MockVnc.resources_collection[resource] = dict(
+            (obj.uuid, obj) for obj in objs)
+
+
+class PortCountTest(_MockVncTest):
+
+    def setUp(self):
+        super(PortCountTest, self).setUp()
+        self._add('virtual_machine_interface', [
+            _Vmi('vmi-%d' % i, self.projects[0],
+                 virtual_network_refs=[{'uuid': 'vn-%d' % (i % 2)}])
+            for i in range(5)])
+        self.handler = vmi_handler.VMInterfaceGetHandler(self.vnc)
+
+    def test_count_by_network(self):
+        for net_ids in (['vn-0'], ['vn-1'], ['vn-0', 'vn-1'], ['vn-2']):
+            filters = {'network_id': net_ids}
+            self.assertEqual(
+                self.handler.resource_count(self.admin, filters),
+                len(self.handler.resource_list(self.admin, filters,
+                                               fields=['id'])))
+        self.assertEqual(
+            self.handler.resource_count(self.admin, {'network_id': ['vn-0']}),
+            3)
+
+
+class SecurityGroupCountTest(_MockVncTest):
+
+    def setUp(self):
+        super(SecurityGroupCountTest, self).setUp()
+        no_rule = _Sg('no-rule-sg', self.projects[0], rule_ids=None)
+        self._add('security_group', [no_rule] + [
+            _Sg('sg-%d' % i, self.projects[i % 2],
+                rule_ids=['sg-%d-rule-%d' % (i, j) for j in range(i)])
+            for i in range(4)])
+        self.addCleanup(setattr, res_handler.SGHandler, '_no_rule_sg_obj',
+                        None)
+        res_handler.SGHandler._no_rule_sg_obj = no_rule
+
+    def test_no_rule_group_not_counted(self):
+        handler = sg_handler.SecurityGroupGetHandler(self.vnc)
+        handler._ensure_default_security_group_exists = lambda proj_id: None
+        count = handler.resource_count(self.admin)
+        self.assertEqual(count, len(handler.resource_list(self.admin)))
+        self.assertEqual(count, 4)
+
+    def test_rules_counted(self):
+        handler = sgrule_handler.SecurityGroupRuleGetHandler(self.vnc)
+        for filters in (None, {'id': ['sg-3-rule-0', 'sg-2-rule-1']},
+                        {'id': ['unknown']}):
+            self.assertEqual(
+                handler.resource_count(self.admin, filters),
+                len(handler.resource_list(self.admin, filters)))
+        self.assertEqual(handler.resource_count(self.admin), 6)
+
+
+class SubnetCountTest(_MockVncTest):
+
+    def setUp(self):
+        super(SubnetCountTest, self).setUp()
+        self._add('virtual_network', [
+            _Vn('vn-%d' % i, self.projects[i % 2],
+                subnet_names=['sn-%d' % j for j in range(i + 1)])
+            for i in range(3)])
+        self.handler = subnet_handler.SubnetGetHandler(self.vnc)
+
+        converted = []
+        convert = self.handler._subnet_vnc_to_neutron
+
+        def _subnet_vnc_to_neutron(*args, **kwargs):
+            converted.append(args[0])
+            return convert(*args, **kwargs)
+        self.handler._subnet_vnc_to_neutron = _subnet_vnc_to_neutron
+        self.converted = converted
+
+    def test_count_not_converted(self):
+        tenant_id = self.projects[0].replace('-', '')
+        for filters in ({'tenant_id': [tenant_id]},
+                        {'tenant_id': [tenant_id], 'name': ['sn-1']}):
+            count = self.handler.resource_count(self.admin, filters)
+            self.assertEqual(self.converted, [])
+            self.assertEqual(
+                count, len(self.handler.resource_list(self.admin, filters)))
+            del self.converted[:]
+        self.assertEqual(self.handler.resource_count(
+            self.admin, {'tenant_id': [tenant_id]}), 4)
@@ -0,0 +1,92 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    router_res_handler as router_handler)
+
+
+class _Obj(object):
+
+    def __init__(self, obj_uuid, vmi_ids=None, net_id=None):
+        self.uuid = obj_uuid
+        self.vmi_ids = vmi_ids or []
+        self.net_id = net_id
+
+    def get_virtual_machine_interface_refs(self):
+        return [{'uuid': vmi_id} for vmi_id in self.vmi_ids]
+
+    def get_virtual_network_refs(self):
+        return [{'uuid': self.net_id}] if self.net_id else None
+
+
+class _RouterVnc(object):
+
+    def __init__(self, routers, vmis):
+        self.routers = routers
+        self.vmis = dict((vmi.uuid, vmi) for vmi in vmis)
+        self.calls = []
+
+    def logical_routers_list(self, **kwargs):
+        self.calls.append('logical_routers_list')
+        return list(self.routers)
+
+    def virtual_machine_interfaces_list(self, obj_uuids=None, **kwargs):
+        self.calls.append('virtual_machine_interfaces_list')
+        return [self.vmis[vmi_id] for vmi_id in obj_uuids
+                if vmi_id in self.vmis]
+
+
+class NetworkRouterIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vnc = _RouterVnc(
+            [_Obj('rtr-1', ['vmi-1', 'vmi-2']), _Obj('rtr-2', ['vmi-3'])],
+            [_Obj('vmi-1', net_id='net-1'), _Obj('vmi-2', net_id='net-2'),
+             _Obj('vmi-3', net_id='net-2')])
+        self.handler = router_handler.LogicalRouterGetHandler(self.vnc)
+        self.addCleanup(router_handler.LogicalRouterMixin.
+                        invalidate_router_index)
+
+    def test_index(self):
+        index = self.handler.get_network_router_index()
+        # the first router listed wins
+        self.assertEqual({'net-1': 'rtr-1', 'net-2': 'rtr-1'}, index)
+        self.assertEqual(['logical_routers_list',
+                          'virtual_machine_interfaces_list'], self.vnc.calls)
+
+    def test_router_id_from_index(self):
+        index = {'net-2': 'rtr-2'}
+        self.assertEqual('rtr-2', self.handler.get_vmi_obj_router_id(
+            _Obj('port', net_id='net-2'), router_index=index))
+        self.assertIsNone(self.handler.get_vmi_obj_router_id(
+            _Obj('port', net_id='net-3'), router_index=index))
+        self.assertEqual([], self.vnc.calls)
+
+    def test_cached_until_invalidated(self):
+        self.handler = router_handler.LogicalRouterGetHandler(
+            self.vnc, router_index_ttl=60)
+        self.handler.get_network_router_index()
+        self.handler.get_network_router_index()
+        self.assertEqual(2, len(self.vnc.calls))
+
+        router_handler.LogicalRouterMixin.invalidate_router_index()
+        self.handler.get_network_router_index()
+        self.assertEqual(4, len(self.vnc.calls))
+
+    def test_not_cached_by_default(self):
+        self.handler.get_network_router_index()
+        self.handler.get_network_router_index()
+        self.assertEqual(4, len(self.vnc.calls))
@@ -0,0 +1,152 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+import uuid
+
+from cfgm_common import exceptions as vnc_exc
+
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    sgrule_res_handler as sgrule_handler)
+
+
+class _Rule(object):
+
+    def __init__(self, rule_uuid):
+        self.rule_uuid = rule_uuid
+
+    def get_rule_uuid(self):
+        return self.rule_uuid
+
+
+class _Entries(object):
+
+    def __init__(self, rules):
+        self.rules = rules
+
+    def get_policy_rule(self):
+        return self.rules
+
+
+class _Sg(object):
+
+    def __init__(self, parent_uuid, rule_ids):
+        self.uuid = str(uuid.uuid4())
+        self.parent_uuid = parent_uuid
+        self.entries = _Entries([_Rule(rule_id) for rule_id in rule_ids])
+
+    def get_security_group_entries(self):
+        return self.entries
+
+
+class _SgVnc(object):
+
+    def __init__(self, sgs):
+        self.sgs = sgs
+        self.listed = []
+        self.read = []
+
+    def projects_list(self, parent_fq_name=None):
+        return {'projects': [{'uuid': p}
+                             for p in sorted(set(sg.parent_uuid
+                                                 for sg in self.sgs))]}
+
+    def project_read(self, id=None, fq_name=None):
+        return None
+
+    def security_groups_list(self, parent_id=None, **kwargs):
+        self.listed.append(parent_id)
+        return [sg for sg in self.sgs if sg.parent_uuid == parent_id]
+
+    def security_group_read(self, id=None, **kwargs):
+        self.read.append(id)
+        for sg in self.sgs:
+            if sg.uuid == id:
+                return sg
+        raise vnc_exc.NoIdError(id)
+
+
+class SecurityGroupRuleFindTest(unittest.TestCase):
+
+    def setUp(self):
+        sgrule_handler.rule_index.clear()
+        self.projects = [str(uuid.uuid4()) for _ in range(3)]
+        self.sgs = [_Sg(project, ['%s-%d' % (project, i) for i in range(3)])
+                    for project in self.projects]
+        self.vnc = _SgVnc(self.sgs)
+        self.handler = sgrule_handler.SecurityGroupRuleHandler(self.vnc)
+
+    def tearDown(self):
+        sgrule_handler.rule_index.clear()
+
+    def test_scan_then_indexed(self):
+        rule_id = '%s-1' % self.projects[2]
+        sg_obj, sg_rule = self.handler._security_group_rule_find(rule_id)
+        self.assertEqual(sg_obj, self.sgs[2])
+        self.assertEqual(sg_rule.get_rule_uuid(), rule_id)
+        self.assertIn(self.projects[2], self.vnc.listed)
+
+        del self.vnc.listed[:]
+        rule_id = '%s-2' % self.projects[2]
+        sg_obj, sg_rule = self.handler._security_group_rule_find(rule_id)
+        self.assertEqual(sg_rule.get_rule_uuid(), rule_id)
+        self.assertEqual(self.vnc.listed, [])
+        self.assertEqual(self.vnc.read, [self.sgs[2].uuid])
+
+    def test_index_verified(self):
+        rule_id = '%s-0' % self.projects[1]
+        self.handler._security_group_rule_find(rule_id)
+        # removed by another server
+        del self.sgs[1].entries.rules[0]
+        del self.vnc.listed[:]
+        self.assertEqual(self.handler._security_group_rule_find(rule_id),
+                         (None, None))
+        self.assertEqual(sorted(self.vnc.listed), sorted(self.projects))
+
+        # moved position
+        rule_id = '%s-2' % self.projects[1]
+        sg_obj, sg_rule = self.handler._security_group_rule_find(rule_id)
+        self.assertEqual(sg_rule.get_rule_uuid(), rule_id)
+
+    def test_other_project(self):
+        rule_id = '%s-0' % self.projects[1]
+        self.handler._security_group_rule_find(rule_id)
+        del self.vnc.listed[:]
+        self.assertEqual(self.handler._security_group_rule_find(
+            rule_id, self.projects[0]), (None, None))
+        self.assertEqual(self.vnc.listed, [])
+
+
+class SecurityGroupRuleIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = sgrule_handler.SecurityGroupRuleIndex(max_entries=4)
+        self.sgs = [_Sg('project', ['sg%d-%d' % (i, j) for j in range(2)])
+                    for i in range(3)]
+
+    def test_least_recently_used_dropped(self):
+        self.index.index_sg(self.sgs[0])
+        self.index.index_sg(self.sgs[1])
+        self.assertEqual(self.index.lookup('sg0-1'), (self.sgs[0].uuid, 1))
+        self.index.index_sg(self.sgs[2])
+        self.assertEqual(self.index.lookup('sg1-0'), (None, None))
+        self.assertEqual(self.index.lookup('sg0-0'), (self.sgs[0].uuid, 0))
+        self.assertEqual(self.index.lookup('sg2-1'), (self.sgs[2].uuid, 1))
+
+    def test_group_larger_than_index_kept(self):
+        self.index.index_sg(self.sgs[0])
+        sg = _Sg('project', ['big-%d' % j for j in range(5)])
+        self.index.index_sg(sg)
+        self.assertEqual(self.index.lookup('sg0-0'), (None, None))
+        self.assertEqual(self.index.lookup('big-4'), (sg.uuid, 4))
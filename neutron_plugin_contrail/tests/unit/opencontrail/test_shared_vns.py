@@ -0,0 +1,247 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+import unittest
+import uuid
+
+import eventlet
+import mock
+
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    subnet_keys)
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    subnet_res_handler as subnet_handler)
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    vn_res_handler as vn_handler)
+from neutron_plugin_contrail.tests.unit.opencontrail import vnc_mock
+
+
+class _Obj(object):
+
+    def __init__(self, obj_uuid=None, **kwargs):
+        self.uuid = obj_uuid
+        self.__dict__.update(kwargs)
+
+    def __getattr__(self, name):
+        # the getters of the attributes not set return None
+        if name.startswith('get_'):
+            return lambda: None
+        raise AttributeError(name)
+
+
+class _IdPerms(object):
+    enable = True
+
+
+class _Subnet(_Obj):
+    default_gateway = '10.0.0.1'
+
+    def __init__(self, subnet_uuid, prefix):
+        super(_Subnet, self).__init__(
+            subnet_uuid=subnet_uuid, name='subnet',
+            subnet=_Obj(get_ip_prefix=lambda: prefix,
+                        get_ip_prefix_len=lambda: 24))
+
+    def get_subnet_name(self):
+        return self.name
+
+    def set_subnet_name(self, name):
+        self.name = name
+
+
+class _VnSubnets(object):
+
+    def __init__(self, ipam_subnets):
+        self.ipam_subnets = ipam_subnets
+
+    def get_ipam_subnets(self):
+        return self.ipam_subnets
+
+    def set_ipam_subnets(self, ipam_subnets):
+        self.ipam_subnets = ipam_subnets
+
+
+class _Vn(_Obj):
+    display_name = 'net'
+    ref_fields = []
+    backref_fields = []
+
+    def __init__(self, parent_uuid, is_shared=False, router_external=False,
+                 subnets=None):
+        super(_Vn, self).__init__(
+            str(uuid.uuid4()), parent_uuid=parent_uuid, is_shared=is_shared,
+            router_external=router_external, _pending_ref_updates=set(),
+            _pending_field_updates=set(), network_ipam_refs=[
+                {'to': ['default-domain', 'default-project', 'ipam'],
+                 'attr': _VnSubnets(subnets or [])}])
+
+    def get_fq_name(self):
+        return ['default-domain', 'demo', self.uuid]
+
+    def get_display_name(self):
+        return self.display_name
+
+    def get_id_perms(self):
+        return _IdPerms()
+
+    def get_is_shared(self):
+        return self.is_shared
+
+    def get_router_external(self):
+        return self.router_external
+
+    def get_network_ipam_refs(self):
+        return self.network_ipam_refs
+
+    def add_network_ipam(self, ipam_obj, vnsn_data):
+        self.network_ipam_refs.append({'to': ipam_obj.get_fq_name(),
+                                       'attr': vnsn_data})
+
+
+class _NetworkVnc(vnc_mock.MockVnc):
+    """Filters the networks listed like the API server."""
+
+    def __init__(self):
+        self.listed = []
+
+    def virtual_networks_list(self, filters=None, **kwargs):
+        self.listed.append(filters)
+        nets = vnc_mock.MockVnc.__getattr__(
+            self, 'virtual_networks_list')(**kwargs)
+        return [net for net in nets
+                if all(getattr(net, key) == value
+                       for key, value in (filters or {}).items())]
+
+
+class _SharedNetworksTest(unittest.TestCase):
+
+    def setUp(self):
+        collection = vnc_mock.MockVnc.resources_collection
+        saved = dict(collection)
+        self.addCleanup(collection.update, saved)
+        self.addCleanup(collection.clear)
+        self.addCleanup(vn_handler.VNetworkMixin.invalidate_shared_vns)
+        self.addCleanup(subnet_keys.resolver.clear)
+        vn_handler.VNetworkMixin.invalidate_shared_vns()
+
+        self.projects = [str(uuid.uuid4()) for _ in range(2)]
+        self.subnet = _Subnet(str(uuid.uuid4()), '10.0.0.0')
+        self.nets = [
+            _Vn(self.projects[0], subnets=[self.subnet]),
+            _Vn(self.projects[0], is_shared=True),
+            _Vn(self.projects[1]),
+            _Vn(self.projects[1], is_shared=True, router_external=True),
+            _Vn(self.projects[1], router_external=True)]
+        collection['virtual_network'] = dict(
+            (net.uuid, net) for net in self.nets)
+        self.vnc = _NetworkVnc()
+        self.vnc.kv_store(self.subnet.subnet_uuid,
+                          '%s 10.0.0.0/24' % self.nets[0].uuid)
+        self.net_handler = vn_handler.VNetworkHandler(self.vnc)
+        self.subnet_handler = subnet_handler.SubnetHandler(self.vnc)
+
+    def _listings(self):
+        return len([filters for filters in self.vnc.listed if filters])
+
+
+class SharedNetworksTest(_SharedNetworksTest):
+
+    def _assert_dropped_by(self, write, *args):
+        self.net_handler.vn_list_shared()
+        del self.vnc.listed[:]
+        write(*args)
+        self.net_handler.vn_list_shared()
+        self.assertEqual(self._listings(), 1)
+
+    def test_reused_for_ttl(self):
+        shared = self.net_handler.vn_list_shared()
+        self.assertEqual(sorted(net.uuid for net in shared),
+                         sorted([self.nets[1].uuid, self.nets[3].uuid]))
+        # the subnet handlers get the networks from the same listing
+        vn_get_handler = self.subnet_handler._get_handler(
+            vn_handler.VNetworkGetHandler)
+        self.assertEqual(vn_get_handler.vn_list_shared(), shared)
+        self.assertEqual(self.vnc.listed, [{'is_shared': True}])
+
+        expired = (time.time() + vn_handler.VNetworkMixin.shared_vns_ttl +
+                   1)
+        with mock.patch.object(vn_handler.time, 'time',
+                               return_value=expired):
+            self.net_handler.vn_list_shared()
+        self.assertEqual(self._listings(), 2)
+
+    def test_dropped_on_network_writes(self):
+        net = _Vn(self.projects[0])
+        with mock.patch.object(self.net_handler, 'create_vn_obj',
+                               return_value=net):
+            self._assert_dropped_by(self.net_handler.resource_create, {},
+                                    {'name': 'net'})
+        self._assert_dropped_by(self.net_handler.resource_update, {},
+                                net.uuid, {'name': 'renamed'})
+        self._assert_dropped_by(self.net_handler.resource_delete, {},
+                                net.uuid)
+
+    def test_dropped_on_subnet_writes(self):
+        subnet = _Subnet(str(uuid.uuid4()), '10.0.1.0')
+        ipam = _Obj(get_fq_name=lambda: ['default-domain',
+                                         'default-project', 'ipam'])
+        with mock.patch.object(self.subnet_handler, '_get_netipam_obj',
+                               return_value=ipam), \
+                mock.patch.object(self.subnet_handler,
+                                  '_subnet_neutron_to_vnc',
+                                  return_value=subnet):
+            self._assert_dropped_by(
+                self.subnet_handler.resource_create, {},
+                {'network_id': self.nets[0].uuid, 'cidr': '10.0.1.0/24'})
+        self._assert_dropped_by(self.subnet_handler.resource_update, {},
+                                self.subnet.subnet_uuid, {'name': 'renamed'})
+        self._assert_dropped_by(self.subnet_handler.resource_delete, {},
+                                self.subnet.subnet_uuid)
+
+
+class _YieldingVnc(_NetworkVnc):
+
+    def __init__(self):
+        super(_YieldingVnc, self).__init__()
+        self.events = []
+
+    def virtual_networks_list(self, **kwargs):
+        self.events.append('start')
+        eventlet.sleep(0)
+        self.events.append('end')
+        return super(_YieldingVnc, self).virtual_networks_list(**kwargs)
+
+
+class TenantNetworkListTest(_SharedNetworksTest):
+
+    def setUp(self):
+        super(TenantNetworkListTest, self).setUp()
+        self.vnc = _YieldingVnc()
+        self.net_handler = vn_handler.VNetworkHandler(self.vnc)
+        self.context = {'is_admin': False,
+                        'tenant': self.projects[0].replace('-', '')}
+
+    def test_lists_read_concurrently_deduplicated(self):
+        nets = self.net_handler.resource_list(self.context)
+        # own, shared and external networks, listed once each
+        self.assertEqual(sorted(net['id'] for net in nets),
+                         sorted(self.nets[i].uuid for i in (0, 1, 3, 4)))
+        self.assertEqual(self.vnc.events, ['start'] * 3 + ['end'] * 3)
+
+        # the shared and external networks are listed for all tenants
+        del self.vnc.listed[:]
+        nets = self.net_handler.resource_list(self.context)
+        self.assertEqual(len(nets), 4)
+        self.assertEqual(self.vnc.listed, [None])
@@ -0,0 +1,188 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from cfgm_common import exceptions as vnc_exc
+from neutron.common import exceptions as n_exc
+
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    subnet_keys)
+from neutron_plugin_contrail.plugins.opencontrail.vnc_client import (
+    subnet_res_handler as subnet_handler)
+
+
+class _KvVnc(object):
+
+    def __init__(self, kv):
+        self.kv = kv
+        self.retrieved = []
+
+    def kv_delete(self, key):
+        del self.kv[key]
+
+    def kv_retrieve(self, key):
+        self.retrieved.append(key)
+        try:
+            return self.kv[key]
+        except KeyError:
+            raise vnc_exc.NoIdError(key)
+
+
+class SubnetKeyResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vnc = _KvVnc({'sn-%d' % i: 'net-%d 10.0.%d.0/24' % (i % 2, i)
+                           for i in range(4)})
+        self.resolver = subnet_keys.SubnetKeyResolver(max_entries=3)
+
+    def test_resolve_cached(self):
+        self.assertEqual(self.resolver.resolve(self.vnc, 'sn-1'),
+                         'net-1 10.0.1.0/24')
+        self.resolver.resolve(self.vnc, 'sn-1')
+        self.assertEqual(self.vnc.retrieved, ['sn-1'])
+        self.assertRaises(vnc_exc.NoIdError, self.resolver.resolve,
+                          self.vnc, 'unknown')
+
+    def test_resolve_many(self):
+        self.resolver.resolve(self.vnc, 'sn-0')
+        keys = self.resolver.resolve_many(self.vnc,
+                                          ['sn-0', 'sn-2', 'unknown', 'sn-2'])
+        self.assertEqual(keys, {'sn-0': 'net-0 10.0.0.0/24',
+                                'sn-2': 'net-0 10.0.2.0/24'})
+        self.assertEqual(sorted(self.vnc.retrieved),
+                         ['sn-0', 'sn-2', 'unknown'])
+
+    def test_eviction(self):
+        self.resolver.resolve_many(self.vnc, ['sn-0', 'sn-1', 'sn-2'])
+        self.resolver.evict('sn-1')
+        self.resolver.evict_network('net-0')
+        del self.vnc.retrieved[:]
+        self.resolver.resolve_many(self.vnc, ['sn-0', 'sn-1', 'sn-2'])
+        self.assertEqual(sorted(self.vnc.retrieved), ['sn-0', 'sn-1', 'sn-2'])
+
+    def test_lru(self):
+        for subnet_id in ['sn-0', 'sn-1', 'sn-2', 'sn-0', 'sn-3']:
+            self.resolver.resolve(self.vnc, subnet_id)
+        del self.vnc.retrieved[:]
+        self.resolver.resolve(self.vnc, 'sn-0')
+        self.resolver.resolve(self.vnc, 'sn-1')
+        self.assertEqual(self.vnc.retrieved, ['sn-1'])
+
+
+class _Prefix(object):
+
+    def __init__(self, cidr):
+        self.prefix, self.prefix_len = cidr.split('/')
+
+    def get_ip_prefix(self):
+        return self.prefix
+
+    def get_ip_prefix_len(self):
+        return int(self.prefix_len)
+
+
+class _IpamSubnet(object):
+
+    def __init__(self, subnet_uuid, cidr):
+        self.subnet_uuid = subnet_uuid
+        self.subnet = _Prefix(cidr)
+
+
+class _IpamSubnets(object):
+
+    def __init__(self, subnets):
+        self.subnets = subnets
+
+    def get_ipam_subnets(self):
+        return self.subnets
+
+
+class _Vn(object):
+
+    def __init__(self, net_id, subnets):
+        self.uuid = net_id
+        self.ipam_refs = [{'to': ['default-domain', 'default-project',
+                                  'default-network-ipam'],
+                           'attr': _IpamSubnets(subnets)}]
+
+    def get_network_ipam_refs(self):
+        return self.ipam_refs
+
+
+class _SubnetVnc(_KvVnc):
+    """Another server deletes and re-creates subnets behind our back."""
+
+    def __init__(self):
+        super(_SubnetVnc, self).__init__({'sn-1': 'net-1 10.0.1.0/24'})
+        self.vn = _Vn('net-1', [_IpamSubnet('sn-1', '10.0.1.0/24')])
+
+    def virtual_network_read(self, id=None, **kwargs):
+        if id != self.vn.uuid:
+            raise vnc_exc.NoIdError(id)
+        return self.vn
+
+    def delete_subnet(self, subnet_id, recreate_as=None):
+        self.kv_delete(subnet_id)
+        subnets = self.vn.ipam_refs[0]['attr'].subnets
+        cidr = subnets[0].subnet
+        del subnets[:]
+        if recreate_as:
+            subnets.append(_IpamSubnet(
+                recreate_as, '%s/%s' % (cidr.prefix, cidr.prefix_len)))
+            self.kv[recreate_as] = 'net-1 10.0.1.0/24'
+
+
+class StaleSubnetKeyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vnc = _SubnetVnc()
+        subnet_keys.resolver.clear()
+        self.addCleanup(subnet_keys.resolver.clear)
+        self.assertEqual(subnet_keys.resolver.resolve(self.vnc, 'sn-1'),
+                         'net-1 10.0.1.0/24')
+
+    def _assert_evicted(self):
+        del self.vnc.retrieved[:]
+        self.assertRaises(vnc_exc.NoIdError, subnet_keys.resolver.resolve,
+                          self.vnc, 'sn-1')
+        self.assertEqual(self.vnc.retrieved, ['sn-1'])
+
+    def test_resolve_network_deleted_elsewhere(self):
+        self.vnc.delete_subnet('sn-1')
+        self.assertRaises(vnc_exc.NoIdError,
+                          subnet_keys.resolver.resolve_network,
+                          self.vnc, 'sn-1')
+        self._assert_evicted()
+
+    def test_resolve_network_recreated_elsewhere(self):
+        self.vnc.delete_subnet('sn-1', recreate_as='sn-2')
+        self.assertRaises(vnc_exc.NoIdError,
+                          subnet_keys.resolver.resolve_network,
+                          self.vnc, 'sn-1')
+        self._assert_evicted()
+
+    def test_get_deleted_elsewhere(self):
+        handler = subnet_handler.SubnetGetHandler(self.vnc)
+        self.vnc.delete_subnet('sn-1')
+        self.assertRaises(n_exc.SubnetNotFound, handler.resource_get,
+                          {}, 'sn-1')
+        self._assert_evicted()
+
+    def test_get_recreated_elsewhere(self):
+        handler = subnet_handler.SubnetGetHandler(self.vnc)
+        self.vnc.delete_subnet('sn-1', recreate_as='sn-2')
+        self.assertRaises(n_exc.SubnetNotFound, handler.resource_get,
+                          {}, 'sn-1')
+        self._assert_evicted()
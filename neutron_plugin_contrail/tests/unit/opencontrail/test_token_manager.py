@@ -0,0 +1,79 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import eventlet
+import mock
+
+from neutron_plugin_contrail.plugins.opencontrail import token_manager
+
+
+class TokenManagerTest(unittest.TestCase):
+
+    def _fetcher(self, lifetime=3600, delay=0):
+        calls = []
+
+        def _fetch():
+            calls.append(1)
+            if delay:
+                eventlet.sleep(delay)
+            return 'token-%d' % len(calls), token_manager.time.time() + lifetime
+        return _fetch, calls
+
+    def test_parse_token_response(self):
+        content = {'access': {'token': {'id': 'abc',
+                                        'expires': '2015-03-25T19:34:17Z'}}}
+        self.assertEqual(token_manager.parse_token_response(content),
+                         ('abc', 1427312057))
+
+    def test_token_cached(self):
+        fetch, calls = self._fetcher()
+        manager = token_manager.TokenManager(fetch)
+        self.assertEqual(manager.get_token(), 'token-1')
+        self.assertEqual(manager.get_token(), 'token-1')
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_invalidate_fetches_once(self):
+        fetch, calls = self._fetcher(delay=0.01)
+        manager = token_manager.TokenManager(fetch, initial_token='stale')
+        pool = eventlet.GreenPool()
+        results = list(pool.imap(manager.invalidate, ['stale'] * 10))
+        self.assertEqual(set(results), set(['token-1']))
+        self.assertEqual(len(calls), 1)
+
+    def test_refresh_before_expiry(self):
+        fetch, calls = self._fetcher(lifetime=60)
+        manager = token_manager.TokenManager(fetch, refresh_margin=300)
+        with mock.patch.object(token_manager.eventlet,
+                               'spawn_n') as spawn_n:
+            manager.get_token()
+            self.assertEqual(manager.get_token(), 'token-1')
+            spawn_n.assert_called_once_with(manager._background_refresh,
+                                            'token-1')
+
+    def test_token_shared_between_managers(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        shared_file = os.path.join(tmp_dir, 'token')
+
+        fetch, calls = self._fetcher()
+        first = token_manager.TokenManager(fetch, shared_file=shared_file)
+        second = token_manager.TokenManager(fetch, shared_file=shared_file)
+        self.assertEqual(first.get_token(), 'token-1')
+        self.assertEqual(second.get_token(), 'token-1')
+        self.assertEqual(len(calls), 1)
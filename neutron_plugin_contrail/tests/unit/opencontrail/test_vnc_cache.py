@@ -0,0 +1,112 @@
+# Copyright 2015.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+import mock
+
+from neutron_plugin_contrail.plugins.opencontrail import vnc_cache
+
+
+class _Obj(object):
+    ref_fields = set(['virtual_network_refs'])
+
+    def __init__(self, uuid, fq_name, vn_refs=None):
+        self.uuid = uuid
+        self.fq_name = fq_name
+        self.parent_uuid = None
+        self.virtual_network_refs = vn_refs
+
+    def get_fq_name(self):
+        return self.fq_name
+
+
+class _FakeVnc(object):
+    def __init__(self):
+        self.objs = {}
+        self.reads = 0
+
+    def _read(self, fq_name=None, id=None, fields=None):
+        self.reads += 1
+        if id:
+            return self.objs[id]
+        return [o for o in self.objs.values() if o.fq_name == fq_name][0]
+
+    virtual_network_read = _read
+    virtual_machine_interface_read = _read
+
+    def virtual_machine_interface_create(self, obj):
+        self.objs[obj.uuid] = obj
+        return obj.uuid
+
+    def virtual_network_delete(self, fq_name=None, id=None):
+        del self.objs[id]
+
+    def kv_retrieve(self, key):
+        self.reads += 1
+        return 'value-%s' % key
+
+    def kv_store(self, key, value):
+        pass
+
+
+class CachingVncApiTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vnc = _FakeVnc()
+        self.vnc.objs['vn1'] = _Obj('vn1', ['d', 'p', 'net1'])
+        self.cache = vnc_cache.CachingVncApi(self.vnc, max_entries=2)
+
+    def test_read_cached_as_copy(self):
+        first = self.cache.virtual_network_read(id='vn1')
+        first.fq_name = ['changed']
+        second = self.cache.virtual_network_read(id='vn1')
+        self.assertEqual(second.fq_name, ['d', 'p', 'net1'])
+        self.assertEqual(self.vnc.reads, 1)
+        stats = self.cache.get_cache_stats()['types']['virtual_network']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_ttl_expiry(self):
+        self.cache.virtual_network_read(id='vn1')
+        with mock.patch.object(vnc_cache.time, 'time',
+                               return_value=vnc_cache.time.time() + 10):
+            self.cache.virtual_network_read(id='vn1')
+        self.assertEqual(self.vnc.reads, 2)
+
+    def test_lru_bound(self):
+        for key in ('a', 'b', 'c'):
+            self.cache.kv_retrieve(key)
+        self.cache.kv_retrieve('a')
+        self.assertEqual(self.vnc.reads, 4)
+        self.assertEqual(self.cache.get_cache_stats()['entries'], 2)
+
+    def test_create_invalidates_referred_objects(self):
+        self.cache.virtual_network_read(id='vn1')
+        vmi = _Obj('vmi1', ['d', 'p', 'port1'],
+                   vn_refs=[{'to': ['d', 'p', 'net1'], 'uuid': 'vn1'}])
+        self.cache.virtual_machine_interface_create(vmi)
+        self.cache.virtual_network_read(id='vn1')
+        self.assertEqual(self.vnc.reads, 2)
+
+    def test_delete_of_unknown_object_flushes(self):
+        self.cache.kv_retrieve('a')
+        self.vnc.objs['vn2'] = _Obj('vn2', ['d', 'p', 'net2'])
+        self.cache.virtual_network_delete(id='vn2')
+        self.assertEqual(self.cache.get_cache_stats()['entries'], 0)
+
+    def test_kv_store_invalidates(self):
+        self.cache.kv_retrieve('a')
+        self.cache.kv_store('a', 'new')
+        self.cache.kv_retrieve('a')
+        self.assertEqual(self.vnc.reads, 2)